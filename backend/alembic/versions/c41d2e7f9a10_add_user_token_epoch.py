@@ -0,0 +1,24 @@
+"""Add user token epoch
+
+Revision ID: c41d2e7f9a10
+Revises: a3eb7c9ffbd4
+Create Date: 2026-10-17 09:12:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d2e7f9a10'
+down_revision = 'a3eb7c9ffbd4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_epoch', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_epoch')
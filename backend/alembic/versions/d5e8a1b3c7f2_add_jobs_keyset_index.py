@@ -0,0 +1,34 @@
+"""Add jobs keyset pagination index
+
+Revision ID: d5e8a1b3c7f2
+Revises: c41d2e7f9a10
+Create Date: 2026-10-17 14:05:00.000000
+
+Job listings are ordered by (created_at, id) and paged by keyset on the same
+columns. Profiles page on their primary key, which needs no extra index.
+The jobs table predates the migrations, so the index is only created where
+the table exists.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e8a1b3c7f2'
+down_revision = 'c41d2e7f9a10'
+branch_labels = None
+depends_on = None
+
+
+def _has_jobs_table() -> bool:
+    return sa.inspect(op.get_bind()).has_table('jobs')
+
+
+def upgrade() -> None:
+    if _has_jobs_table():
+        op.create_index('ix_jobs_created_at_id', 'jobs', ['created_at', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    if _has_jobs_table():
+        op.drop_index('ix_jobs_created_at_id', table_name='jobs', if_exists=True)
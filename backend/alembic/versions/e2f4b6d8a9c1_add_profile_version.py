@@ -0,0 +1,24 @@
+"""Add profile version
+
+Revision ID: e2f4b6d8a9c1
+Revises: d5e8a1b3c7f2
+Create Date: 2026-10-17 15:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f4b6d8a9c1'
+down_revision = 'd5e8a1b3c7f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('profiles', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('profiles', 'version')
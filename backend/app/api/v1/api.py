@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import users, auth, profiles, jobs
+from app.api.v1 import users, auth, profiles, jobs, dashboard
 
 api_router = APIRouter(prefix="/api/v1") # Add prefix here for consistency
 
@@ -7,4 +7,5 @@ api_router = APIRouter(prefix="/api/v1") # Add prefix here for consistency
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(profiles.router, prefix="/profiles", tags=["profiles"])
-api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
\ No newline at end of file
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
\ No newline at end of file
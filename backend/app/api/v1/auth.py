@@ -8,11 +8,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.v1 import deps
 from app import schemas
-from app.core import config, security
+from app.core import config, rate_limit, refresh_tokens, security, token_epochs
 from app.core.auth import authenticate_user
+from app.core.database import save
+from app.core.metrics import REDIS_COMMAND_SECONDS
+from app.core.timing import TimedRoute
 from app.schemas.token import Token
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 logger = logging.getLogger(__name__)
 
 
@@ -31,38 +34,101 @@ def _validate_csrf(request: Request) -> None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="CSRF validation failed")
 
 
-async def _handle_failed_login(redis, email: str):
+def _login_fail_keys(email: str, client_ip: str) -> tuple[str, str]:
+    """Redis keys for the per-email and per-IP failed login counters."""
+    return f"login_fail:{email}", f"login_fail_ip:{client_ip}"
+
+
+def _too_many_login_attempts() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts, try again later",
+        headers={"Retry-After": str(config.settings.RATE_LIMIT_LOGIN_WINDOW)},
+    )
+
+
+async def _check_login_lockout(redis, email: str, client_ip: str):
+    """Reject locked-out callers before any DB or bcrypt work.
+
+    Both counters are read in a single round trip and the check does not touch
+    the users table, so known and unknown emails are rejected alike.
+    """
+    if not redis:
+        return
+
+    try:
+        with REDIS_COMMAND_SECONDS.time("mget"):
+            email_count, ip_count = await redis.mget(_login_fail_keys(email, client_ip))
+    except Exception:
+        logger.exception("Redis error while checking login lockout for %s", email)
+        return
+
+    if (
+        int(email_count or 0) >= config.settings.RATE_LIMIT_LOGIN_REQUESTS
+        or int(ip_count or 0) >= config.settings.RATE_LIMIT_LOGIN_IP_REQUESTS
+    ):
+        raise _too_many_login_attempts()
+
+
+async def _handle_failed_login(redis, email: str, client_ip: str):
     """Handle failed login attempt tracking."""
     if not redis:
         return
     
     try:
-        key = f"login_fail:{email}"
-        count = await redis.incr(key)
-        await redis.expire(key, config.settings.RATE_LIMIT_LOGIN_WINDOW)
+        email_key, ip_key = _login_fail_keys(email, client_ip)
+        window = config.settings.RATE_LIMIT_LOGIN_WINDOW
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.incr(email_key)
+            pipe.expire(email_key, window)
+            pipe.incr(ip_key)
+            pipe.expire(ip_key, window)
+            with REDIS_COMMAND_SECONDS.time("pipeline"):
+                count, _, _, _ = await pipe.execute()
         if count >= config.settings.RATE_LIMIT_LOGIN_REQUESTS:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Too many login attempts, try again later",
-            )
+            raise _too_many_login_attempts()
     except HTTPException:
         raise
     except Exception:
         logger.exception("Redis error while incrementing login failures for %s", email)
 
 
+# Claims carried from the refresh token into each new access token
+PRINCIPAL_CLAIMS = ("sub", "role", "uid", "name", "act", "tep")
+
+
+def _principal_claims(user) -> dict:
+    """Claims identifying the user; enough to build the principal without a DB lookup."""
+    return {
+        "sub": user.email,
+        "role": user.role,
+        "uid": user.id,
+        "name": user.full_name,
+        "act": bool(user.is_active),
+        "tep": user.token_epoch or 0,
+    }
+
+
+def _set_refresh_cookie(response: Response, refresh_token: str) -> None:
+    response.set_cookie(
+        key=config.settings.REFRESH_COOKIE_NAME,
+        value=refresh_token,
+        httponly=True,
+        secure=bool(config.settings.COOKIE_SECURE),
+        samesite=(config.settings.COOKIE_SAMESITE or "lax").lower(),
+        path="/",
+        max_age=config.settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60,
+    )
+
+
 async def _create_tokens_and_cookies(user, response: Response):
     """Create access token and set authentication cookies."""
     # Create access token
     ttl_minutes = config.settings.ACCESS_TOKEN_EXPIRE_MINUTES
     access_token_expires = timedelta(minutes=ttl_minutes)
     
-    claims = {
-        "sub": user.email,
-        "role": user.role,
-        "jti": str(user.id),
-    }
-    
+    claims = _principal_claims(user)
+
     access_token = security.create_access_token(
         data=claims,
         expires_delta=access_token_expires,
@@ -71,21 +137,14 @@ async def _create_tokens_and_cookies(user, response: Response):
 
     # Set cookies
     try:
-        refresh_token = security.create_refresh_token(claims)
+        family_id, nonce = await refresh_tokens.start_family(user.id)
+        refresh_token = security.create_refresh_token({**claims, "fid": family_id, "nonce": nonce})
         csrf_token = secrets.token_urlsafe(32)
         
         secure_flag = bool(config.settings.COOKIE_SECURE)
         same_site = (config.settings.COOKIE_SAMESITE or "lax").lower()
 
-        response.set_cookie(
-            key=config.settings.REFRESH_COOKIE_NAME,
-            value=refresh_token,
-            httponly=True,
-            secure=secure_flag,
-            samesite=same_site,
-            path="/",
-            max_age=config.settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60,
-        )
+        _set_refresh_cookie(response, refresh_token)
 
         response.set_cookie(
             key=config.settings.CSRF_COOKIE_NAME,
@@ -126,12 +185,17 @@ async def login_for_access_token(
 
         # Get Redis connection
         redis = getattr(request.app.state, 'redis', None)
+        # Lockout and hashing admission count per client as the rate limiter identifies it
+        client_ip = rate_limit.client_ip(request)
+
+        # Locked-out callers are turned away before any DB or bcrypt work
+        await _check_login_lockout(redis, email, client_ip)
 
         # Authenticate user
-        user = await authenticate_user(db, email=email, password=password)
+        user = await authenticate_user(db, email=email, password=password, client=client_ip)
         
         if not user:
-            await _handle_failed_login(redis, email)
+            await _handle_failed_login(redis, email, client_ip)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -151,14 +215,15 @@ async def login_for_access_token(
         # Clear failed login counter on success
         if redis:
             try:
-                await redis.delete(f"login_fail:{email}")
+                with REDIS_COMMAND_SECONDS.time("delete"):
+                    await redis.delete(f"login_fail:{email}")
             except Exception:
                 logger.exception("Redis error while clearing login failures for %s", email)
         
         logger.debug("Login successful for user: %s", email)
         return {"access_token": access_token, "token_type": "bearer"}
 
-    except HTTPException:
+    except (HTTPException, security.PasswordHashQueueFull):
         raise
     except Exception as e:
         logger.exception("Login failed for user '%s': %s", form_data.username, str(e))
@@ -175,6 +240,7 @@ async def refresh_access_token(request: Request, response: Response):
     Hybrid refresh endpoint: expects a HttpOnly refresh cookie and a readable CSRF cookie/header.
     - Validates XSRF header matches cookie value (unless disabled in test environment).
     - Decodes refresh token cookie and issues a fresh access token (JSON).
+    - Rotates the refresh token; replaying an already-used one revokes its whole family.
     """
     try:
         _validate_csrf(request)
@@ -187,25 +253,43 @@ async def refresh_access_token(request: Request, response: Response):
             payload = security.decode_refresh_token(refresh_token)
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token") from e
+        if not isinstance(payload.get("fid"), str) or not isinstance(payload.get("nonce"), str):
+            # Issued before rotation; not tied to a family that can be revoked
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+        # Sessions issued before a password, role or status change are revoked
+        published_name = None
+        if "uid" in payload:
+            current_epoch, published_name = await token_epochs.current(payload["uid"])
+            if "tep" in payload and payload["tep"] < current_epoch:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session has been revoked")
+
+        outcome, nonce = await refresh_tokens.rotate(payload["fid"], payload["nonce"])
+        if outcome is refresh_tokens.Rotation.REUSED:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reuse detected")
+        if outcome is refresh_tokens.Rotation.UNKNOWN:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session has been revoked")
 
         # Build new access token
         try:
             ttl_minutes = config.settings.ACCESS_TOKEN_EXPIRE_MINUTES
             access_token_expires = timedelta(minutes=ttl_minutes)
-            claims = {
-                "sub": payload.get("sub"),
-                "role": payload.get("role"),
-                "jti": payload.get("jti"),
-            }
+            claims = {claim: payload.get(claim) for claim in PRINCIPAL_CLAIMS if claim in payload}
+            if published_name is not None:
+                # Renames do not revoke sessions, so carry the current name forward
+                claims["name"] = published_name or None
             access_token = security.create_access_token(
                 data=claims,
                 expires_delta=access_token_expires,
                 audience=config.settings.JWT_AUDIENCE,
             )
+            refresh_token = security.create_refresh_token({**claims, "fid": payload["fid"], "nonce": nonce})
         except Exception as e:
             logger.exception("Failed to create access token: %s", e)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Token creation failed") from e
 
+        _set_refresh_cookie(response, refresh_token)
+
         # Optionally rotate CSRF token for defense-in-depth
         try:
             new_csrf = secrets.token_urlsafe(32)
@@ -235,6 +319,26 @@ async def logout(request: Request, response: Response):
     """Clear authentication cookies and logout user."""
     # Validate CSRF token to prevent CSRF attacks (unless disabled in test environment)
     _validate_csrf(request)
+
+    # End the refresh token family so copies of the cookie stop working too
+    refresh_token = request.cookies.get(config.settings.REFRESH_COOKIE_NAME)
+    if refresh_token:
+        try:
+            payload = security.decode_refresh_token(refresh_token)
+        except Exception:
+            payload = {}
+        if isinstance(payload.get("fid"), str):
+            await refresh_tokens.revoke(payload["fid"])
+
+    # Revoke the presented access token, which would otherwise live until exp
+    authorization = request.headers.get("Authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        try:
+            access = security.decode_access_token(authorization[7:])
+        except Exception:
+            access = {}
+        if isinstance(access.get("jti"), str):
+            await security.revoked_tokens.revoke(access["jti"], access["exp"])
     
     # Compute cookie settings once
     secure_flag = bool(config.settings.COOKIE_SECURE)
@@ -280,35 +384,45 @@ async def update_user_settings(
     """
     from sqlalchemy import select
     from app.models.user import User
-    
+
+    # The auth dependency returns a cached principal without the password hash,
+    # so load the persisted row to verify and apply changes.
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
     # Verify current password
-    if not security.pwd_context.verify(payload.current_password, current_user.hashed_password):
+    if not await security.averify_password(payload.current_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Current password is incorrect",
         )
     
     # Update fields
-    if payload.email and payload.email.lower() != current_user.email:
+    if payload.email and payload.email.lower() != user.email:
         # Check if new email already exists
         result = await db.execute(
-            select(User).where(User.email == payload.email.lower()).where(User.id != current_user.id)
+            select(User).where(User.email == payload.email.lower()).where(User.id != user.id)
         )
         if result.scalars().first():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already in use",
             )
-        current_user.email = payload.email.lower()
+        user.email = payload.email.lower()
     
+    name = user.full_name
     if payload.full_name is not None:
-        current_user.full_name = payload.full_name
+        user.full_name = payload.full_name
     
     if payload.new_password:
-        current_user.hashed_password = security.pwd_context.hash(payload.new_password)
+        user.hashed_password = await security.ahash_password(payload.new_password)
     
-    db.add(current_user)
-    await db.commit()
-    await db.refresh(current_user)
+    epoch = user.token_epoch
+    await save(db, user)
+    if user.token_epoch != epoch:
+        await token_epochs.publish(user.id, user.token_epoch)
+    if user.full_name != name:
+        await token_epochs.publish_name(user.id, user.full_name)
     
-    return current_user
\ No newline at end of file
+    return user
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""
+API Endpoint for the dashboard.
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1 import deps
+from app.core.database import release_connection
+from app.core.timing import TimedRoute
+from app.schemas.dashboard import Dashboard
+from app.services import dashboard_service
+
+router = APIRouter(redirect_slashes=False, route_class=TimedRoute)
+
+
+@router.get("/", response_model=Dashboard)
+@router.get("", response_model=Dashboard, include_in_schema=False)
+async def get_dashboard(
+    db: AsyncSession = Depends(deps.get_read_db),
+    current_user: deps.CachedUser = Depends(deps.get_current_active_user),
+):
+    """
+    Everything the dashboard shows on load: the account, its profile, how
+    complete the profile is and the user's stats.
+    """
+    dashboard = await dashboard_service.get_dashboard(db, current_user)
+    await release_connection(db)
+    return dashboard
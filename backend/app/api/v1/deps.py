@@ -4,9 +4,7 @@ FastAPI dependencies for the application.
 Dependencies are used for things like getting a database session or
 getting the current authenticated user.
 """
-import asyncio
-from dataclasses import dataclass, replace
-import time
+from dataclasses import asdict, dataclass, replace
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -14,17 +12,17 @@ from sqlalchemy import select
 from jose import JWTError
 
 # --- Core Dependencies ---
-from app.core.database import get_db
-from app.core import security
+from app.core.database import get_db, get_read_db, release_connection
+from app.core import metrics, security, timing, token_epochs
 from app.core.config import settings # Import settings to get JWT_AUDIENCE
+from app.core.principal_cache import PrincipalCache, register as register_principal_cache
+from app.core.token_cache import VerifiedTokenCache
 from app.models.user import User, UserRole
 from app.schemas.token import TokenData
 import logging
 
 logger = logging.getLogger(__name__)
 
-_CACHE_TTL_SECONDS = 5.0
-
 @dataclass(frozen=True)
 class CachedUser:
     id: int
@@ -32,73 +30,133 @@ class CachedUser:
     full_name: str | None
     role: UserRole
     is_active: bool
+    token_id: str | None = None  # jti of the access token this principal came from
+
+# Verified principals keyed by token digest; bounded and expiring at the token's exp
+_token_cache: VerifiedTokenCache[CachedUser] = VerifiedTokenCache(
+    maxsize=settings.TOKEN_CACHE_MAX_ENTRIES,
+    ttl=settings.TOKEN_CACHE_TTL_SECONDS,
+)
+
+def _dump_principal(user: CachedUser) -> dict:
+    return {**asdict(user), "role": user.role.value}
+
+def _load_principal(data: dict) -> CachedUser:
+    return CachedUser(**{**data, "role": UserRole(data["role"])})
 
-_token_cache: dict[str, tuple[CachedUser, float]] = {}
-_token_locks: dict[str, asyncio.Lock] = {}
+# _token_cache backed by Redis, invalidated across workers when a user changes
+principal_cache: PrincipalCache[CachedUser] = register_principal_cache(PrincipalCache(
+    _token_cache,
+    dumps=_dump_principal,
+    loads=_load_principal,
+    user_id=lambda user: user.id,
+    l2_ttl=settings.PRINCIPAL_CACHE_L2_TTL_SECONDS,
+    shared=settings.PRINCIPAL_CACHE_L2_ENABLED,
+))
+
+metrics.REGISTRY.register_collector(
+    "token_cache_entries", "Entries in the bearer-token principal cache.",
+    lambda: [((), len(_token_cache))],
+)
 
 # --- OAuth2 Scheme ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
 # --- Authentication Dependencies --- #
+@timing.timed("auth")
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
 ) -> CachedUser:
-    lock = _token_locks.setdefault(token, asyncio.Lock())
-    async with lock:
-        now = time.monotonic()
-        cached_entry = _token_cache.get(token)
-        if cached_entry:
-            cached_user, expires_at = cached_entry
-            if expires_at > now:
-                return replace(cached_user)
-            _token_cache.pop(token, None)
-
-        credentials_exception = HTTPException(
+    cached_user = await principal_cache.get_or_load(token, lambda: _verify_token(token, db))
+    # Checked on every request, cache hits included; a filter miss does no I/O
+    token_id = cached_user.token_id
+    if token_id and token_id in security.revoked_tokens and await security.revoked_tokens.confirm(token_id):
+        logger.info("Authentication failed: token %s has been revoked", token_id)
+        raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        try:
-            # Decode token with strict audience and expiry validation
-            logger.debug("Decoding token length=%s first16=%s", len(token or ""), (token or "")[:16])
-            payload = security.decode_access_token(token)
-            logger.debug("Decoded payload keys: %s", list(payload.keys()))
-
-            # Extract user identifier
-            username = payload.get("sub")
-            logger.debug("Username from payload: %r", username)
-            if not username:
-                logger.warning("Authentication failed: missing subject in token")
-                raise credentials_exception
-
-        except JWTError as e:
-            logger.warning("Authentication failed: token validation error - %s", str(e))
-            raise credentials_exception from e
-
-        logger.debug("Looking up user by email=%s", username)
-        try:
-            result = await db.execute(select(User).where(User.email == username))
-            user = result.scalar_one_or_none()
-            logger.debug("User lookup result: %s", getattr(user, 'email', None))
-        except Exception as e:
-            logger.exception("Database error during user lookup: %s", e)
-            raise credentials_exception from e
-        
-        if user is None:
-            logger.warning("Authentication failed: user not found for email=%s", username)
+    return replace(cached_user)
+
+async def _verify_token(token: str, db: AsyncSession) -> tuple[CachedUser, float | None]:
+    """Decode the token and load its user; returns the principal and the token's exp."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        # Decode token with strict audience and expiry validation
+        logger.debug("Decoding token length=%s first16=%s", len(token or ""), (token or "")[:16])
+        payload = security.decode_access_token(token)
+        logger.debug("Decoded payload keys: %s", list(payload.keys()))
+
+        # Extract user identifier
+        username = payload.get("sub")
+        logger.debug("Username from payload: %r", username)
+        if not username:
+            logger.warning("Authentication failed: missing subject in token")
             raise credentials_exception
-        
-        logger.debug("User authenticated successfully: %s", username)
+
+    except JWTError as e:
+        logger.warning("Authentication failed: token validation error - %s", str(e))
+        raise credentials_exception from e
+
+    if settings.AUTH_STATELESS_PRINCIPAL and "uid" in payload and "tep" in payload:
+        return await _principal_from_claims(payload, credentials_exception), payload.get("exp")
+
+    logger.debug("Looking up user by email=%s", username)
+    try:
+        result = await db.execute(select(User).where(User.email == username))
+        user = result.scalar_one_or_none()
+        # Don't hold the connection through the rest of the request
+        await release_connection(db)
+        logger.debug("User lookup result: %s", getattr(user, 'email', None))
+    except Exception as e:
+        logger.exception("Database error during user lookup: %s", e)
+        raise credentials_exception from e
+
+    if user is None:
+        logger.warning("Authentication failed: user not found for email=%s", username)
+        raise credentials_exception
+
+    logger.debug("User authenticated successfully: %s", username)
+    cached_user = CachedUser(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        role=user.role if isinstance(user.role, UserRole) else UserRole(user.role),
+        is_active=user.is_active,
+        token_id=payload.get("jti"),
+    )
+    return cached_user, payload.get("exp")
+
+async def _principal_from_claims(payload: dict, credentials_exception: HTTPException) -> CachedUser:
+    """Build the principal from signed claims, rejecting tokens from a revoked epoch."""
+    try:
         cached_user = CachedUser(
-            id=user.id,
-            email=user.email,
-            full_name=user.full_name,
-            role=user.role if isinstance(user.role, UserRole) else UserRole(user.role),
-            is_active=user.is_active,
+            id=int(payload["uid"]),
+            email=payload["sub"],
+            full_name=payload.get("name"),
+            role=UserRole(payload["role"]),
+            is_active=bool(payload.get("act", True)),
+            token_id=payload.get("jti"),
         )
-        _token_cache[token] = (cached_user, now + _CACHE_TTL_SECONDS)
-        return replace(cached_user)
+        token_epoch = int(payload["tep"])
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning("Authentication failed: malformed principal claims - %s", e)
+        raise credentials_exception from e
+
+    current_epoch, published_name = await token_epochs.current(cached_user.id)
+    if token_epoch < current_epoch:
+        logger.info("Authentication failed: token epoch %s revoked for user %s", token_epoch, cached_user.id)
+        raise credentials_exception
+    if published_name is not None:
+        # Renamed since the token was signed
+        cached_user = replace(cached_user, full_name=published_name or None)
+    return cached_user
 
 def get_current_active_user(current_user: CachedUser = Depends(get_current_user)) -> CachedUser:
     if not current_user.is_active:
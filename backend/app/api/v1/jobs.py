@@ -1,15 +1,21 @@
 """
 API Endpoints for Jobs.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.v1 import deps
+from app.core import etags
+from app.core.database import release_connection
+from app.core.pagination import decode_cursor, set_next_cursor
+from app.core.timing import TimedRoute
 from app.models.user import User, UserRole
 from app.schemas.job import JobCreate, JobRead
 from app.services import job_service
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("/", response_model=JobRead, status_code=status.HTTP_201_CREATED)
 async def create_job(
@@ -37,12 +43,31 @@ async def create_job(
 
 @router.get("/", response_model=list[JobRead])
 async def list_jobs(
-    db: AsyncSession = Depends(deps.get_db),
+    response: Response,
+    db: AsyncSession = Depends(deps.get_read_db),
     skip: int = 0,
     limit: int = 10,
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
 ):
     """
-    List all available job postings.
+    List all available job postings, newest first.
+
+    Pass the ``X-Next-Cursor`` header of a full page as ``cursor`` to get the
+    next one; ``skip`` is still accepted but gets slower the deeper it goes.
     """
-    jobs = await job_service.get_jobs(db, skip=skip, limit=limit)
+    if cursor is not None and skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either skip or cursor, not both.",
+        )
+    after = decode_cursor(cursor, datetime, int) if cursor is not None else None
+    jobs = await job_service.get_jobs(db, skip=skip, limit=limit, after=after)
+    await release_connection(db)
+    # Jobs carry no version, so the page is tagged by what each row last changed
+    tag = etags.digest((job.id, job.updated_at) for job in jobs)
+    if not etags.none_match(if_none_match, tag):
+        return etags.not_modified(tag)
+    etags.tag_response(response, tag)
+    set_next_cursor(response, jobs, limit, lambda job: (job.created_at, job.id))
     return jobs
\ No newline at end of file
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from pathlib import Path
@@ -13,69 +13,211 @@ from app.core.file_upload import (
 )
 
 from app.api.v1 import deps
+from app.core import etags
+from app.core.database import release_connection, save
+from app.core.pagination import decode_cursor, set_next_cursor
+from app.core.timing import TimedRoute
 from app.models.user import User
 from app.models.profile import Profile
 from app.services import profile_service, profile_cache
 from app.models.user import UserRole
 from app.schemas.profile import ProfileRead, ProfileCreate, ProfileUpdate
 
-router = APIRouter(redirect_slashes=False)
+router = APIRouter(redirect_slashes=False, route_class=TimedRoute)
 
 # Standard error messages
 PROFILE_NOT_FOUND = "Profile not found"
 
+# Roles that may view any profile; everyone else only sees their own
+PROFILE_VIEWER_ROLES = (UserRole.ADMIN, UserRole.EMPLOYER)
+MAX_BATCH_PROFILES = 100
+
+# Where uploaded avatars are written, relative to the working directory
+AVATAR_UPLOAD_DIR = Path("uploads/avatars")
+
+
+def _profile_key(row: dict) -> tuple[int]:
+    return (row["id"],)
+
+
+def _etag(profile: ProfileRead | Profile) -> str:
+    return etags.etag(profile.id, profile.version)
+
+
+def _if_match_version(if_match: str, profile_id: int) -> int | None:
+    """The version named by an ``If-Match`` holding one strong tag of this profile."""
+    tags = etags.strong_tags(if_match)
+    if len(tags) != 1:
+        return None
+    tag_id, _, version = tags[0].strip('"').partition("-")
+    if tag_id != str(profile_id) or not version.isdigit():
+        return None
+    return int(version)
+
+
+def _conditional(profile: ProfileRead, response: Response, if_none_match: str | None):
+    """The profile, or a bodiless 304 when the client's copy is current."""
+    tag = _etag(profile)
+    if not etags.none_match(if_none_match, tag):
+        return etags.not_modified(tag)
+    etags.tag_response(response, tag)
+    return profile
+
+
 @router.get("/", response_model=list[ProfileRead])
 @router.get("", response_model=list[ProfileRead], include_in_schema=False)
 async def list_profiles(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
-    db: AsyncSession = Depends(deps.get_db),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(deps.get_read_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
-    List profiles with pagination.
+    List profiles in id order.
+
+    Pass the ``X-Next-Cursor`` header of a full page as ``cursor`` to get the
+    next one; ``skip`` is still accepted but gets slower the deeper it goes.
     """
-    cached = await profile_cache.get_profile_list(skip, limit)
+    if cursor is not None and skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either skip or cursor, not both.",
+        )
+    after_id = decode_cursor(cursor, int)[0] if cursor is not None else 0
+    # The first page and cursor pages are cached; deep offset pages are not
+    cacheable = not skip
+    cached = await profile_cache.get_profile_list(after_id, limit) if cacheable else None
     if cached is not None:
+        set_next_cursor(response, cached, limit, _profile_key)
         return cached
 
-    rows = await db.execute(
-        select(
-            Profile.id,
-            Profile.user_id,
-            Profile.headline,
-            Profile.summary,
-            Profile.avatar_url,
-        )
-        .offset(skip)
-        .limit(limit)
-        .order_by(Profile.id)
+    query = select(
+        Profile.id,
+        Profile.user_id,
+        Profile.headline,
+        Profile.summary,
+        Profile.avatar_url,
+        Profile.version,
     )
+    if skip:
+        query = query.offset(skip)
+    else:
+        query = query.where(Profile.id > after_id)
+    rows = await db.execute(query.order_by(Profile.id).limit(limit))
     profile_payload = [dict(row) for row in rows.mappings().all()]
-    await profile_cache.set_profile_list(skip, limit, profile_payload)
+    await release_connection(db)
+    if cacheable:
+        await profile_cache.set_profile_list(after_id, limit, profile_payload)
+    set_next_cursor(response, profile_payload, limit, _profile_key)
     return profile_payload
 
 @router.get("/me", response_model=ProfileRead)
 async def get_my_profile(
-    db: AsyncSession = Depends(deps.get_db),
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(deps.get_read_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
     Get the profile of the current authenticated user.
     """
+    if if_none_match:
+        # Revalidation: the cached version answers it without a query
+        profile_id = await profile_cache.get_last_known_profile_id(current_user.id)
+        cached_profile = await profile_cache.get_profile(profile_id) if profile_id is not None else None
+        if cached_profile is not None and cached_profile.user_id == current_user.id:
+            tag = _etag(cached_profile)
+            if not etags.none_match(if_none_match, tag):
+                return etags.not_modified(tag)
+
     profile = await profile_service.get_profile_by_user_id(db, user_id=current_user.id)
+    await release_connection(db)
     if profile is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found for the current user."
         )
-    return profile
+    profile_read = ProfileRead.model_validate(profile)
+    await profile_cache.set_profile(profile_read, written=False)
+    return _conditional(profile_read, response, if_none_match)
+
+
+@router.get("/batch", response_model=list[ProfileRead])
+async def get_profiles_batch(
+    ids: str = Query(..., description="Comma-separated profile ids"),
+    db: AsyncSession = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    Get several profiles at once, in the order requested; ids without a
+    profile are left out.
+
+    Admins and employers may view any profile, other users only their own;
+    one id the caller may not view fails the whole request with 403.
+    """
+    try:
+        profile_ids = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma-separated list of integers"
+        )
+    if not profile_ids or len(profile_ids) > MAX_BATCH_PROFILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Request between 1 and {MAX_BATCH_PROFILES} profile ids"
+        )
+
+    if current_user.role not in PROFILE_VIEWER_ROLES:
+        # A user owns at most one profile, so anything but that one id is
+        # refused before touching the cache or the database; unknown ids are
+        # refused too, so the answer reveals nothing about them
+        forbidden = HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to view these profiles"
+        )
+        if len(profile_ids) > 1:
+            raise forbidden
+        own_profile = await profile_cache.get_profile(profile_ids[0])
+        if own_profile is None or own_profile.user_id != current_user.id:
+            user_profile = await profile_service.get_profile_by_user_id(db, user_id=current_user.id)
+            await release_connection(db)
+            if user_profile is None or user_profile.id != profile_ids[0]:
+                raise forbidden
+            own_profile = ProfileRead.model_validate(user_profile)
+            await profile_cache.set_profile(own_profile, written=False)
+        found = {own_profile.id: own_profile}
+    else:
+        found = await profile_cache.get_profiles(profile_ids)
+        misses = [profile_id for profile_id in profile_ids if profile_id not in found]
+        if misses:
+            fetched = [
+                ProfileRead.model_validate(profile)
+                for profile in await profile_service.get_profiles_by_ids(db, misses)
+            ]
+            await release_connection(db)
+            await profile_cache.set_profiles(fetched)
+            found.update((profile.id, profile) for profile in fetched)
+
+    profiles = [found[profile_id] for profile_id in profile_ids if profile_id in found]
+
+    async def body():
+        yield b"["
+        for index, profile in enumerate(profiles):
+            yield (b"," if index else b"") + profile.model_dump_json().encode()
+        yield b"]"
+
+    return StreamingResponse(body(), media_type="application/json")
 
 
 @router.get("/{profile_id}", response_model=ProfileRead)
 async def get_profile(
     profile_id: int,
-    db: AsyncSession = Depends(deps.get_db),
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(deps.get_read_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
@@ -84,11 +226,12 @@ async def get_profile(
     """
     cached_profile = await profile_cache.get_profile(profile_id)
 
-    if current_user.role not in [UserRole.ADMIN, UserRole.EMPLOYER]:
+    if current_user.role not in PROFILE_VIEWER_ROLES:
         if cached_profile and getattr(cached_profile, "user_id", None) == current_user.id:
-            return cached_profile
+            return _conditional(cached_profile, response, if_none_match)
 
         user_profile = await profile_service.get_profile_by_user_id(db, user_id=current_user.id)
+        await release_connection(db)
         if not user_profile:
             last_known_id = await profile_cache.get_last_known_profile_id(current_user.id)
             if last_known_id == profile_id:
@@ -106,14 +249,15 @@ async def get_profile(
                 detail="You do not have permission to view this profile"
             )
         profile_read = ProfileRead.model_validate(user_profile)
-        await profile_cache.set_profile(profile_read)
-        return profile_read
+        await profile_cache.set_profile(profile_read, written=False)
+        return _conditional(profile_read, response, if_none_match)
 
     # Fetch the profile once at the beginning
     if cached_profile:
-        return cached_profile
+        return _conditional(cached_profile, response, if_none_match)
 
     profile = await profile_service.get_profile(db, id=profile_id)
+    await release_connection(db)
     if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -121,8 +265,8 @@ async def get_profile(
         )
 
     profile_read = ProfileRead.model_validate(profile)
-    await profile_cache.set_profile(profile_read)
-    return profile_read
+    await profile_cache.set_profile(profile_read, written=False)
+    return _conditional(profile_read, response, if_none_match)
 
 
 @router.post("/", response_model=ProfileRead, status_code=status.HTTP_201_CREATED)
@@ -162,46 +306,59 @@ async def create_profile(
 async def update_profile(
     profile_id: int,
     profile_update: ProfileUpdate,
+    response: Response,
+    if_match: str | None = Header(None),
     db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
     Update a profile's information.
-    """
-    profile = await profile_service.get_profile(db, id=profile_id)
 
-    if profile is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Profile not found"
-        )
-
-    # Authorization check: Ensure the current user owns the profile
-    if profile.user_id != current_user.id and current_user.role != UserRole.ADMIN:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to edit this profile"
+    Send the profile's ``ETag`` as ``If-Match`` (or its ``version`` in the
+    body) to only apply the update if nobody changed the profile since it
+    was read; a stale ``If-Match`` gets 412 and a stale ``version`` 409.
+    """
+    update_data = profile_update.model_dump(exclude_unset=True, exclude={"version"})
+    version = profile_update.version
+    conditional = if_match is not None and if_match.strip() != "*"
+    if conditional:
+        version = _if_match_version(if_match, profile_id)
+
+    updated_profile = None
+    if update_data and not (conditional and version is None):
+        owner_id = None if current_user.role == UserRole.ADMIN else current_user.id
+        updated_profile = await profile_service.update_profile_by_id(
+            db, profile_id, profile_update, owner_id=owner_id, version=version
         )
 
-    # Get the update data, excluding fields that were not set in the request
-    update_data = profile_update.model_dump(exclude_unset=True)
-
-    if not update_data:
+    if updated_profile is None:
+        # Nothing was written; only now look the profile up to say why
+        profile = await profile_service.get_profile(db, id=profile_id)
+        if profile is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found"
+            )
+        if profile.user_id != current_user.id and current_user.role != UserRole.ADMIN:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You do not have permission to edit this profile"
+            )
+        if not update_data:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No fields to update"
+            )
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No fields to update"
+            status_code=status.HTTP_412_PRECONDITION_FAILED if conditional else status.HTTP_409_CONFLICT,
+            detail="Profile was modified by another request",
+            headers={"ETag": _etag(profile)},
         )
 
-    updated_profile = await profile_service.update_profile(db=db, profile=profile, profile_in=profile_update)
-    if updated_profile:
-        profile_read = ProfileRead.model_validate(updated_profile)
-        await profile_cache.set_profile(profile_read)
-        return profile_read
-    await profile_cache.invalidate_profile(profile_id)
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail="Profile not found"
-    )
+    profile_read = ProfileRead.model_validate(updated_profile)
+    await profile_cache.set_profile(profile_read)
+    etags.tag_response(response, _etag(profile_read))
+    return profile_read
 
 
 @router.post("/avatar", status_code=status.HTTP_200_OK)
@@ -226,7 +383,7 @@ async def upload_avatar(
 
     # Prepare file path - in production this would be cloud storage
     # For now, store in a local uploads directory
-    uploads_dir = Path("uploads/avatars")
+    uploads_dir = AVATAR_UPLOAD_DIR
     
     # Sanitize filename to prevent path traversal attacks
     if not file.filename or ".." in file.filename or "/" in file.filename or "\\" in file.filename:
@@ -241,14 +398,12 @@ async def upload_avatar(
 
     try:
         # Save the file
-        await save_upload_file(file, file_path)
+        await save_upload_file(file, file_path, root=uploads_dir)
 
         # Update profile with avatar URL
         avatar_url = f"/avatars/{unique_filename}"  # URL path, not filesystem path
         profile.avatar_url = avatar_url
-        db.add(profile)
-        await db.commit()
-        await db.refresh(profile)
+        await save(db, profile)
 
         profile_read = ProfileRead.model_validate(profile)
         await profile_cache.set_profile(profile_read)
@@ -7,10 +7,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
 from app.api.v1 import deps
+from app.core.timing import TimedRoute
 from app.services import user_service, profile_service
 from app.models.user import UserRole
+from app.core.password_pool import PasswordHashQueueFull
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 def _is_admin(role) -> bool:
@@ -81,6 +83,8 @@ async def update_user(
     try:
         updated_user = await user_service.update_user(db, user=user, user_in=user_in)
         return updated_user
+    except PasswordHashQueueFull:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
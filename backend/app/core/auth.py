@@ -8,12 +8,14 @@ from sqlalchemy import select
 
 from app.models.user import User, USER_STATUS_CACHE
 from app.core import security
+from app.core.config import settings
+from app.core.rehash import rehasher
 
 logger = logging.getLogger(__name__)
 
 
 async def authenticate_user(
-    db: AsyncSession, email: str, password: str
+    db: AsyncSession, email: str, password: str, client: str | None = None
 ) -> User | None:
     """
     Authenticate a user by email and password.
@@ -22,9 +24,13 @@ async def authenticate_user(
         db: The database session.
         email: The user's email.
         password: The user's password.
+        client: Caller identity used for fair admission to the hashing pool.
 
     Returns:
         The user object if authentication is successful, otherwise None.
+
+    Raises:
+        PasswordHashQueueFull: If the hashing pool is saturated.
     """
     """
     Authenticate a user by email and password.
@@ -71,7 +77,9 @@ async def authenticate_user(
 
         # Verify password using the security utilities
         try:
-            verified = security.verify_password(password, user.hashed_password)
+            verified = await security.averify_password(password, user.hashed_password, client=client)
+        except security.PasswordHashQueueFull:
+            raise
         except Exception as e:
             logger.exception("Error verifying password for %s: %s", email, e)
             return None
@@ -81,7 +89,13 @@ async def authenticate_user(
         if not verified:
             return None
 
+        # Upgrade outdated hashes off the request path
+        if settings.PASSWORD_REHASH_ON_LOGIN and security.password_needs_update(user.hashed_password):
+            rehasher.schedule(user.id, password, user.hashed_password, db.bind)
+
         return user
+    except security.PasswordHashQueueFull:
+        raise
     except Exception as e:
         # Log the error but don't expose it to the client
         logger.exception("Authentication error: %s", e)
@@ -0,0 +1,49 @@
+"""
+Fixed-size Bloom filter for set membership with a bounded false-positive rate.
+
+A negative answer is definite; a positive answer is wrong with probability
+about ``error_rate`` while at most ``capacity`` items have been added.
+
+Bit positions are derived from Python's own (keyed SipHash) string hash,
+split into two 32-bit halves for Kirsch-Mitzenmacher double hashing. That
+hash is only stable within one process, so a filter must be built and
+queried in the same worker; it is never shared or persisted. Lookups stop at
+the first unset bit, so most negatives cost one hash and a byte read or two.
+"""
+import math
+
+_MASK64 = (1 << 64) - 1
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+
+    def add(self, item: str) -> None:
+        h = hash(item) & _MASK64
+        h1, h2, num_bits, bits = h & 0xFFFFFFFF, (h >> 32) | 1, self.num_bits, self._bits
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            bits[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+    def __contains__(self, item: str) -> bool:
+        if not self._count:
+            return False
+        h = hash(item) & _MASK64
+        h1, h2, num_bits, bits = h & 0xFFFFFFFF, (h >> 32) | 1, self.num_bits, self._bits
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        """Number of ``add`` calls, counting repeats."""
+        return self._count
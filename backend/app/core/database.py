@@ -1,18 +1,34 @@
-from typing import AsyncIterator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Sequence
+from fastapi import Depends, Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
 from sqlalchemy.engine.url import make_url, URL
 from app.core.config import settings
+from app.core import metrics, security, timing
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
 
 # Build and validate database URL; ensure asyncpg driver for PostgreSQL
 raw_db_url = settings.DATABASE_URL
 if not raw_db_url:
     raise RuntimeError("DATABASE_URL is not set. Provide a valid database connection string.")
 
-url: URL = make_url(raw_db_url)
-if url.drivername.startswith("postgresql") and "+" not in url.drivername:
-    # Enforce async driver for async engine
-    url = url.set(drivername="postgresql+asyncpg")
+def _async_url(raw: str) -> URL:
+    url = make_url(raw)
+    if url.drivername.startswith("postgresql") and "+" not in url.drivername:
+        # Enforce async driver for async engine
+        url = url.set(drivername="postgresql+asyncpg")
+    return url
+
+
+url: URL = _async_url(raw_db_url)
 
 # Configurable SQLAlchemy engine settings
 sqlalchemy_echo = getattr(settings, "SQLALCHEMY_ECHO", False)
@@ -20,17 +36,81 @@ pool_size = settings.SQLALCHEMY_POOL_SIZE if settings.SQLALCHEMY_POOL_SIZE is no
 max_overflow = settings.SQLALCHEMY_MAX_OVERFLOW if settings.SQLALCHEMY_MAX_OVERFLOW is not None else 10
 pool_timeout = settings.SQLALCHEMY_POOL_TIMEOUT if settings.SQLALCHEMY_POOL_TIMEOUT is not None else 30
 
-try:
-    engine = create_async_engine(
-        url.render_as_string(hide_password=False),
-        pool_pre_ping=True,
-        echo=sqlalchemy_echo,
-        pool_size=pool_size,
-        max_overflow=max_overflow,
-        pool_timeout=pool_timeout,
-    )
-except Exception as e:
-    raise RuntimeError(f"Failed to create database engine: {e}") from e
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+
+_CHECKED_OUT_AT = "checked_out_at"
+
+
+def _record_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    connection_record.info[_CHECKED_OUT_AT] = time.perf_counter()
+
+
+def _record_checkin(dbapi_connection, connection_record) -> None:
+    checked_out_at = connection_record.info.pop(_CHECKED_OUT_AT, None)
+    if checked_out_at is not None:
+        metrics.DB_POOL_HOLD_SECONDS.observe(time.perf_counter() - checked_out_at)
+
+
+def instrument_pool_holds(target=Pool) -> None:
+    """
+    Record how long connections stay checked out. Defaults to the Pool class
+    so every pool, including ones created later, is covered.
+    """
+    for name, listener in (("checkout", _record_checkout), ("checkin", _record_checkin)):
+        if not event.contains(target, name, listener):
+            event.listen(target, name, listener)
+
+
+instrument_pool_holds()
+
+def _create_engine(db_url: URL) -> AsyncEngine:
+    try:
+        return create_async_engine(
+            db_url.render_as_string(hide_password=False),
+            pool_pre_ping=True,
+            poolclass=InstrumentedQueuePool,
+            echo=sqlalchemy_echo,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+        )
+    except Exception as e:
+        raise RuntimeError(f"Failed to create database engine: {e}") from e
+
+
+engine = _create_engine(url)
+
+if settings.SERVER_TIMING_ENABLED:
+    timing.instrument_engine()
+
+
+def _pool_samples(read):
+    def collect():
+        yield (), read(engine.pool)
+    return collect
+
+
+metrics.REGISTRY.register_collector(
+    "db_pool_size", "Configured size of the SQLAlchemy pool.", _pool_samples(lambda pool: pool.size())
+)
+metrics.REGISTRY.register_collector(
+    "db_pool_checked_out", "Connections currently checked out of the pool.",
+    _pool_samples(lambda pool: pool.checkedout()),
+)
+metrics.REGISTRY.register_collector(
+    "db_pool_overflow", "Connections open beyond pool_size (negative while below it).",
+    _pool_samples(lambda pool: pool.overflow()),
+)
 
 # Typed session factory
 AsyncSessionLocal: sessionmaker[AsyncSession] = sessionmaker(
@@ -41,15 +121,280 @@ AsyncSessionLocal: sessionmaker[AsyncSession] = sessionmaker(
     autocommit=False,
 )
 
+async def release_connection(session: AsyncSession) -> None:
+    """
+    Hand the session's connection back to the pool once its reads are done.
+
+    A session otherwise keeps its connection from the first query until it is
+    closed after the response is sent, through cache hits, Redis calls and
+    serialization. Ending the read-only transaction returns it right away;
+    loaded objects stay usable (``expire_on_commit=False``) and the next query
+    checks a connection out again. Sessions with pending changes are left as
+    they are, so only call this after reads.
+    """
+    if session.in_transaction() and not (session.new or session.dirty or session.deleted):
+        await session.commit()
+
+async def save(db: AsyncSession, *instances: object) -> None:
+    """
+    Add ``instances`` and commit, rolling back if that fails.
+
+    Ids and server defaults come back through RETURNING (``eager_defaults``
+    on the model base) and sessions keep loaded values across commits, so
+    the instances are complete without a ``refresh()``: one round trip per
+    write.
+    """
+    db.add_all(instances)
+    try:
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+
+# --- Read replicas --- #
+
+# Seconds the replica is behind the primary; 0 when it has replayed all it
+# received, and 0 on a server that is not a replica at all
+_REPLICA_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def _checked_out(target: AsyncEngine) -> int:
+    checkedout = getattr(target.pool, "checkedout", None)
+    return checkedout() if checkedout is not None else 0
+
+
+class Replica:
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.lag: float | None = None
+
+
+class ReplicaSet:
+    """
+    Read replicas for read-only endpoints. Each read goes to the healthy
+    replica with the fewest checked-out connections, starting the scan one
+    replica further each time so ties are spread round-robin. ``check()``
+    takes replicas out of rotation while they lag more than ``max_lag``
+    seconds or can't be reached.
+    """
+
+    def __init__(self, engines: Sequence[AsyncEngine], max_lag: float):
+        self.replicas = [Replica(str(index), replica_engine) for index, replica_engine in enumerate(engines)]
+        self.max_lag = max_lag
+        self._next = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self) -> AsyncEngine | None:
+        """The replica engine to read from, or None when none is healthy."""
+        count = len(self.replicas)
+        if not count:
+            return None
+        start, self._next = self._next, (self._next + 1) % count
+        best, best_load = None, 0
+        for offset in range(count):
+            replica = self.replicas[(start + offset) % count]
+            if not replica.healthy:
+                continue
+            load = _checked_out(replica.engine)
+            if best is None or load < best_load:
+                best, best_load = replica, load
+        return best.engine if best is not None else None
+
+    async def check(self) -> None:
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    replica.lag = float((await conn.execute(_REPLICA_LAG)).scalar() or 0)
+            except Exception as e:
+                logger.warning("Replica %s health check failed: %s", replica.name, e)
+                replica.lag = None
+            healthy = replica.lag is not None and replica.lag <= self.max_lag
+            if healthy != replica.healthy:
+                logger.warning("Replica %s is now %s (lag=%s)", replica.name, "healthy" if healthy else "unhealthy", replica.lag)
+            replica.healthy = healthy
+
+    async def monitor(self, interval: float) -> None:
+        """Re-check replica health every ``interval`` seconds until cancelled."""
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replicas = ReplicaSet(
+    [_create_engine(_async_url(replica_url)) for replica_url in settings.DATABASE_REPLICA_URLS],
+    max_lag=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+)
+
+metrics.REGISTRY.register_collector(
+    "db_replica_lag_seconds", "Replication lag measured by the last replica health check.",
+    lambda: [((replica.name,), replica.lag) for replica in replicas.replicas if replica.lag is not None],
+    labelnames=("replica",),
+)
+metrics.REGISTRY.register_collector(
+    "db_replica_healthy", "Whether the replica currently receives reads (1) or not (0).",
+    lambda: [((replica.name,), int(replica.healthy)) for replica in replicas.replicas],
+    labelnames=("replica",),
+)
+
+# Replica sessions are bound per request to the chosen replica engine
+ReplicaSessionLocal: sessionmaker[AsyncSession] = sessionmaker(
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+    autocommit=False,
+)
+
+
+# --- Read-your-writes --- #
+
+# Session.info keys: who the session works for, and whether it wrote anything
+CALLER_KEY = "caller"
+_WROTE_KEY = "wrote"
+RECENT_WRITE_PREFIX = "db:recent_write:"
+
+# caller -> monotonic deadline; deadlines grow with insertion order
+_recent_writers: "OrderedDict[str, float]" = OrderedDict()
+_tasks: set[asyncio.Task] = set()
+
+
+def caller_key(request: Request) -> str | None:
+    """Identify the caller by the user their bearer token was issued to, if any.
+
+    Keying on the user rather than the token keeps a refreshed token on the
+    primary after a write made with the previous one. Invalid tokens give
+    ``None``; the request is rejected by the auth dependency anyway.
+    """
+    authorization = request.headers.get("Authorization")
+    if not authorization or authorization[:7].lower() != "bearer ":
+        return None
+    try:
+        payload = security.decode_access_token(authorization[7:])
+    except Exception:
+        return None
+    if payload.get("uid") is not None:
+        return f"user:{payload['uid']}"
+    # Tokens issued before the uid claim
+    return f"sub:{payload['sub']}"
+
+
+async def _share_recent_write(caller: str, window: float) -> None:
+    try:
+        with metrics.REDIS_COMMAND_SECONDS.time("set"):
+            await get_redis().set(RECENT_WRITE_PREFIX + caller, 1, px=int(window * 1000))
+    except Exception as e:
+        logger.warning("Failed to share recent write for read-your-writes: %s", e)
+
+
+def mark_recent_write(caller: str) -> None:
+    """Keep ``caller``'s reads on the primary for the read-your-writes window."""
+    window = settings.DATABASE_READ_YOUR_WRITES_SECONDS
+    now = time.monotonic()
+    _recent_writers[caller] = now + window
+    _recent_writers.move_to_end(caller)
+    while _recent_writers:
+        oldest, deadline = next(iter(_recent_writers.items()))
+        if deadline > now:
+            break
+        del _recent_writers[oldest]
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    # Other workers learn of the write through Redis
+    task = loop.create_task(_share_recent_write(caller, window))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def is_recent_writer(caller: str) -> bool:
+    deadline = _recent_writers.get(caller)
+    if deadline is not None and deadline > time.monotonic():
+        return True
+    try:
+        with metrics.REDIS_COMMAND_SECONDS.time("exists"):
+            return bool(await get_redis().exists(RECENT_WRITE_PREFIX + caller))
+    except Exception as e:
+        logger.warning("Read-your-writes lookup failed, reading from the primary: %s", e)
+        return True
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session: Session, flush_context) -> None:
+    session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_dml(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _stick_after_write(session: Session) -> None:
+    if session.info.pop(_WROTE_KEY, False) and replicas:
+        caller = session.info.get(CALLER_KEY)
+        if caller is not None:
+            mark_recent_write(caller)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session: Session) -> None:
+    session.info.pop(_WROTE_KEY, None)
+
+
+def bind_caller(session: AsyncSession, request: Request) -> None:
+    """Record who ``session`` works for, so its writes stick them to the primary.
+
+    Without replicas there is nothing to stick to, so the token is not decoded.
+    """
+    if replicas:
+        session.info[CALLER_KEY] = caller_key(request)
+
+
 # Standard FastAPI dependency to get an async session
-async def get_db() -> AsyncIterator[AsyncSession]:
+async def get_db(request: Request) -> AsyncIterator[AsyncSession]:
     async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            # Session context handles close; explicit block kept for clarity/extension
-            pass
+        bind_caller(session, request)
+        yield session
+
+
+async def get_read_db(db: AsyncSession = Depends(get_db)) -> AsyncIterator[AsyncSession]:
+    """
+    Session for read-only endpoints: a replica when one is healthy and the
+    caller has not written within ``DATABASE_READ_YOUR_WRITES_SECONDS``,
+    otherwise the request's primary session ``db``.
+    """
+    replica_engine = replicas.choose()
+    # Resolved once per request, by get_db
+    caller = db.info.get(CALLER_KEY)
+    if replica_engine is None or (caller is not None and await is_recent_writer(caller)):
+        yield db
+        return
+    async with ReplicaSessionLocal(bind=replica_engine) as session:
+        yield session
+
+
+async def drain() -> None:
+    """Wait for recent writes still being shared through Redis."""
+    if _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
+
 
-# Graceful shutdown helper to dispose engine
+# Graceful shutdown helper to dispose engines
 async def dispose_engine() -> None:
+    await drain()
     await engine.dispose()
+    await replicas.dispose()
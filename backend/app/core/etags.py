@@ -0,0 +1,63 @@
+"""
+Entity tags for conditional requests.
+
+Resources with a version marker get a strong tag built from it, e.g.
+``"12-3"`` for version 3 of profile 12, so the tag of a cached entry is
+known without touching the database. Listings without one get a digest of
+the ``(id, updated_at)`` of every row on the page.
+
+``If-None-Match`` uses the weak comparison (a ``W/`` prefix is ignored) and
+answers 304 before the response model is serialized; ``If-Match`` uses the
+strong comparison, as RFC 9110 requires.
+"""
+import hashlib
+from typing import Any, Iterable
+
+from fastapi import Response, status
+
+# Clients may keep a copy but must revalidate it before each use
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag(*parts: Any) -> str:
+    """Strong entity tag for a resource identified and versioned by ``parts``."""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def digest(rows: Iterable[Iterable[Any]]) -> str:
+    """Strong entity tag for a listing, from the version marker of each row."""
+    h = hashlib.blake2b(digest_size=12)
+    for row in rows:
+        h.update(repr(tuple(row)).encode())
+    return f'"{h.hexdigest()}"'
+
+
+def _tags(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def none_match(if_none_match: str | None, tag: str) -> bool:
+    """Whether ``If-None-Match`` still lets the request through (no tag matches)."""
+    if not if_none_match:
+        return True
+    for candidate in _tags(if_none_match):
+        if candidate == "*" or candidate.removeprefix("W/") == tag:
+            return False
+    return True
+
+
+def strong_tags(if_match: str) -> list[str]:
+    """The strong tags listed in ``If-Match``; weak ones can never match."""
+    return [tag for tag in _tags(if_match) if not tag.startswith("W/")]
+
+
+def not_modified(tag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": tag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def tag_response(response: Response, tag: str) -> None:
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -91,13 +91,14 @@ async def validate_file_content(file: UploadFile) -> None:
                 detail="SVG contains potentially malicious content"
             )
 
-async def save_upload_file(file: UploadFile, destination: Path) -> Path:
+async def save_upload_file(file: UploadFile, destination: Path, root: Path | None = None) -> Path:
     """
     Securely save an uploaded file.
     
     Args:
         file: The uploaded file
         destination: Path where the file should be saved
+        root: Directory the destination must stay within (default: the working directory)
         
     Returns:
         Path to the saved file
@@ -108,7 +109,7 @@ async def save_upload_file(file: UploadFile, destination: Path) -> Path:
         
         # Ensure the resolved path is within the expected directory
         # This prevents path traversal attacks like "../../../etc/passwd"
-        if not str(resolved_destination).startswith(str(Path.cwd().resolve())):
+        if not resolved_destination.is_relative_to((root or Path.cwd()).resolve()):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid file path"
@@ -0,0 +1,180 @@
+"""
+Specialized HS256 JWT codec.
+
+Tokens are only ever issued by this service, with one fixed header, so the
+generic python-jose path (algorithm lookup, JWK construction, option dict
+merging) is wasted work on every login, refresh and uncached request. This
+codec keeps:
+
+- the header segment pre-encoded, so decoding a token that carries it skips
+  header parsing;
+- one keyed ``hmac`` object per secret, copied for each signature instead of
+  re-deriving the key;
+- a reused compact JSON encoder;
+- claim checks ordered cheapest first: presence, then string compares, then
+  the clock.
+
+Tokens are byte-for-byte identical to ``jose.jwt.encode(..., algorithm="HS256")``
+and errors are raised as the same jose exception types with the same messages.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from calendar import timegm
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+ALGORITHM = "HS256"
+
+_json_encoder = json.JSONEncoder(separators=(",", ":"))
+_json_decoder = json.JSONDecoder()
+_TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+_HEADER_SEGMENT = _b64encode(
+    json.dumps({"alg": ALGORITHM, "typ": "JWT"}, separators=(",", ":"), sort_keys=True).encode()
+)
+
+
+def _int_claim(claims: Dict[str, Any], name: str, message: str) -> int:
+    try:
+        return int(claims[name])
+    except (TypeError, ValueError):
+        raise JWTClaimsError(message) from None
+
+
+class HS256Codec:
+    def __init__(self, secret: str):
+        self._mac = hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        """Sign ``claims``; datetime exp/iat/nbf are converted to NumericDate."""
+        for name in _TIME_CLAIMS:
+            value = claims.get(name)
+            if isinstance(value, datetime):
+                # Same NumericDate as jose's timegm(utctimetuple()), cheaper when aware
+                claims[name] = int(value.timestamp() // 1) if value.tzinfo else timegm(value.utctimetuple())
+        signing_input = _HEADER_SEGMENT + b"." + _b64encode(_json_encoder.encode(claims).encode("utf-8"))
+        return (signing_input + b"." + _b64encode(self._sign(signing_input))).decode("ascii")
+
+    def decode(
+        self,
+        token: str,
+        audience: Optional[str],
+        issuer: Optional[str],
+        required: Iterable[str] = (),
+    ) -> Dict[str, Any]:
+        """Verify the signature and registered claims, returning the claims."""
+        raw = token.encode("utf-8") if isinstance(token, str) else token
+        signing_input, _, crypto_segment = raw.rpartition(b".")
+        header_segment, dot, claims_segment = signing_input.partition(b".")
+        if not dot:
+            raise JWTError("Not enough segments")
+        if header_segment != _HEADER_SEGMENT:
+            self._check_header(header_segment)
+
+        try:
+            signature = _b64decode(crypto_segment)
+        except (TypeError, binascii.Error):
+            raise JWTError("Invalid crypto padding") from None
+        if not hmac.compare_digest(self._sign(signing_input), signature):
+            raise JWTError("Signature verification failed.")
+
+        try:
+            claims = _json_decoder.decode(_b64decode(claims_segment).decode("utf-8"))
+        except (TypeError, binascii.Error):
+            raise JWTError("Invalid payload padding") from None
+        except ValueError as e:
+            raise JWTError("Invalid payload string: %s" % e) from None
+        if not isinstance(claims, dict):
+            raise JWTError("Invalid payload string: must be a json object")
+
+        self._validate(claims, audience, issuer, required)
+        return claims
+
+    @staticmethod
+    def _check_header(header_segment: bytes) -> None:
+        try:
+            header = json.loads(_b64decode(header_segment))
+        except (TypeError, binascii.Error):
+            raise JWTError("Invalid header padding") from None
+        except ValueError as e:
+            raise JWTError("Invalid header string: %s" % e) from None
+        if not isinstance(header, dict):
+            raise JWTError("Invalid header string: must be a json object")
+        alg = header.get("alg")
+        if not alg:
+            raise JWTError("No algorithm was specified in the JWS header.")
+        if alg != ALGORITHM:
+            raise JWTError("The specified alg value is not allowed")
+
+    @staticmethod
+    def _validate(
+        claims: Dict[str, Any],
+        audience: Optional[str],
+        issuer: Optional[str],
+        required: Iterable[str],
+    ) -> None:
+        # Presence and type checks
+        for name in required:
+            if name not in claims:
+                raise JWTError('missing required key "%s" among claims' % name)
+        if "sub" in claims and not isinstance(claims["sub"], str):
+            raise JWTClaimsError("Subject must be a string.")
+        if "jti" in claims and not isinstance(claims["jti"], str):
+            raise JWTClaimsError("JWT ID must be a string.")
+        if "at_hash" in claims:
+            raise JWTClaimsError("No access_token provided to compare against at_hash claim.")
+
+        # String comparisons
+        if issuer is not None and claims.get("iss") != issuer:
+            raise JWTClaimsError("Invalid issuer")
+        if "aud" in claims:
+            audiences = claims["aud"]
+            if isinstance(audiences, str):
+                if audiences != audience:
+                    raise JWTClaimsError("Invalid audience")
+            elif not isinstance(audiences, list) or any(not isinstance(a, str) for a in audiences):
+                raise JWTClaimsError("Invalid claim format in token")
+            elif audience not in audiences:
+                raise JWTClaimsError("Invalid audience")
+
+        # Clock checks
+        if "iat" in claims:
+            _int_claim(claims, "iat", "Issued At claim (iat) must be an integer.")
+        now = int(time.time())
+        if "nbf" in claims:
+            if _int_claim(claims, "nbf", "Not Before claim (nbf) must be an integer.") > now:
+                raise JWTClaimsError("The token is not yet valid (nbf)")
+        if "exp" in claims:
+            if _int_claim(claims, "exp", "Expiration Time claim (exp) must be an integer.") < now:
+                raise ExpiredSignatureError("Signature has expired.")
+
+
+_codecs: Dict[str, HS256Codec] = {}
+
+
+def get_codec(secret: str) -> HS256Codec:
+    """The codec for ``secret``, created once per key."""
+    codec = _codecs.get(secret)
+    if codec is None:
+        codec = _codecs[secret] = HS256Codec(secret)
+    return codec
@@ -0,0 +1,241 @@
+"""
+In-process metrics registry rendered in the Prometheus text format.
+
+Recording is a dict lookup plus a few integer increments on the event loop
+thread, with no locks. Every worker process keeps its own registry and is
+scraped separately; Prometheus aggregates across workers by ``instance``.
+
+Values that already live elsewhere (pool checkouts, cache sizes, queue depth)
+are not mirrored on the hot path. Their owners register a collector that is
+only called when ``/metrics`` is scraped.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Labels, float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in list(self._values.items()):
+            yield self.name, labels, value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram. Each series is a flat list of per-bucket
+    counts followed by the running sum and count.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 3)
+        # Buckets are stored non-cumulatively and summed on render; the last
+        # bucket slot is +Inf
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(series[-1]) if series else 0
+
+    def sum(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[-2] if series else 0.0
+
+    def samples(self) -> Iterable[Sample]:
+        bounds = (*self.buckets, float("inf"))
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                yield f"{self.name}_bucket", (*labels, _format_value(bound)), cumulative
+            yield f"{self.name}_sum", labels, series[-2]
+            yield f"{self.name}_count", labels, series[-1]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+        # name -> (type, help, labelnames, callback yielding (labels, value))
+        self._collectors: Dict[str, Tuple[str, str, Tuple[str, ...], Callable[[], Iterable]]] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Iterable[Tuple[Labels, float]]],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge",
+    ) -> None:
+        """Register a metric whose samples are computed at scrape time."""
+        self._collectors[name] = (kind, documentation, tuple(labelnames), callback)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                names = metric.labelnames
+                if sample_name.endswith("_bucket"):
+                    names = (*names, "le")
+                lines.append(f"{sample_name}{_format_labels(names, labels)} {_format_value(value)}")
+        for name, (kind, documentation, labelnames, callback) in self._collectors.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in callback():
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Request latency by matched route template and status class.",
+    ("method", "route", "status"),
+)
+REDIS_COMMAND_SECONDS = REGISTRY.histogram(
+    "redis_command_duration_seconds",
+    "Latency of Redis round trips issued by the application.",
+    ("command",),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total",
+    "In-process cache lookups by cache and result (hit, miss or coalesced).",
+    ("cache", "result"),
+)
+CACHE_EVICTIONS = REGISTRY.counter(
+    "cache_evictions_total",
+    "Entries evicted from bounded in-process caches to stay within their size.",
+    ("cache",),
+)
+DB_POOL_WAIT_SECONDS = REGISTRY.histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the SQLAlchemy pool.",
+)
+DB_POOL_HOLD_SECONDS = REGISTRY.histogram(
+    "db_pool_hold_seconds",
+    "Time each connection stayed checked out of the SQLAlchemy pool.",
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_class = "5xx"
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_class
+            if message["type"] == "http.response.start":
+                status_class = f"{message['status'] // 100}xx"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # FastAPI records the matched APIRoute in the (shared) scope
+            route = scope.get("route")
+            template = getattr(route, "path_format", None) or UNMATCHED_ROUTE
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, scope["method"], template, status_class
+            )
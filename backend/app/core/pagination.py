@@ -0,0 +1,59 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor holds the sort key of the last row of a page. The next page
+continues with ``WHERE key > cursor`` (or ``<`` for descending listings),
+which stays on the index however deep the client pages, where
+``OFFSET skip`` makes Postgres read and discard ``skip`` rows first.
+
+Cursors are URL-safe base64 of a compact JSON array; datetimes are stored
+as ISO 8601 strings. They are not signed: a tampered cursor only moves the
+caller to another position in a listing they may read anyway.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+_json_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row returned."""
+    key = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(_json_encoder.encode(key).encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, *types: type) -> Tuple[Any, ...]:
+    """
+    Decode a cursor whose key has the given column ``types``.
+
+    Raises HTTPException(400) when the cursor is malformed.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(key, list) or len(key) != len(types):
+            raise ValueError("wrong key length")
+        values = []
+        for value, type_ in zip(key, types):
+            if type_ is datetime:
+                value = datetime.fromisoformat(value)
+            elif type(value) is not type_:
+                raise ValueError(f"expected {type_.__name__}")
+            values.append(value)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+    return tuple(values)
+
+
+def set_next_cursor(
+    response: Response, page: Sequence[Any], limit: int, key: Callable[[Any], Tuple[Any, ...]]
+) -> None:
+    """Advertise the cursor after ``key(page[-1])`` when the page is full."""
+    if limit > 0 and len(page) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(page[-1]))
@@ -0,0 +1,225 @@
+"""
+Bounded worker pool and admission control for password hashing.
+
+bcrypt at 12 rounds costs ~250ms of CPU per call. Running it on the event
+loop stalls every other request on the worker, and queueing it without a
+bound lets a credential-stuffing burst pile up thousands of jobs. Work is
+therefore admitted through a small queue in front of the pool:
+
+- at most ``workers`` jobs run at once, so the executor itself never queues;
+- at most ``PASSWORD_HASH_QUEUE_MAX`` jobs wait; each identified client (the
+  address from ``rate_limit.client_ip``, which only believes
+  ``X-Forwarded-For`` from ``TRUSTED_PROXIES``) is
+  guaranteed ``PASSWORD_HASH_QUEUE_PER_CLIENT`` of those slots and may only
+  go beyond that while the queue is less than half full, so many users
+  behind one address are not shed while the other half stays open to
+  everyone else;
+- waiting clients are served round-robin so one noisy client cannot starve
+  the others;
+- a job that cannot start within ``PASSWORD_HASH_QUEUE_TIMEOUT`` seconds is
+  rejected with ``PasswordHashQueueFull`` instead of waiting indefinitely.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+
+T = TypeVar("T")
+
+ANONYMOUS_CLIENT = "anonymous"
+
+
+class PasswordHashQueueFull(Exception):
+    """Raised when hashing work is shed instead of queued."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hashing queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class HashAdmissionQueue:
+    """Round-robin, per-client bounded admission in front of the hashing pool."""
+
+    def __init__(self, concurrency: int, max_queue: int, per_client: int, max_wait: float):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.per_client = per_client
+        self.max_wait = max_wait
+        self._running = 0
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._depth = 0
+        # Counters for sizing the pool
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.max_wait))
+
+    def _record_wait(self, waited: float) -> None:
+        self.admitted += 1
+        self.wait_seconds_total += waited
+        if waited > self.wait_seconds_max:
+            self.wait_seconds_max = waited
+
+    async def acquire(self, client: str) -> None:
+        if self._running < self.concurrency and not self._depth:
+            self._running += 1
+            self._record_wait(0.0)
+            return
+
+        queue = self._waiting.get(client)
+        # Callers without an identity share one bucket bounded only by max_queue
+        over_client_limit = (
+            client != ANONYMOUS_CLIENT
+            and queue is not None
+            and len(queue) >= self.per_client
+            and self._depth >= self.max_queue // 2
+        )
+        if self._depth >= self.max_queue or over_client_limit:
+            self.rejected += 1
+            raise PasswordHashQueueFull(self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._waiting[client] = deque()
+        queue.append(future)
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if self._discard(client, future):
+                self.timed_out += 1
+                raise PasswordHashQueueFull(self._retry_after()) from None
+            # The slot was handed over just as the timeout fired; keep it
+        except asyncio.CancelledError:
+            # Slot may already have been handed over; pass it on if so
+            if not self._discard(client, future) and future.done() and not future.cancelled():
+                self.release()
+            raise
+        self._record_wait(time.perf_counter() - started)
+
+    def _discard(self, client: str, future: asyncio.Future) -> bool:
+        """Remove a waiter that gave up; returns True if it was still queued."""
+        queue = self._waiting.get(client)
+        if queue is None or future not in queue:
+            return False
+        queue.remove(future)
+        self._depth -= 1
+        if not queue:
+            del self._waiting[client]
+        return True
+
+    def release(self) -> None:
+        # Hand the slot straight to the next client in round-robin order
+        while self._waiting:
+            client, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            self._depth -= 1
+            if queue:
+                self._waiting.move_to_end(client)
+            else:
+                del self._waiting[client]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.concurrency,
+            "in_flight": self._running,
+            "queue_depth": self._depth,
+            "queue_clients": len(self._waiting),
+            "queue_limit": self.max_queue,
+            "admitted_total": self.admitted,
+            "rejected_total": self.rejected,
+            "timed_out_total": self.timed_out,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+_executor: Executor | None = None
+_admission: HashAdmissionQueue | None = None
+
+
+def _pool_size() -> int:
+    return settings.PASSWORD_HASH_WORKERS or min(4, os.cpu_count() or 1)
+
+
+def get_executor() -> Executor:
+    """Lazily create the password hashing pool sized from settings."""
+    global _executor
+    if _executor is None:
+        workers = _pool_size()
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwd-hash")
+    return _executor
+
+
+def get_admission() -> HashAdmissionQueue:
+    global _admission
+    if _admission is None:
+        _admission = HashAdmissionQueue(
+            concurrency=_pool_size(),
+            max_queue=settings.PASSWORD_HASH_QUEUE_MAX,
+            per_client=settings.PASSWORD_HASH_QUEUE_PER_CLIENT,
+            max_wait=settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+        )
+    return _admission
+
+
+async def run(func: Callable[..., T], *args: Any, client: str | None = None) -> T:
+    """Run a hashing function in the pool once admitted for ``client``."""
+    admission = get_admission()
+    await admission.acquire(client or ANONYMOUS_CLIENT)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        admission.release()
+
+
+def stats() -> Dict[str, Any]:
+    """Queue depth and wait-time counters for the hashing pool."""
+    return get_admission().stats()
+
+
+def shutdown() -> None:
+    """Release the hashing pool workers (called on application shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _stat(name: str):
+    return lambda: [((), stats()[name])]
+
+
+REGISTRY.register_collector(
+    "password_hash_queue_depth", "Hashing jobs waiting for a worker.", _stat("queue_depth")
+)
+REGISTRY.register_collector(
+    "password_hash_in_flight", "Hashing jobs currently running.", _stat("in_flight")
+)
+REGISTRY.register_collector(
+    "password_hash_rejected_total", "Hashing jobs shed because the queue was full or timed out.",
+    lambda: [((), stats()["rejected_total"] + stats()["timed_out_total"])], kind="counter",
+)
+REGISTRY.register_collector(
+    "password_hash_wait_seconds_total", "Total time admitted jobs spent queued.",
+    _stat("wait_seconds_total"), kind="counter",
+)
@@ -0,0 +1,230 @@
+"""
+Two-tier principal cache shared by all workers.
+
+- L1 is the in-process ``VerifiedTokenCache`` (keyed by token digest).
+- L2 is Redis: ``auth:principal:{digest}`` holds the serialized principal
+  for up to ``PRINCIPAL_CACHE_L2_TTL_SECONDS`` (and never past the token's
+  ``exp``), so a token verified by one worker is a cache hit on every other.
+  ``auth:principal:user:{id}`` indexes a user's L2 entries for invalidation.
+- ``auth:principal:generation`` counts invalidations. A worker reads it
+  before loading a principal and only writes the result to L2 if it is
+  unchanged, so a row read just before a commit cannot be cached after that
+  commit's invalidation has already run.
+
+When a ``User`` row changes, the model's ``after_update`` listener queues the
+change on the session. Once the transaction commits, this worker drops the
+user's L1 entries, deletes their L2 entries and publishes the change on
+``auth:principal:invalidate``. Every worker subscribed via ``listen()`` drops
+its own L1 entries and refreshes ``USER_STATUS_CACHE``.
+
+Publishing only after commit keeps other workers from re-caching the old row
+before the change is visible. Redis failures fall back to the loader; the L1
+TTL still bounds staleness if an invalidation is missed.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Generic, Optional, Tuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.metrics import REDIS_COMMAND_SECONDS
+from app.core.redis_client import get_redis
+from app.core.token_cache import Loader, VerifiedTokenCache
+from app.models.user import USER_CHANGES_KEY, USER_STATUS_CACHE
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CHANNEL = "auth:principal:invalidate"
+KEY_PREFIX = "auth:principal:"
+GENERATION_KEY = KEY_PREFIX + "generation"
+
+# Delete every L2 entry indexed for the user and the index itself, then bump
+# the generation so loads already in flight do not write their result back
+_DROP_USER = """
+local digests = redis.call('SMEMBERS', KEYS[1])
+for _, digest in ipairs(digests) do
+    redis.call('DEL', ARGV[1] .. digest)
+end
+redis.call('DEL', KEYS[1])
+redis.call('INCR', KEYS[2])
+return #digests
+"""
+
+# Store an entry and index it, unless an invalidation ran since ARGV[4] was read
+_STORE_IF_CURRENT = """
+if (redis.call('GET', KEYS[3]) or '0') ~= ARGV[4] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+redis.call('SADD', KEYS[2], ARGV[3])
+redis.call('PEXPIRE', KEYS[2], ARGV[5])
+return 1
+"""
+
+
+def _user_index_key(user_id: int) -> str:
+    return f"{KEY_PREFIX}user:{user_id}"
+
+
+class PrincipalCache(Generic[T]):
+    def __init__(
+        self,
+        local: VerifiedTokenCache[T],
+        dumps: Callable[[T], dict],
+        loads: Callable[[dict], T],
+        user_id: Callable[[T], int],
+        l2_ttl: float,
+        shared: bool = True,
+    ):
+        self.local = local
+        self.shared = shared
+        self.dumps = dumps
+        self.loads = loads
+        self.user_id = user_id
+        self.l2_ttl = l2_ttl
+
+    async def get_or_load(self, token: str, loader: Loader) -> T:
+        """L1, then L2, then ``loader``; results are written back to both tiers."""
+        if not self.shared:
+            return await self.local.get_or_load(token, loader)
+        return await self.local.get_or_load(token, lambda: self._load_shared(token, loader))
+
+    async def _load_shared(self, token: str, loader: Loader) -> Tuple[T, Optional[float]]:
+        key = KEY_PREFIX + self.local.digest(token).hex()
+        try:
+            with REDIS_COMMAND_SECONDS.time("mget"):
+                raw, generation = await get_redis().mget(key, GENERATION_KEY)
+        except Exception as e:
+            logger.debug("Principal L2 lookup failed: %s", e)
+            return await loader()
+
+        if raw is not None:
+            metrics.CACHE_REQUESTS.inc("principal_l2", "hit")
+            entry = json.loads(raw)
+            return self.loads(entry["principal"]), entry["exp"]
+
+        metrics.CACHE_REQUESTS.inc("principal_l2", "miss")
+        value, exp = await loader()
+        await self._store_shared(key, value, exp, generation or "0")
+        return value, exp
+
+    async def _store_shared(self, key: str, value: T, exp: Optional[float], generation: str) -> None:
+        """Write ``value`` to L2 if the generation is still the one read before loading it."""
+        ttl = self.l2_ttl
+        if exp is not None:
+            ttl = min(ttl, exp - time.time())
+        ttl_ms = int(ttl * 1000)
+        if ttl_ms <= 0:
+            return
+        index = _user_index_key(self.user_id(value))
+        payload = json.dumps({"principal": self.dumps(value), "exp": exp})
+        try:
+            with REDIS_COMMAND_SECONDS.time("eval"):
+                await get_redis().eval(
+                    _STORE_IF_CURRENT, 3, key, index, GENERATION_KEY,
+                    payload, ttl_ms, key[len(KEY_PREFIX):], generation, int(self.l2_ttl * 1000),
+                )
+        except Exception as e:
+            logger.debug("Principal L2 write failed: %s", e)
+
+    def drop_local(self, user_id: int) -> int:
+        return self.local.invalidate(lambda value: self.user_id(value) == user_id)
+
+    async def invalidate_user(self, change: dict) -> None:
+        """Drop the user's entries everywhere and notify the other workers."""
+        try:
+            redis = get_redis()
+            with REDIS_COMMAND_SECONDS.time("eval"):
+                await redis.eval(_DROP_USER, 2, _user_index_key(change["id"]), GENERATION_KEY, KEY_PREFIX)
+            # Again, in case a request re-filled L1 from L2 before it was cleared
+            self.drop_local(change["id"])
+            with REDIS_COMMAND_SECONDS.time("publish"):
+                await redis.publish(CHANNEL, json.dumps(change))
+        except Exception as e:
+            logger.error("Failed to publish principal invalidation for user %s: %s", change["id"], e)
+
+    def apply(self, change: dict) -> None:
+        """Apply an invalidation received from another worker."""
+        self.drop_local(change["id"])
+        if change.get("email"):
+            USER_STATUS_CACHE[change["email"]] = (
+                change["id"],
+                datetime.fromisoformat(change["updated_at"]),
+                change["is_active"],
+            )
+
+    async def listen(self) -> None:
+        """Consume invalidations from other workers until cancelled."""
+        from redis.asyncio import Redis
+
+        while True:
+            subscriber = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            pubsub = subscriber.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.apply(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Principal invalidation subscription lost, retrying: %s", e)
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+                await subscriber.aclose()
+
+
+# --- Publishing changes after commit --- #
+
+_registered: list[PrincipalCache] = []
+_tasks: set[asyncio.Task] = set()
+
+
+def register(cache: PrincipalCache) -> PrincipalCache:
+    """Have committed ``User`` changes invalidate ``cache``."""
+    _registered.append(cache)
+    return cache
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    changes = session.info.pop(USER_CHANGES_KEY, None)
+    if not changes or not _registered:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Synchronous use outside the app (scripts, migrations): local only
+        for cache in _registered:
+            for change in changes.values():
+                cache.drop_local(change["id"])
+        return
+    for cache in _registered:
+        for change in changes.values():
+            # Local entries go now; Redis work must not block the commit
+            cache.drop_local(change["id"])
+            if not cache.shared:
+                continue
+            task = loop.create_task(cache.invalidate_user(change))
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(USER_CHANGES_KEY, None)
+
+
+async def drain() -> None:
+    """Wait for in-flight invalidations (used on shutdown and in tests)."""
+    if _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
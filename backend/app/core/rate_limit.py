@@ -1,116 +1,575 @@
 """Rate limiting middleware for the FastAPI application."""
-from fastapi import HTTPException, Request, status
+from fastapi import Request, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Receive, Scope, Send
 from redis.asyncio import Redis
-from typing import Tuple, Dict
-import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, NamedTuple, Tuple, Type
+import asyncio
+import functools
+import ipaddress
+import itertools
 import logging
-from app.core import config
+import math
+import time
+import uuid
+from app.core import config, security
+from app.core.metrics import REDIS_COMMAND_SECONDS, UNMATCHED_ROUTE
 
 logger = logging.getLogger(__name__)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitResult(NamedTuple):
+    limited: bool
+    remaining: int
+    retry_after: int  # seconds
+
+
+class RateLimitAlgorithm:
+    """A rate-limit strategy executed atomically in Redis with one EVALSHA.
+
+    Scripts take ``KEYS[1]`` = storage key and ``ARGV`` = now_ms, window_ms,
+    max_requests (plus any extra args) and return
+    ``{limited (0|1), remaining, retry_after_ms}``.
+    """
+
+    name: str = ""
+    script: str = ""
+
+    def __init__(self, redis: Redis):
+        # register_script caches the SHA and uses EVALSHA, falling back to EVAL
+        # only if the script cache was flushed on the server.
+        self._script = redis.register_script(self.script)
+
+    def storage_key(self, key: str) -> str:
+        # Namespaced per algorithm so switching algorithms never hits WRONGTYPE
+        return f"{key}:{self.name}"
+
+    def extra_args(self, now_ms: int) -> list:
+        return []
+
+    async def hit(
+        self, key: str, max_requests: int, window: int, now_ms: int | None = None
+    ) -> RateLimitResult:
+        """Count one request against ``key`` and report whether it is limited."""
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        with REDIS_COMMAND_SECONDS.time("evalsha"):
+            limited, remaining, retry_after_ms = await self._script(
+                keys=[self.storage_key(key)],
+                args=[now_ms, window * 1000, max_requests, *self.extra_args(now_ms)],
+            )
+        if limited:
+            return RateLimitResult(True, 0, max(1, math.ceil(int(retry_after_ms) / 1000)))
+        return RateLimitResult(False, int(remaining), 0)
+
+
+class SlidingLog(RateLimitAlgorithm):
+    """Exact sliding log: one sorted-set member per admitted request.
+
+    Accurate, but memory per key grows with the limit. Kept as the reference
+    the approximate algorithms are measured against.
+    """
+
+    name = "log"
+    script = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local retry_after = window
+    if oldest[2] then
+        retry_after = tonumber(oldest[2]) + window - now
+    end
+    return {1, 0, retry_after}
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return {0, limit - count - 1, 0}
+"""
+
+    def __init__(self, redis: Redis):
+        super().__init__(redis)
+        self._member_prefix = uuid.uuid4().hex[:8]
+        self._member_seq = itertools.count()
+
+    def extra_args(self, now_ms: int) -> list:
+        # Members must be unique so requests in the same millisecond are not collapsed
+        return [f"{now_ms}-{self._member_prefix}-{next(self._member_seq)}"]
+
+
+class SlidingWindowCounter(RateLimitAlgorithm):
+    """Sliding window approximated from two fixed-window counters.
+
+    The previous window's count is weighted by how much of it still overlaps
+    the sliding window. State is a three-field hash per key (window index,
+    current count, previous count), so memory is constant per client.
+    """
+
+    name = "swc"
+    script = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local current = math.floor(now / window)
+local state = redis.call('HMGET', key, 'w', 'c', 'p')
+local w = tonumber(state[1])
+local count = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+if w == nil or w < current - 1 then
+    count, previous = 0, 0
+elseif w == current - 1 then
+    count, previous = 0, count
+end
+local remaining_in_window = window - (now - current * window)
+local estimate = previous * remaining_in_window / window + count
+if estimate + 1 > limit then
+    redis.call('HSET', key, 'w', current, 'c', count, 'p', previous)
+    redis.call('PEXPIRE', key, window * 2)
+    local retry_after = remaining_in_window
+    if count + 1 <= limit and previous > 0 then
+        retry_after = remaining_in_window - (limit - count - 1) * window / previous
+    end
+    return {1, 0, math.ceil(retry_after)}
+end
+count = count + 1
+redis.call('HSET', key, 'w', current, 'c', count, 'p', previous)
+redis.call('PEXPIRE', key, window * 2)
+return {0, math.floor(limit - estimate - 1), 0}
+"""
+
+
+class GCRA(RateLimitAlgorithm):
+    """Generic cell rate algorithm (a token bucket stored as one timestamp).
+
+    Requests are spaced ``window / max_requests`` apart with a burst of up to
+    ``max_requests``; the only state is the theoretical arrival time.
+    """
+
+    name = "gcra"
+    script = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local emission = window / limit
+local tat = tonumber(redis.call('GET', key)) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + emission
+local allow_at = new_tat - window
+if allow_at > now then
+    return {1, 0, math.ceil(allow_at - now)}
+end
+redis.call('SET', key, string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {0, math.floor((now - allow_at) / emission), 0}
+"""
+
+
+RATE_LIMIT_ALGORITHMS: Dict[str, Type[RateLimitAlgorithm]] = {
+    "sliding_log": SlidingLog,
+    "sliding_window_counter": SlidingWindowCounter,
+    "gcra": GCRA,
+}
+
+
+def get_algorithm(name: str, redis: Redis) -> RateLimitAlgorithm:
+    """Instantiate a rate-limit algorithm by its configured name."""
+    try:
+        return RATE_LIMIT_ALGORITHMS[name](redis)
+    except KeyError:
+        raise ValueError(
+            f"Unknown rate limit algorithm '{name}'. "
+            f"Choose one of: {', '.join(RATE_LIMIT_ALGORITHMS)}"
+        ) from None
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    requests: int
+    window: int  # seconds
+
+
+def rate_limit_policy(requests: int, window: int):
+    """Attach a rate-limit policy to an endpoint function.
+
+    Apply below the router decorator::
+
+        @router.post("/token")
+        @rate_limit_policy(5, 60)
+        async def login(...): ...
+
+    Limits configured on the middleware for the same route template take
+    precedence, so deployments can still tune them.
+    """
+    def decorator(endpoint):
+        endpoint.__rate_limit_policy__ = RateLimitPolicy(requests, window)
+        return endpoint
+    return decorator
+
+
+class RouteLimitTable:
+    """Precomputed mapping from raw request paths to route templates and limits.
+
+    Static paths resolve with a dict lookup; parameterised routes are matched
+    against their compiled path regex. Paths that match no route share one
+    bucket, so the number of keys per client is bounded by the route count.
+    """
+
+    def __init__(
+        self,
+        routes: Iterable[BaseRoute],
+        rate_limits: Dict[str, Tuple[int, int]],
+        default_rate_limit: Tuple[int, int],
+    ):
+        self.default_rate_limit = default_rate_limit
+        self._static: Dict[str, list] = {}
+        self._dynamic: list = []
+        for route in routes:
+            template = getattr(route, "path", None)
+            regex = getattr(route, "path_regex", None)
+            if template is None or regex is None:
+                continue
+            policy = getattr(getattr(route, "endpoint", None), "__rate_limit_policy__", None)
+            if template in rate_limits:
+                limit = rate_limits[template]
+            elif policy is not None:
+                limit = (policy.requests, policy.window)
+            else:
+                limit = default_rate_limit
+            entry = (getattr(route, "methods", None), template, limit)
+            if "{" in template:
+                self._dynamic.append((regex, entry))
+            else:
+                self._static.setdefault(template, []).append(entry)
+
+    @staticmethod
+    def _pick(entries: list, method: str) -> Tuple[str, Tuple[int, int]]:
+        for methods, template, limit in entries:
+            if methods is None or method in methods:
+                return template, limit
+        _, template, limit = entries[0]
+        return template, limit
+
+    def resolve(self, method: str, path: str) -> Tuple[str, Tuple[int, int]]:
+        """Return (route template, (max_requests, window)) for a request."""
+        entries = self._static.get(path)
+        if entries:
+            return self._pick(entries, method)
+        matched = [entry for regex, entry in self._dynamic if regex.match(path)]
+        if matched:
+            return self._pick(matched, method)
+        return UNMATCHED_ROUTE, self.default_rate_limit
+
+
+class _LocalWindow:
+    """Per-key state for the hybrid limiter (one worker's view)."""
+
+    __slots__ = ("max_requests", "window", "window_id", "count", "previous", "pending", "tokens", "updated")
+
+    def __init__(self, max_requests: int, window: int, now: float):
+        self.max_requests = max_requests
+        self.window = window
+        self.window_id = int(now // window)
+        self.count = 0  # global count for the current window as of the last sync
+        self.previous = 0  # global count for the previous window
+        self.pending = 0  # admitted locally but not yet synced
+        self.tokens = float(max_requests)
+        self.updated = now
+
+
+class HybridRateLimiter:
+    """In-process limiter that synchronises with Redis in periodic batches.
+
+    Each worker decides locally with a token bucket plus a sliding-window
+    estimate built from the last known global counts. Locally admitted
+    requests are pushed to Redis with one pipelined INCRBY per active key
+    every ``sync_interval`` seconds, which also pulls back the fleet-wide
+    totals. Limits are therefore approximately global while Redis sees one
+    round trip per interval instead of one per request.
+
+    If a sync fails, the worker falls back to enforcing its share of each
+    limit (``max_requests / workers``) until Redis is reachable again.
+    """
+
+    def __init__(self, redis: Redis, sync_interval: float, workers: int):
+        self.redis = redis
+        self.sync_interval = sync_interval
+        self.workers = max(1, workers)
+        self.healthy = True
+        self._states: Dict[str, _LocalWindow] = {}
+        self._next_sync = 0.0
+        self._sync_task: asyncio.Task | None = None
+        # Counters for observing how much work stays local
+        self.decisions = 0
+        self.syncs = 0
+
+    @staticmethod
+    def _roll(state: _LocalWindow, now: float) -> None:
+        current = int(now // state.window)
+        if current == state.window_id:
+            return
+        if current == state.window_id + 1:
+            state.previous = state.count + state.pending
+        else:
+            state.previous = 0
+        state.count = 0
+        state.pending = 0
+        state.window_id = current
+
+    def hit(self, key: str, max_requests: int, window: int, now: float | None = None) -> RateLimitResult:
+        """Decide locally whether the request is allowed; never touches Redis."""
+        if now is None:
+            now = time.time()
+        self.decisions += 1
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _LocalWindow(max_requests, window, now)
+        self._roll(state, now)
+
+        share = max_requests if self.healthy else max_requests / self.workers
+        rate = share / window
+        state.tokens = min(share, state.tokens + (now - state.updated) * rate)
+        state.updated = now
+
+        remaining_in_window = window - (now - state.window_id * window)
+        estimate = state.previous * remaining_in_window / window + state.count + state.pending
+        if self.healthy and estimate + 1 > max_requests:
+            return RateLimitResult(True, 0, max(1, math.ceil(remaining_in_window)))
+        if state.tokens < 1:
+            return RateLimitResult(True, 0, max(1, math.ceil((1 - state.tokens) / rate)))
+
+        state.tokens -= 1
+        state.pending += 1
+        remaining = state.tokens if not self.healthy else min(state.tokens, max_requests - estimate - 1)
+        return RateLimitResult(False, max(0, int(remaining)), 0)
+
+    def maybe_sync(self) -> None:
+        """Schedule a background batch sync if one is due and none is running."""
+        now = time.monotonic()
+        if now < self._next_sync or (self._sync_task is not None and not self._sync_task.done()):
+            return
+        self._next_sync = now + self.sync_interval
+        self._sync_task = asyncio.create_task(self.sync())
+
+    async def sync(self, now: float | None = None) -> None:
+        """Push pending counts and pull global totals for all active keys."""
+        if now is None:
+            now = time.time()
+        batch = []
+        for key, state in list(self._states.items()):
+            self._roll(state, now)
+            if not (state.pending or state.count or state.previous):
+                # Idle for two windows: nothing left to enforce locally
+                del self._states[key]
+                continue
+            batch.append((key, state, state.window_id, state.pending))
+        if not batch:
+            return
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, state, window_id, pending in batch:
+                    current_key = f"{key}:hybrid:{window_id}"
+                    pipe.incrby(current_key, pending)
+                    pipe.pexpire(current_key, state.window * 2000)
+                    pipe.get(f"{key}:hybrid:{window_id - 1}")
+                with REDIS_COMMAND_SECONDS.time("pipeline"):
+                    results = await pipe.execute()
+        except Exception as e:
+            if self.healthy:
+                logger.warning(f"Rate limit sync failed, enforcing local share of limits: {e}")
+            self.healthy = False
+            return
+
+        if not self.healthy:
+            logger.info("Rate limit sync recovered, enforcing global limits")
+        self.healthy = True
+        self.syncs += 1
+        for i, (key, state, window_id, pending) in enumerate(batch):
+            if state.window_id != window_id:
+                continue  # window rolled while the batch was in flight
+            total, previous = results[i * 3], results[i * 3 + 2]
+            state.pending -= pending
+            state.count = int(total)
+            state.previous = max(state.previous, int(previous or 0))
+
+
+@functools.lru_cache(maxsize=8)
+def _trusted_networks(proxies: Tuple[str, ...]) -> Tuple[ipaddress._BaseNetwork, ...]:
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks(tuple(config.settings.TRUSTED_PROXIES)))
+
+
+def client_ip(request: Request) -> str:
+    """The caller's address.
+
+    ``X-Forwarded-For`` is only believed when the peer is one of
+    ``TRUSTED_PROXIES``; the client is then the right-most hop that is not a
+    trusted proxy, since everything left of it was written by the client.
+    Everything that counts or limits per client uses this, so the rate
+    limiter, login lockout and hashing admission agree on who a client is.
+    """
+    peer = getattr(request.client, 'host', None) or 'unknown'
+    forwarded = request.headers.get("X-Forwarded-For")
+    if not forwarded or not _is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",")]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            try:
+                return str(ipaddress.ip_address(hop))
+            except ValueError:
+                return "unknown"
+    # Every hop is one of ours
+    return hops[0]
+
+
+class RateLimitMiddleware:
+    """Pure ASGI rate-limiting middleware.
+
+    Rate-limit headers are added to the ``http.response.start`` message, so
+    responses (including streaming ones) are passed through without buffering.
+    """
+
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         redis_url: str,
         rate_limits: Dict[str, Tuple[int, int]] = None,  # {endpoint: (requests, seconds)}
-        default_rate_limit: Tuple[int, int] = (60, 60) # Default if not provided
+        default_rate_limit: Tuple[int, int] = (60, 60), # Default if not provided
+        algorithm: str | None = None,
+        mode: str | None = None,
     ):
-        super().__init__(app)
+        self.app = app
         try:
-            self.redis = Redis.from_url(redis_url, encoding="utf8", decode_responses=True)
+            timeout = config.settings.RATE_LIMIT_REDIS_TIMEOUT
+            self.redis = Redis.from_url(
+                redis_url,
+                encoding="utf8",
+                decode_responses=True,
+                socket_timeout=timeout,
+                socket_connect_timeout=timeout,
+            )
         except Exception as e:
             logger.error(f"Failed to initialize Redis connection: {e}")
             raise RuntimeError(f"Rate limiting initialization failed: {e}") from e
+        self.algorithm = get_algorithm(algorithm or config.settings.RATE_LIMIT_ALGORITHM, self.redis)
+        self.hybrid: HybridRateLimiter | None = None
+        if (mode or config.settings.RATE_LIMIT_MODE) == "hybrid":
+            self.hybrid = HybridRateLimiter(
+                self.redis,
+                sync_interval=config.settings.RATE_LIMIT_SYNC_INTERVAL,
+                workers=config.settings.RATE_LIMIT_LOCAL_WORKERS,
+            )
         self.default_rate_limit = default_rate_limit
         self.rate_limits = rate_limits or {} # Use provided or empty dict
+        self._route_table: RouteLimitTable | None = None
 
-    def get_rate_limit_key(self, request: Request) -> str:
-        """Get the rate limit key based on the request path and client IP."""
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            # Sanitize forwarded IP to prevent injection
-            client_ip = forwarded.split(",")[0].strip()
-            # Validate IP format (basic validation)
-            if not client_ip.replace(".", "").replace(":", "").isalnum():
-                client_ip = "unknown"
-        else:
-            client_ip = getattr(request.client, 'host', 'unknown') or 'unknown'
-        
-        # Sanitize path to prevent injection
-        path = str(request.url.path).replace(":", "_").replace(";", "_")
-        return f"rate_limit:{client_ip}:{path}"
-
-    def get_limit_info(self, path: str) -> Tuple[int, int]:
-        """Get the rate limit configuration for a given path."""
-        return self.rate_limits.get(path, self.default_rate_limit)
-
-    async def is_rate_limited(self, key: str, max_requests: int, window: int) -> Tuple[bool, int]:
-        """Check if the request should be rate limited."""
-        try:
-            current_time = int(time.time())
-            clear_before = current_time - window
-            
-            # Remove old entries (outside current window)
-            await self.redis.zremrangebyscore(key, 0, clear_before)
-            
-            # Add current request
-            await self.redis.zadd(key, {str(current_time): current_time})
-            
-            # Get current count
-            request_count = await self.redis.zcard(key)
-            
-            # Set expiry
-            await self.redis.expire(key, window)
-
-            # Check if we've hit the limit
-            if request_count > max_requests:
-                # Calculate reset time
-                oldest_req = await self.redis.zrange(key, 0, 0, withscores=True)
-                if oldest_req:
-                    reset_time = int(oldest_req[0][1]) + window - current_time
-                    return True, reset_time
-                return True, window
-
-            return False, 0
+    def get_route_table(self, request: Request) -> RouteLimitTable:
+        """Build the route lookup table once, from the application's routes."""
+        if self._route_table is None:
+            self._route_table = RouteLimitTable(
+                request.app.routes, self.rate_limits, self.default_rate_limit
+            )
+        return self._route_table
 
+    get_client_ip = staticmethod(client_ip)
+
+    def get_principal(self, request: Request) -> str:
+        """Identify the caller: the authenticated user id if the bearer token is valid, else the IP."""
+        authorization = request.headers.get("Authorization")
+        if authorization and authorization[:7].lower() == "bearer ":
+            try:
+                payload = security.decode_access_token(authorization[7:])
+                # Never the jti: every login mints a new one and would start a fresh budget
+                user_id = payload.get("uid") or payload.get("sub")
+                if user_id:
+                    return f"user:{user_id}"
+            except Exception:
+                # Invalid tokens are limited by IP; the auth dependency rejects them later
+                pass
+        return f"ip:{self.get_client_ip(request)}"
+
+    def get_rate_limit_key(self, request: Request, template: str) -> str:
+        """Get the rate limit key for the caller and matched route template."""
+        # Sanitize key parts to prevent injection
+        principal = self.get_principal(request).replace(";", "_")
+        return f"rate_limit:{principal}:{template}"
+
+    def get_limit_info(self, request: Request) -> Tuple[str, Tuple[int, int]]:
+        """Resolve the route template and rate limit configuration for a request."""
+        return self.get_route_table(request).resolve(request.method, request.url.path)
+
+    async def is_rate_limited(self, key: str, max_requests: int, window: int) -> Tuple[bool, int, int]:
+        """Check and count the request.
+
+        In hybrid mode the decision is local and Redis is synced in batches;
+        otherwise it is one atomic Redis call.
+
+        Returns (is_limited, retry_after_seconds, remaining).
+        """
+        if self.hybrid is not None:
+            result = self.hybrid.hit(key, max_requests, window)
+            self.hybrid.maybe_sync()
+            return result.limited, result.retry_after, result.remaining
+
+        try:
+            result = await self.algorithm.hit(key, max_requests, window)
+            return result.limited, result.retry_after, result.remaining
         except Exception as e:
             logger.error(f"Redis error in rate limiting: {e}")
-            return False, 0  # Fail open if Redis is down
+            return False, 0, max_requests  # Fail open if Redis is down
 
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Handle the request and apply rate limiting."""
-        # Skip rate limiting for health check
-        if request.url.path == "/health":
-            return await call_next(request)
+        # Skip rate limiting for non-HTTP traffic and the health/metrics probes
+        if scope["type"] != "http" or scope["path"] in ("/health", "/metrics"):
+            await self.app(scope, receive, send)
+            return
 
-        key = self.get_rate_limit_key(request)
-        max_requests, window = self.get_limit_info(request.url.path)
+        request = Request(scope)
+        template, (max_requests, window) = self.get_limit_info(request)
+        key = self.get_rate_limit_key(request, template)
 
-        is_limited, retry_after = await self.is_rate_limited(key, max_requests, window)
+        is_limited, retry_after, remaining = await self.is_rate_limited(key, max_requests, window)
 
         if is_limited:
             detail = f"Too many requests. Please try again after {retry_after} seconds."
             response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={"detail": detail},
-            )
-            response.headers.update(
-                {
+                headers={
                     "X-RateLimit-Limit": str(max_requests),
                     "X-RateLimit-Reset": str(retry_after),
                     "Retry-After": str(retry_after),
-                }
+                },
             )
-            return response
-
-        response = await call_next(request)
+            await response(scope, receive, send)
+            return
 
         # Add rate limit headers to response
-        current_count = await self.redis.zcard(key)
-        response.headers["X-RateLimit-Limit"] = str(max_requests)
-        response.headers["X-RateLimit-Remaining"] = str(max(0, max_requests - current_count))
+        limit_headers = (
+            (b"x-ratelimit-limit", str(max_requests).encode()),
+            (b"x-ratelimit-remaining", str(remaining).encode()),
+        )
+
+        async def send_with_limit_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *limit_headers]
+            await send(message)
 
-        return response
\ No newline at end of file
+        await self.app(scope, receive, send_with_limit_headers)
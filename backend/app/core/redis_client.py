@@ -0,0 +1,32 @@
+"""
+Shared Redis client for short, latency-sensitive application calls.
+
+Socket timeouts are kept short (``RATE_LIMIT_REDIS_TIMEOUT``) so callers can
+fall back quickly when Redis is slow or down. Long-lived subscriptions must
+open their own connection.
+"""
+from redis.asyncio import Redis
+
+from app.core.config import settings
+
+_redis: Redis | None = None
+
+
+def get_redis() -> Redis:
+    global _redis
+    if _redis is None:
+        timeout = settings.RATE_LIMIT_REDIS_TIMEOUT
+        _redis = Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+        )
+    return _redis
+
+
+async def close() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
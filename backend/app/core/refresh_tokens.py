@@ -0,0 +1,103 @@
+"""
+Rotating refresh tokens grouped into token families.
+
+Login starts a family: a random family id (``fid``) and a per-use nonce
+(``nonce``), both signed into the refresh token. Redis keeps one small hash
+per family, ``auth:refresh:{fid}`` = ``{n: <current nonce>, u: <user id>}``,
+expiring with the refresh token, so nothing grows without bound and no table
+is involved.
+
+Each ``/auth/refresh`` swaps the nonce in a single round trip (one HGET and,
+when it matches, one HSET inside a script) and hands out a token carrying the
+new one. Presenting an older nonce means the token was copied and already
+used, so the whole family is deleted and every token in it stops working.
+Logout deletes the family too.
+
+If Redis is unreachable the presented token is accepted without rotating, so
+its nonce stays current and the session is not mistaken for a replay later.
+"""
+import logging
+import secrets
+from enum import Enum
+from typing import Tuple
+
+from app.core.config import settings
+from app.core.metrics import REDIS_COMMAND_SECONDS
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "auth:refresh:"
+
+# KEYS[1] family key; ARGV: presented nonce, next nonce, ttl in ms.
+# 1 = rotated, 0 = unknown family (expired or logged out), -1 = reused
+_ROTATE = """
+local current = redis.call('HGET', KEYS[1], 'n')
+if not current then
+    return 0
+end
+if current ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return -1
+end
+redis.call('HSET', KEYS[1], 'n', ARGV[2])
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class Rotation(Enum):
+    ROTATED = 1
+    UNKNOWN = 0
+    REUSED = -1
+    UNAVAILABLE = None  # Redis unreachable; the presented nonce stays current
+
+
+def _key(family_id: str) -> str:
+    return KEY_PREFIX + family_id
+
+
+def _ttl_ms() -> int:
+    return settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60 * 1000
+
+
+def _new_nonce() -> str:
+    return secrets.token_urlsafe(12)
+
+
+async def start_family(user_id: int) -> Tuple[str, str]:
+    """Start a family for a fresh login; returns ``(family_id, nonce)``."""
+    family_id, nonce = secrets.token_urlsafe(16), _new_nonce()
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hset(_key(family_id), mapping={"n": nonce, "u": user_id})
+            pipe.pexpire(_key(family_id), _ttl_ms())
+            with REDIS_COMMAND_SECONDS.time("pipeline"):
+                await pipe.execute()
+    except Exception as e:
+        logger.error("Failed to store refresh token family for user %s: %s", user_id, e)
+    return family_id, nonce
+
+
+async def rotate(family_id: str, nonce: str) -> Tuple[Rotation, str]:
+    """Swap ``nonce`` for a new one; returns the outcome and the nonce to issue."""
+    next_nonce = _new_nonce()
+    try:
+        with REDIS_COMMAND_SECONDS.time("eval"):
+            result = await get_redis().eval(_ROTATE, 1, _key(family_id), nonce, next_nonce, _ttl_ms())
+    except Exception as e:
+        logger.warning("Refresh token rotation unavailable, keeping nonce: %s", e)
+        return Rotation.UNAVAILABLE, nonce
+    outcome = Rotation(int(result))
+    if outcome is Rotation.REUSED:
+        logger.warning("Refresh token reuse detected; revoked family %s", family_id)
+    return outcome, next_nonce if outcome is Rotation.ROTATED else nonce
+
+
+async def revoke(family_id: str) -> None:
+    """End the family, invalidating every refresh token issued in it."""
+    try:
+        with REDIS_COMMAND_SECONDS.time("delete"):
+            await get_redis().delete(_key(family_id))
+    except Exception as e:
+        logger.error("Failed to revoke refresh token family %s: %s", family_id, e)
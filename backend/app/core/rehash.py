@@ -0,0 +1,133 @@
+"""
+Background password rehashing after a successful login.
+
+When ``PASSWORD_HASH_SCHEME`` or ``PASSWORD_BCRYPT_ROUNDS`` changes, existing
+hashes keep verifying but ``security.password_needs_update`` flags them. The
+plain password is only available during login, so ``authenticate_user`` hands
+it to ``rehasher.schedule`` and returns at once; the login pays nothing extra.
+
+Scheduled users are collected for ``PASSWORD_REHASH_DELAY`` seconds and then
+processed in batches of ``PASSWORD_REHASH_BATCH_SIZE``:
+
+- hashes are computed one at a time in the shared hashing pool under a single
+  client id, so the rehash never holds more than one slot and cannot crowd
+  out logins; a shed job is simply retried on the user's next login;
+- each batch is written with a single UPDATE that only applies while
+  the row still holds the old hash, so a password changed in the meantime is
+  never overwritten.
+
+The UPDATE goes through Core rather than the ORM: a rehash is not a password
+change, so it must not bump ``token_epoch`` or ``updated_at``. Pending
+passwords are held in memory only until hashed, and at most
+``PASSWORD_REHASH_MAX_PENDING`` users wait at once.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, String, column, update, values
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core import metrics, password_pool, security
+from app.core.config import settings
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+REHASH_CLIENT = "password-rehash"
+
+PASSWORD_REHASHES = metrics.REGISTRY.counter(
+    "password_rehash_total",
+    "Background password rehashes by outcome (updated, stale, shed, failed).",
+    ("result",),
+)
+
+def _update_hashes(rows: List[dict]):
+    """One UPDATE ... FROM (VALUES ...) for the batch, returning the ids it changed.
+
+    Only rows still holding the hash the login verified are replaced, and
+    ``updated_at`` is left alone.
+    """
+    batch = values(
+        column("user_id", Integer), column("old_hash", String), column("new_hash", String), name="rehash"
+    ).data([(row["user_id"], row["old_hash"], row["new_hash"]) for row in rows])
+    return (
+        update(User)
+        .where(User.id == batch.c.user_id, User.hashed_password == batch.c.old_hash)
+        .values(hashed_password=batch.c.new_hash, updated_at=User.updated_at)
+        .returning(User.id)
+    )
+
+class PasswordRehasher:
+    def __init__(self, batch_size: int, delay: float, max_pending: int):
+        self.batch_size = batch_size
+        self.delay = delay
+        self.max_pending = max_pending
+        # user id -> (password, hash it verified against, engine to write to)
+        self._pending: Dict[int, Tuple[str, str, AsyncEngine]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def schedule(self, user_id: int, password: str, old_hash: str, bind: AsyncEngine) -> bool:
+        """Queue a rehash; returns False when it is already queued or the queue is full."""
+        if user_id in self._pending or len(self._pending) >= self.max_pending:
+            return False
+        self._pending[user_id] = (password, old_hash, bind)
+        if self._task is None or self._task.done():
+            self._flush = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(self._flush))
+        return True
+
+    async def _run(self, flush: asyncio.Event) -> None:
+        # Let a burst of logins accumulate, unless drain() asks to flush now
+        try:
+            await asyncio.wait_for(flush.wait(), self.delay)
+        except asyncio.TimeoutError:
+            pass
+        while self._pending:
+            batch = [(user_id, *self._pending.pop(user_id)) for user_id in list(self._pending)[: self.batch_size]]
+            try:
+                await self._rehash(batch)
+            except Exception as e:
+                PASSWORD_REHASHES.inc("failed", amount=len(batch))
+                logger.error("Background password rehash failed for %d users: %s", len(batch), e)
+
+    async def _rehash(self, batch: List[Tuple[int, str, str, AsyncEngine]]) -> None:
+        rows: Dict[AsyncEngine, List[dict]] = {}
+        for user_id, password, old_hash, bind in batch:
+            try:
+                new_hash = await password_pool.run(security.get_password_hash, password, client=REHASH_CLIENT)
+            except password_pool.PasswordHashQueueFull:
+                PASSWORD_REHASHES.inc("shed")
+                continue
+            rows.setdefault(bind, []).append({"user_id": user_id, "old_hash": old_hash, "new_hash": new_hash})
+
+        for bind, params in rows.items():
+            async with bind.begin() as conn:
+                updated = len((await conn.execute(_update_hashes(params))).all())
+            # The rest had their password changed since the login
+            PASSWORD_REHASHES.inc("updated", amount=updated)
+            PASSWORD_REHASHES.inc("stale", amount=len(params) - updated)
+
+    async def drain(self) -> None:
+        """Finish queued rehashes without waiting out the batching delay."""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        self._flush.set()
+        await task
+
+
+rehasher = PasswordRehasher(
+    batch_size=settings.PASSWORD_REHASH_BATCH_SIZE,
+    delay=settings.PASSWORD_REHASH_DELAY,
+    max_pending=settings.PASSWORD_REHASH_MAX_PENDING,
+)
+
+metrics.REGISTRY.register_collector(
+    "password_rehash_pending", "Users waiting for a background password rehash.",
+    lambda: [((), len(rehasher))],
+)
@@ -1,13 +1,24 @@
 """
 Security-related utilities, including password hashing and JWT token creation.
 """
+import asyncio
+import logging
+import secrets
+import time
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
-from jose import jwt, JWTError
+from jose import JWTError
 from pydantic import BaseModel, field_validator, ValidationError
 from app.core.config import settings
+from app.core import metrics, password_pool
+from app.core.bloom import BloomFilter
+from app.core.jwt_codec import get_codec
+from app.core.redis_client import get_redis
+from app.core.password_pool import PasswordHashQueueFull
 import re
 
+logger = logging.getLogger(__name__)
+
 class PasswordValidator(BaseModel):
     password: str
 
@@ -35,11 +46,12 @@ class PasswordValidator(BaseModel):
 
         return v
 
-# Use bcrypt for password hashing with stronger settings
+# New hashes use the configured scheme and bcrypt cost. Hashes from another
+# scheme or cost still verify; needs_update() flags them for a rehash.
 pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    default="bcrypt",
-    bcrypt__rounds=12,  # 12 rounds is secure while still being reasonably fast
+    schemes=list(dict.fromkeys([settings.PASSWORD_HASH_SCHEME, "bcrypt"])),
+    default=settings.PASSWORD_HASH_SCHEME,
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
     deprecated="auto"
 )
 
@@ -52,6 +64,8 @@ def validate_password_strength(password: str) -> None:
 
 ALGORITHM = "HS256"
 REFRESH_AUDIENCE = "proofile:refresh"
+# Claims every access and refresh token must carry
+REQUIRED_CLAIMS = ("aud", "exp", "iss")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain-text password against a hashed one."""
@@ -61,6 +75,23 @@ def get_password_hash(password: str) -> str:
     """Hashes a plain-text password."""
     return pwd_context.hash(password)
 
+def password_needs_update(hashed_password: str) -> bool:
+    """Whether the hash was made with an outdated scheme or cost."""
+    return pwd_context.needs_update(hashed_password)
+
+async def averify_password(
+    plain_password: str, hashed_password: str, client: str | None = None
+) -> bool:
+    """Verifies a password in the hashing pool without blocking the event loop.
+
+    Raises PasswordHashQueueFull when the pool is saturated for ``client``.
+    """
+    return await password_pool.run(verify_password, plain_password, hashed_password, client=client)
+
+async def ahash_password(password: str, client: str | None = None) -> str:
+    """Hashes a password in the hashing pool without blocking the event loop."""
+    return await password_pool.run(get_password_hash, password, client=client)
+
 def create_access_token(
     data: dict,
     expires_delta: timedelta | None = None,
@@ -69,6 +100,8 @@ def create_access_token(
     """Creates a new JWT access token with standard claims."""
     now = datetime.now(tz=timezone.utc)
     to_encode = data.copy()
+    # Unique per token so a single token can be revoked
+    to_encode.setdefault("jti", secrets.token_urlsafe(16))
     
     # Set standard claims
     to_encode.update({
@@ -79,28 +112,16 @@ def create_access_token(
         "exp": now + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))  # Expiry
     })
     
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return get_codec(settings.SECRET_KEY).encode(to_encode)
 
 def decode_access_token(token: str, audience: str | None = None) -> dict:
     """Decodes a JWT access token."""
     try:
-        decode_options = {
-            "verify_signature": True,
-            "verify_aud": True,
-            "verify_iss": True,
-            "verify_exp": True,
-            "require_exp": True,
-            "require_aud": True,
-            "require_iss": True,
-        }
-        payload = jwt.decode(
+        payload = get_codec(settings.SECRET_KEY).decode(
             token,
-            settings.SECRET_KEY,
-            algorithms=[ALGORITHM],
             audience=audience or settings.JWT_AUDIENCE,
             issuer=settings.PROJECT_NAME,
-            options=decode_options,
+            required=REQUIRED_CLAIMS,
         )
         # Re-validate critical claims explicitly
         if "sub" not in payload:
@@ -125,29 +146,159 @@ def create_refresh_token(
         "aud": REFRESH_AUDIENCE,
         "exp": now + (expires_delta or timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES))
     })
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    return get_codec(settings.SECRET_KEY).encode(to_encode)
 
 def decode_refresh_token(token: str) -> dict:
     """Decodes a refresh token, verifying refresh audience and issuer."""
     try:
-        payload = jwt.decode(
+        payload = get_codec(settings.SECRET_KEY).decode(
             token,
-            settings.SECRET_KEY,
-            algorithms=[ALGORITHM],
             audience=REFRESH_AUDIENCE,
             issuer=settings.PROJECT_NAME,
-            options={
-                "verify_signature": True,
-                "verify_aud": True,
-                "verify_iss": True,
-                "verify_exp": True,
-                "require_exp": True,
-                "require_aud": True,
-                "require_iss": True,
-            },
+            required=REQUIRED_CLAIMS,
         )
         if "sub" not in payload:
             raise JWTError("Refresh token missing subject")
         return payload
     except JWTError as e:
-        raise JWTError(f"Refresh token validation failed: {str(e)}")
\ No newline at end of file
+        raise JWTError(f"Refresh token validation failed: {str(e)}")
+
+
+# --- Access-token revocation --- #
+
+REVOCATION_CHECKS = metrics.REGISTRY.counter(
+    "token_revocation_checks_total",
+    "Access-token revocation checks that passed the Bloom filter, by outcome.",
+    ("result",),
+)
+
+
+class RevokedTokens:
+    """
+    Revoked access-token ids (``jti``), screened by a per-worker Bloom filter.
+
+    The authoritative list is the Redis sorted set ``auth:revoked_tokens``
+    (jti scored by the token's ``exp``, pruned once expired); every revocation
+    is also appended to the ``auth:revocations`` stream. Each worker builds a
+    Bloom filter from the set and then follows the stream to add new entries.
+    A filter miss means the token is not revoked, with no I/O; only filter
+    hits (revoked tokens plus ``REVOKED_TOKENS_FALSE_POSITIVE_RATE`` of the
+    rest) are confirmed with a ZSCORE.
+
+    Expired ids can not be removed from a Bloom filter, so it is rebuilt from
+    the set once per access-token lifetime.
+    """
+
+    SET_KEY = "auth:revoked_tokens"
+    STREAM_KEY = "auth:revocations"
+
+    def __init__(self, capacity: int, error_rate: float, rebuild_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self._filter = BloomFilter(capacity, error_rate)
+        self._last_id = "0-0"
+        self._built_at = float("-inf")
+
+    def __contains__(self, jti: str) -> bool:
+        """Whether ``jti`` may be revoked; False is definite."""
+        return jti in self._filter
+
+    def __len__(self) -> int:
+        return len(self._filter)
+
+    def clear(self) -> None:
+        """Forget every locally known revocation and re-read the stream from the start."""
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._last_id = "0-0"
+        self._built_at = float("-inf")
+
+    async def confirm(self, jti: str) -> bool:
+        """Check a filter hit against the authoritative set."""
+        try:
+            with metrics.REDIS_COMMAND_SECONDS.time("zscore"):
+                exp = await get_redis().zscore(self.SET_KEY, jti)
+        except Exception as e:
+            logger.warning("Token revocation lookup failed, accepting token: %s", e)
+            return False
+        revoked = exp is not None and exp > time.time()
+        REVOCATION_CHECKS.inc("revoked" if revoked else "false_positive")
+        return revoked
+
+    async def revoke(self, jti: str, exp: float) -> None:
+        """Revoke the access token ``jti`` until its ``exp``."""
+        self._filter.add(jti)
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.zadd(self.SET_KEY, {jti: exp})
+                pipe.xadd(
+                    self.STREAM_KEY,
+                    {"jti": jti},
+                    maxlen=max(self.capacity, 1000),
+                    approximate=True,
+                )
+                with metrics.REDIS_COMMAND_SECONDS.time("pipeline"):
+                    await pipe.execute()
+        except Exception as e:
+            logger.error("Failed to publish revocation of token %s: %s", jti, e)
+
+    async def rebuild(self, redis=None) -> None:
+        """Rebuild the filter from the live entries of the authoritative set."""
+        redis = redis or get_redis()
+        now = time.time()
+        async with redis.pipeline(transaction=False) as pipe:
+            # Read the stream position first, so nothing revoked meanwhile is missed
+            pipe.xrevrange(self.STREAM_KEY, count=1)
+            pipe.zremrangebyscore(self.SET_KEY, "-inf", now)
+            pipe.zrangebyscore(self.SET_KEY, now, "+inf")
+            last, _, live = await pipe.execute()
+        bloom = BloomFilter(max(self.capacity, 2 * len(live)), self.error_rate)
+        for jti in live:
+            bloom.add(jti)
+        self._filter = bloom
+        self._last_id = last[0][0] if last else "0-0"
+        self._built_at = time.monotonic()
+
+    async def poll(self, redis=None, block_ms: int | None = None) -> int:
+        """Add revocations published since the last poll; returns how many."""
+        redis = redis or get_redis()
+        response = await redis.xread({self.STREAM_KEY: self._last_id}, count=1000, block=block_ms)
+        added = 0
+        for _, entries in response or ():
+            for entry_id, fields in entries:
+                self._filter.add(fields["jti"])
+                self._last_id = entry_id
+                added += 1
+        return added
+
+    async def listen(self) -> None:
+        """Keep the filter in sync with other workers' revocations until cancelled."""
+        from redis.asyncio import Redis
+
+        while True:
+            # Blocking reads need their own connection without a short timeout
+            client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            try:
+                while True:
+                    if time.monotonic() - self._built_at >= self.rebuild_interval:
+                        await self.rebuild(client)
+                    await self.poll(client, block_ms=5000)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Token revocation stream lost, retrying: %s", e)
+                await asyncio.sleep(1.0)
+            finally:
+                await client.aclose()
+
+
+revoked_tokens = RevokedTokens(
+    capacity=settings.REVOKED_TOKENS_EXPECTED,
+    error_rate=settings.REVOKED_TOKENS_FALSE_POSITIVE_RATE,
+    rebuild_interval=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+metrics.REGISTRY.register_collector(
+    "revoked_token_filter_entries", "Revoked token ids added to this worker's Bloom filter.",
+    lambda: [((), len(revoked_tokens))],
+)
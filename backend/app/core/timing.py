@@ -0,0 +1,183 @@
+"""
+Per-request Server-Timing collector.
+
+A ``RequestTimings`` object is bound to a contextvar by
+``SecurityHeadersMiddleware`` for the lifetime of each HTTP request. Code on
+the request path feeds it phase durations:
+
+- ``auth``: token decode and principal lookup in ``deps.get_current_user``;
+- ``db``: cursor execution time, via SQLAlchemy engine events;
+- ``cache``: profile cache reads and writes;
+- ``ser``: response model validation and rendering, measured from the
+  endpoint returning to the response starting (see ``TimedRoute``).
+
+The middleware renders the result as a ``Server-Timing`` header, e.g.
+``app;dur=4.2, auth;dur=0.3, db;dur=2.1;desc="3 queries", ser;dur=0.4``.
+
+When ``SERVER_TIMING_ENABLED`` is off no collector is bound and every hook
+reduces to one contextvar lookup.
+"""
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Phases in the order they are reported
+PHASES = ("auth", "db", "cache", "ser")
+
+
+class RequestTimings:
+    """Accumulated durations (seconds) and event counts for one request."""
+
+    __slots__ = ("durations", "counts", "endpoint_done")
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.endpoint_done: Optional[float] = None
+
+    def add(self, phase: str, seconds: float, count: int = 1) -> None:
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + count
+
+    def header_entries(self) -> list[bytes]:
+        entries = []
+        for phase in PHASES:
+            if phase not in self.durations:
+                continue
+            entry = b"%s;dur=%.1f" % (phase.encode(), self.durations[phase] * 1000)
+            if phase == "db":
+                queries = self.counts[phase]
+                entry += b';desc="%d %s"' % (queries, b"query" if queries == 1 else b"queries")
+            entries.append(entry)
+        return entries
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def begin() -> Token:
+    """Bind a fresh collector to the current request context."""
+    return _current.set(RequestTimings())
+
+
+def end(token: Token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the enclosed block into ``name`` if a collector is bound."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of ``phase`` for coroutine functions."""
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            timings = _current.get()
+            if timings is None:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                timings.add(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("server_timing_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("server_timing_start")
+    if starts:
+        started = starts.pop()
+        timings = _current.get()
+        if timings is not None:
+            timings.add("db", time.perf_counter() - started)
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    starts = conn.info.get("server_timing_start") if conn is not None else None
+    if starts:
+        starts.pop()
+
+
+_ENGINE_LISTENERS = (
+    ("before_cursor_execute", _before_cursor_execute),
+    ("after_cursor_execute", _after_cursor_execute),
+    ("handle_error", _handle_error),
+)
+
+
+def instrument_engine(target: Any = Engine) -> None:
+    """
+    Feed cursor execution time into the ``db`` phase. Defaults to the Engine
+    class so every engine, including ones created later, is covered.
+    """
+    for name, listener in _ENGINE_LISTENERS:
+        if not event.contains(target, name, listener):
+            event.listen(target, name, listener)
+
+
+class TimedRoute(APIRoute):
+    """
+    Route class that stamps the moment the endpoint returns, so the time spent
+    validating and rendering the response can be reported as ``ser``.
+    """
+
+    def get_route_handler(self) -> Callable:
+        call = self.dependant.call
+        if call is not None and not getattr(call, "__server_timing__", False):
+            if inspect.iscoroutinefunction(call):
+
+                @wraps(call)
+                async def stamped(*args: Any, **kwargs: Any) -> Any:
+                    result = await call(*args, **kwargs)
+                    _stamp_endpoint_done()
+                    return result
+
+            else:
+
+                @wraps(call)
+                def stamped(*args: Any, **kwargs: Any) -> Any:
+                    result = call(*args, **kwargs)
+                    _stamp_endpoint_done()
+                    return result
+
+            stamped.__server_timing__ = True
+            self.dependant.call = stamped
+        return super().get_route_handler()
+
+
+def _stamp_endpoint_done() -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.endpoint_done = time.perf_counter()
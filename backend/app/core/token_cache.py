@@ -0,0 +1,126 @@
+"""
+Bounded cache of verified bearer tokens.
+
+``get_current_user`` decodes the JWT and loads the user on every request
+unless the principal is cached here. The cache:
+
+- is keyed by a SHA-256 digest of the token, so raw tokens are not retained;
+- holds at most ``maxsize`` entries, evicting the least recently used;
+- expires entries after ``ttl`` seconds, and never later than the token's
+  own ``exp`` claim;
+- serves hits synchronously without any lock, since everything runs on the
+  event loop thread and a hit never awaits;
+- coalesces concurrent misses for the same token into a single load
+  (single-flight). Failures are passed to every waiter and are not cached.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from app.core import metrics
+
+T = TypeVar("T")
+
+# A loader returns the value and the token's ``exp`` (epoch seconds), if any
+Loader = Callable[[], Awaitable[Tuple[T, Optional[float]]]]
+
+
+class VerifiedTokenCache(Generic[T]):
+    def __init__(self, maxsize: int, ttl: float, name: str = "token"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._entries: "OrderedDict[bytes, Tuple[T, float]]" = OrderedDict()
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[T]:
+        """Return the cached value for ``token``, or None on a miss."""
+        return self._get(self.digest(token))
+
+    def _get(self, key: bytes) -> Optional[T]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                metrics.CACHE_REQUESTS.inc(self.name, "hit")
+                return value
+            del self._entries[key]
+        metrics.CACHE_REQUESTS.inc(self.name, "miss")
+        return None
+
+    def _store(self, key: bytes, value: T, exp: Optional[float]) -> None:
+        now = time.monotonic()
+        expires_at = now + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, now + (exp - time.time()))
+        if expires_at <= now:
+            return
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            metrics.CACHE_EVICTIONS.inc(self.name)
+
+    def set(self, token: str, value: T, exp: Optional[float] = None) -> None:
+        """Cache ``value`` for ``token`` without going through a loader."""
+        self._store(self.digest(token), value, exp)
+
+    def discard(self, token: str) -> None:
+        """Drop the entry for ``token``, if any."""
+        self._entries.pop(self.digest(token), None)
+
+    async def get_or_load(self, token: str, loader: Loader) -> T:
+        """Return the cached value, loading it once for concurrent misses."""
+        key = self.digest(token)
+        value = self._get(key)
+        if value is not None:
+            return value
+
+        pending = self._inflight.get(key)
+        while pending is not None:
+            metrics.CACHE_REQUESTS.inc(self.name, "coalesced")
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this waiter was cancelled, not the load
+            # The loading request went away; take over the load
+            pending = self._inflight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value, exp = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            self._store(key, value, exp)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[T], bool]) -> int:
+        """Drop every entry whose value matches ``predicate``; returns the count."""
+        stale = [key for key, (value, _) in self._entries.items() if predicate(value)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
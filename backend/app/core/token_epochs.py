@@ -0,0 +1,95 @@
+"""
+Per-user token epochs for stateless principal resolution.
+
+With ``AUTH_STATELESS_PRINCIPAL`` enabled, access tokens carry the user's id,
+role, active flag and ``token_epoch`` (``tep``) as signed claims, and
+``get_current_user`` builds the principal from them without touching the
+users table. A token is only accepted while its ``tep`` is at least the
+user's current epoch.
+
+``users.token_epoch`` is bumped whenever the email, password, role or active
+flag changes (see ``app.models.user``). Current epochs are kept in a Redis
+hash shared by all workers, plus the bumps this process made itself, so the
+per-request check is one HGET. If Redis is unreachable only local bumps are
+enforced, and a token stays valid for at most ``ACCESS_TOKEN_EXPIRE_MINUTES``.
+
+A rename does not revoke tokens, so the display name is published to the
+same hash (field ``{id}:name``) instead. The principal and ``/auth/refresh``
+read it together with the epoch and prefer it over the ``name`` claim, so
+refreshed tokens do not carry a stale name for the life of the session.
+"""
+from typing import Dict, Tuple
+
+import logging
+
+from app.core.metrics import REDIS_COMMAND_SECONDS
+from app.core.redis_client import get_redis
+from app.models.user import TOKEN_EPOCHS
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = "auth:token_epochs"
+
+# Display names this process published, for when Redis is unreachable
+USER_NAMES: Dict[int, str | None] = {}
+
+# Only ever raise a stored epoch, so out-of-order publishes cannot lower it
+_RAISE_EPOCH = """
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1])) or 0
+if tonumber(ARGV[2]) > current then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return 1
+"""
+
+
+def _name_field(user_id: int) -> str:
+    return f"{user_id}:name"
+
+
+async def current(user_id: int) -> Tuple[int, str | None]:
+    """The lowest token epoch still accepted for ``user_id`` and their published name.
+
+    The name is ``None`` when none was published since the tokens were
+    issued; the ``name`` claim is then still current.
+    """
+    epoch, name = TOKEN_EPOCHS.get(user_id, 0), USER_NAMES.get(user_id)
+    try:
+        with REDIS_COMMAND_SECONDS.time("hmget"):
+            stored_epoch, stored_name = await get_redis().hmget(
+                REDIS_KEY, str(user_id), _name_field(user_id)
+            )
+    except Exception as e:
+        logger.warning("Token epoch lookup failed, using local epochs only: %s", e)
+        return epoch, name
+    return max(epoch, int(stored_epoch or 0)), stored_name if stored_name is not None else name
+
+
+async def current_epoch(user_id: int) -> int:
+    """The lowest token epoch still accepted for ``user_id``."""
+    epoch, _ = await current(user_id)
+    return epoch
+
+
+async def is_current(user_id: int, token_epoch: int) -> bool:
+    return token_epoch >= await current_epoch(user_id)
+
+
+async def publish(user_id: int, epoch: int) -> None:
+    """Share a bumped epoch with the other workers."""
+    TOKEN_EPOCHS[user_id] = max(TOKEN_EPOCHS.get(user_id, 0), epoch)
+    try:
+        with REDIS_COMMAND_SECONDS.time("eval"):
+            await get_redis().eval(_RAISE_EPOCH, 1, REDIS_KEY, str(user_id), str(epoch))
+    except Exception as e:
+        logger.error("Failed to publish token epoch for user %s: %s", user_id, e)
+
+
+async def publish_name(user_id: int, name: str | None) -> None:
+    """Share a changed display name with the other workers."""
+    USER_NAMES[user_id] = name or ""
+    try:
+        with REDIS_COMMAND_SECONDS.time("hset"):
+            await get_redis().hset(REDIS_KEY, _name_field(user_id), name or "")
+    except Exception as e:
+        logger.error("Failed to publish display name for user %s: %s", user_id, e)
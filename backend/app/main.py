@@ -3,23 +3,25 @@ The Main Application (backend/app/main.py)
 This is the heart of the backend. It initializes the FastAPI application, includes our API router,
 and adds a simple /health check endpoint so we can confirm everything is running.
 """
+import asyncio
 import logging
 import os
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware import Middleware
 from starlette.middleware.gzip import GZipMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp, Receive, Scope, Send
 import time
 from app.core.rate_limit import RateLimitMiddleware
 from urllib.parse import urlparse
-from contextlib import asynccontextmanager
-from app.core import config, database
+from contextlib import asynccontextmanager, suppress
+from app.core import config, database, metrics, pagination, password_pool, principal_cache, redis_client, rehash, security, timing
+from app.api.v1 import deps
+from app.core.password_pool import PasswordHashQueueFull
 from app.api.v1.api import api_router
 
 # Configure logging
@@ -75,50 +77,118 @@ async def lifespan(app: FastAPI):
             logger.error(f"Unexpected error during Redis setup: {e}")
             app.state.redis = None
 
+    # Consume principal cache invalidations published by other workers
+    principal_listener = None
+    if config.settings.PRINCIPAL_CACHE_L2_ENABLED:
+        principal_listener = asyncio.create_task(deps.principal_cache.listen())
+    # Follow token revocations published by any worker
+    revocation_listener = asyncio.create_task(security.revoked_tokens.listen())
+    # Take lagging read replicas out of rotation
+    replica_monitor = None
+    if database.replicas:
+        replica_monitor = asyncio.create_task(
+            database.replicas.monitor(config.settings.DATABASE_REPLICA_CHECK_INTERVAL)
+        )
+
     yield
 
     # Shutdown: Close connections
-    redis_client = getattr(app.state, "redis", None)
-    if redis_client:
+    if principal_listener is not None:
+        principal_listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await principal_listener
+    revocation_listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await revocation_listener
+    if replica_monitor is not None:
+        replica_monitor.cancel()
+        with suppress(asyncio.CancelledError):
+            await replica_monitor
+    await principal_cache.drain()
+    app_redis = getattr(app.state, "redis", None)
+    if app_redis:
         try:
-            await redis_client.close()
+            await app_redis.close()
             logger.info("Redis connection closed.")
         except (ConnectionError, RedisError) as e:
             logger.warning(f"Error closing Redis connection: {e}")
         except Exception as e:
             logger.error(f"Unexpected error closing Redis connection: {e}")
+    await rehash.rehasher.drain()
+    password_pool.shutdown()
+    await redis_client.close()
     await database.dispose_engine()
 
 # Security headers middleware
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        """
-        This middleware adds basic security headers to every response:
-
-        - X-Content-Type-Options: nosniff
-        - X-Frame-Options: DENY
-        - X-XSS-Protection: 1; mode=block
-        - Referrer-Policy: no-referrer
-        - Permissions-Policy: geolocation=()
-
-        Additionally, it adds a simple Server-Timing header for visibility.
-        The Server-Timing header has the format:
-        Server-Timing: app;dur=<duration in ms>
-
-        Where <duration in ms> is the time it took to serve the request in milliseconds.
-        """
-        
-        start = time.time()
-        response = await call_next(request)
-        # Basic security headers (can be tightened for production)
-        response.headers.setdefault("X-Content-Type-Options", "nosniff")
-        response.headers.setdefault("X-Frame-Options", "DENY")
-        response.headers.setdefault("X-XSS-Protection", "1; mode=block")
-        response.headers.setdefault("Referrer-Policy", "no-referrer")
-        response.headers.setdefault("Permissions-Policy", "geolocation=()")
-        # Simple server-timing for visibility
-        response.headers.setdefault("Server-Timing", f"app;dur={(time.time()-start)*1000:.1f}")
-        return response
+class SecurityHeadersMiddleware:
+    """
+    Pure ASGI middleware that adds basic security headers to every response:
+
+    - X-Content-Type-Options: nosniff
+    - X-Frame-Options: DENY
+    - X-XSS-Protection: 1; mode=block
+    - Referrer-Policy: no-referrer
+    - Permissions-Policy: geolocation=()
+
+    Additionally, it adds a Server-Timing header for visibility:
+    Server-Timing: app;dur=<ms>, auth;dur=<ms>, db;dur=<ms>;desc="<n> queries", cache;dur=<ms>, ser;dur=<ms>
+
+    ``app`` is the time until the response started. With SERVER_TIMING_ENABLED
+    a per-request collector (app.core.timing) is bound for the other phases,
+    which appear only when the request spent time in them.
+
+    Headers are injected into the ``http.response.start`` message from
+    precomputed byte pairs, so the response body is never buffered or
+    re-wrapped and streaming responses pass straight through. Headers already
+    set by the endpoint are left untouched.
+    """
+
+    SECURITY_HEADERS = (
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"referrer-policy", b"no-referrer"),
+        (b"permissions-policy", b"geolocation=()"),
+    )
+
+    def __init__(self, app: ASGIApp, collect_timings: bool | None = None):
+        self.app = app
+        self.collect_timings = (
+            config.settings.SERVER_TIMING_ENABLED if collect_timings is None else collect_timings
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings_token = timing.begin() if self.collect_timings else None
+        timings = timing.current() if timings_token is not None else None
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                present = {name.lower() for name, _ in headers}
+                headers.extend(
+                    header for header in self.SECURITY_HEADERS if header[0] not in present
+                )
+                if b"server-timing" not in present:
+                    now = time.perf_counter()
+                    entries = [b"app;dur=%.1f" % ((now - start) * 1000)]
+                    if timings is not None:
+                        if timings.endpoint_done is not None:
+                            timings.add("ser", now - timings.endpoint_done)
+                        entries.extend(timings.header_entries())
+                    headers.append((b"server-timing", b", ".join(entries)))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if timings_token is not None:
+                timing.end(timings_token)
 
 middleware = [
     Middleware(GZipMiddleware, minimum_size=1024),
@@ -148,7 +218,8 @@ app.add_middleware(
         "Origin",
         "X-Requested-With",
     ],
-    expose_headers=["*"],
+    # Credentialed requests don't honour the wildcard, so name what clients read
+    expose_headers=["*", pagination.NEXT_CURSOR_HEADER],
     max_age=86400,
 )
 
@@ -164,7 +235,9 @@ else:
     LOGIN_REQUESTS = config.settings.RATE_LIMIT_LOGIN_REQUESTS
     REGISTRATION_REQUESTS = config.settings.RATE_LIMIT_REGISTRATION_REQUESTS
 
-# Define the default and specific rate limits
+# Define the default and specific rate limits. Keys are route templates
+# (e.g. "/api/v1/profiles/{profile_id}"); endpoints may also carry their own
+# limits via app.core.rate_limit.rate_limit_policy, which these override.
 RATE_LIMIT_DEFAULT = (DEFAULT_REQUESTS, config.settings.RATE_LIMIT_DEFAULT_WINDOW)
 RATE_LIMIT_CONFIG = {
     "/api/v1/auth/token": (LOGIN_REQUESTS, config.settings.RATE_LIMIT_LOGIN_WINDOW),
@@ -175,8 +248,13 @@ RATE_LIMIT_CONFIG = {
 # Add security headers
 app.add_middleware(SecurityHeadersMiddleware)
 
-# Add rate limiting if Redis is available and not running tests
-if False:  # DISABLED: Rate limiting middleware is broken, causing all API requests to timeout
+# Per-route latency histograms; inside the rate limiter so throttled requests
+# are not recorded against an unmatched route
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Add rate limiting if Redis is available and not running tests. Each check is
+# a single EVALSHA with a short socket timeout, failing open if Redis is slow.
+if config.settings.ENVIRONMENT != "test":
     try:
         import redis.asyncio as redis
         app.add_middleware(
@@ -207,7 +285,20 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         logger.info(f"HTTPException caught: {exc.status_code} {exc.detail}")
     else: # For server-side errors (5xx), log the full exception.
         logger.exception(f"HTTPException caught: {exc.status_code} {exc.detail}", exc_info=exc)
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
+
+@app.exception_handler(PasswordHashQueueFull)
+async def password_hash_queue_full_handler(request: Request, exc: PasswordHashQueueFull):
+    """
+    Sheds password hashing work with a fast 503 instead of letting it queue
+    behind a saturated pool.
+    """
+    logger.warning("Password hashing queue full, shedding %s %s", request.method, request.url.path)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -241,5 +332,19 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 def health_check():
     """
     Simple health check endpoint to confirm the API is running.
+
+    Includes password hashing queue depth and wait-time counters for pool sizing.
+    """
+    return {
+        "status": "ok",
+        "project_name": config.settings.PROJECT_NAME,
+        "password_hash_queue": password_pool.stats(),
+    }
+
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+def metrics_endpoint():
+    """
+    Prometheus text exposition of this worker's request latency, pool, cache,
+    Redis and password hashing metrics.
     """
-    return {"status": "ok", "project_name": config.settings.PROJECT_NAME}
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
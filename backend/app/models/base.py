@@ -4,7 +4,9 @@ from datetime import datetime
 
 class Base(DeclarativeBase):
     """Base class for all SQLAlchemy models."""
-    pass
+    # Fetch server-generated values with RETURNING on the INSERT/UPDATE itself,
+    # so a write never needs a refresh() to read them back
+    __mapper_args__ = {"eager_defaults": True}
 
 class TimestampMixin:
     """Reusable timestamp columns for created_at and updated_at."""
@@ -1,9 +1,11 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, Index, Integer, String, Text, ForeignKey
 from sqlalchemy.orm import relationship, Mapped
 from .base import Base, TimestampMixin
 
 class Job(Base, TimestampMixin):
     __tablename__ = "jobs"
+    # Newest-first listing and its keyset pagination on (created_at, id)
+    __table_args__ = (Index("ix_jobs_created_at_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False, index=True)
@@ -12,6 +12,11 @@ class Profile(Base):
     headline = Column(String(255))
     summary = Column(Text)
     avatar_url = Column(String(255), nullable=True)
+    # Bumped by every update; conditional writes compare it (see profile_service)
+    version = Column(Integer, nullable=False, server_default="1")
 
     # Bidirectional relationship with User
-    user = relationship("User", back_populates="profile")
\ No newline at end of file
+    user = relationship("User", back_populates="profile")
+
+    # ORM flushes check and bump the version too, so no write path skips it
+    __mapper_args__ = {**Base.__mapper_args__, "version_id_col": version}
\ No newline at end of file
@@ -1,6 +1,6 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, Enum as SQLAlchemyEnum, event
-from sqlalchemy.orm import relationship, Mapped
+from sqlalchemy import Column, Integer, String, Boolean, Enum as SQLAlchemyEnum, event, inspect
+from sqlalchemy.orm import relationship, Mapped, object_session
 from typing import Dict, Tuple
 from .base import Base, TimestampMixin
 import enum
@@ -27,6 +27,8 @@ class User(Base, TimestampMixin):
     full_name = Column(String, index=True)
     role = Column(SQLAlchemyEnum(UserRole), nullable=False, default=UserRole.APPRENTICE)
     is_active = Column(Boolean, default=True)
+    # Bumped whenever issued tokens must stop carrying this user's identity
+    token_epoch = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationship to Profile
     profile: Mapped["Profile"] = relationship("Profile", back_populates="user", uselist=False, cascade="all, delete-orphan")
@@ -38,6 +40,23 @@ class User(Base, TimestampMixin):
 # Track latest status changes (id, updated_at, is_active) keyed by email
 USER_STATUS_CACHE: Dict[str, Tuple[int, datetime, bool]] = {}
 
+# Latest token epoch per user id seen by this process
+TOKEN_EPOCHS: Dict[int, int] = {}
+
+# Session.info key collecting committed-to-be user changes for cache invalidation
+# (published after commit by app.core.principal_cache)
+USER_CHANGES_KEY = "user_changes"
+
+# Changes that invalidate the claims in already-issued access tokens
+TOKEN_EPOCH_FIELDS = ("email", "hashed_password", "role", "is_active")
+
+
+@event.listens_for(User, "before_update")
+def _user_before_update(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in TOKEN_EPOCH_FIELDS):
+        target.token_epoch = (target.token_epoch or 0) + 1
+
 
 @event.listens_for(User, "after_insert")
 def _user_after_insert(mapper, connection, target: User) -> None:
@@ -55,3 +74,13 @@ def _user_after_update(mapper, connection, target: User) -> None:
         target.updated_at or datetime.utcnow(),
         target.is_active,
     )
+    if target.token_epoch:
+        TOKEN_EPOCHS[target.id] = max(TOKEN_EPOCHS.get(target.id, 0), target.token_epoch)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(USER_CHANGES_KEY, {})[target.id] = {
+            "id": target.id,
+            "email": target.email.lower(),
+            "is_active": target.is_active,
+            "updated_at": (target.updated_at or datetime.utcnow()).isoformat(),
+        }
@@ -2,4 +2,5 @@ from .user import UserCreate, UserRead, UserUpdate, UserSettingsUpdate
 from .token import Token, TokenData
 from .profile import ProfileCreate, ProfileRead, ProfileUpdate
 from .profile import ProfileResponse # Added ProfileResponse
-from .job import JobCreate, JobRead, JobUpdate
\ No newline at end of file
+from .job import JobCreate, JobRead, JobUpdate
+from .dashboard import Dashboard
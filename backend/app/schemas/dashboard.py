@@ -0,0 +1,32 @@
+"""
+Pydantic schemas for the aggregated dashboard payload.
+"""
+from pydantic import BaseModel
+
+from .profile import ProfileRead
+from .user import UserRead
+
+
+class CompletionStep(BaseModel):
+    """One profile section and whether it has been filled in."""
+    id: str
+    completed: bool
+
+
+class ProfileCompletion(BaseModel):
+    """How much of the profile is filled in, as a percentage and per section."""
+    percentage: int
+    steps: list[CompletionStep]
+
+
+class DashboardStats(BaseModel):
+    """Counters shown on the dashboard stat cards."""
+    jobs_posted: int
+
+
+class Dashboard(BaseModel):
+    """Everything the dashboard renders on load, in one response."""
+    user: UserRead
+    profile: ProfileRead | None
+    completion: ProfileCompletion
+    stats: DashboardStats
@@ -71,7 +71,12 @@ class ProfileCreate(ProfileBase):
 
 
 class ProfileUpdate(ProfileBase):
-    """Schema for updating an existing profile. All fields are optional."""
+    """Schema for updating an existing profile. All fields are optional.
+
+    ``version`` is not a field to change: when given, the update only
+    applies if the profile is still at that version.
+    """
+    version: Optional[int] = None
 
     @field_validator("headline", mode="before")
     def validate_headline_optional(cls, v):
@@ -109,6 +114,7 @@ class ProfileRead(ProfileBase):
     id: int
     user_id: int
     avatar_url: Optional[str] = None
+    version: int
 
 
 class ProfileResponse(ProfileRead):
@@ -0,0 +1,119 @@
+"""
+Service layer for the aggregated dashboard.
+
+The dashboard needs the account, its profile and a few counters. Each is
+cached per user: the account summary (``created_at``, jobs posted and the
+id of the profile, if any) here, the profile itself in ``profile_cache``.
+A warm dashboard is answered without touching the database; on any miss a
+single joined query fetches everything again.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.token_cache import VerifiedTokenCache
+from app.models.job import Job
+from app.models.profile import Profile
+from app.models.user import User
+from app.schemas.dashboard import CompletionStep, Dashboard, DashboardStats, ProfileCompletion
+from app.schemas.profile import ProfileRead
+from app.schemas.user import UserRead
+from app.services import profile_cache
+
+_ACCOUNT_TTL_SECONDS = 30.0
+_ACCOUNT_CACHE_MAX_ENTRIES = 10_000
+
+# Profile fields that count towards completion, in the order they are shown
+COMPLETION_FIELDS = ("headline", "summary", "avatar_url")
+
+
+@dataclass(frozen=True)
+class AccountSummary:
+    created_at: datetime | None
+    jobs_posted: int
+    profile_id: int | None
+
+
+# Keyed by str(user_id); least recently used summaries are evicted past the cap
+_account_cache: VerifiedTokenCache[AccountSummary] = VerifiedTokenCache(
+    maxsize=_ACCOUNT_CACHE_MAX_ENTRIES, ttl=_ACCOUNT_TTL_SECONDS, name="dashboard"
+)
+
+
+def _get_account(user_id: int) -> AccountSummary | None:
+    return _account_cache.get(str(user_id))
+
+
+def invalidate_account(user_id: int) -> None:
+    """Forget the cached summary after a write that changes it."""
+    _account_cache.discard(str(user_id))
+
+
+def clear() -> None:
+    _account_cache.clear()
+
+
+async def _load(db: AsyncSession, user_id: int) -> Tuple[AccountSummary, ProfileRead | None]:
+    """The account summary and profile of ``user_id`` in one query."""
+    jobs_posted = (
+        select(func.count(Job.id))
+        .where(Job.employer_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(User.created_at, jobs_posted, Profile)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .where(User.id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return AccountSummary(None, 0, None), None
+    created_at, jobs_count, profile = row
+    summary = AccountSummary(created_at, jobs_count, profile.id if profile else None)
+    _account_cache.set(str(user_id), summary)
+    if profile is None:
+        return summary, None
+    profile_read = ProfileRead.model_validate(profile)
+    await profile_cache.set_profile(profile_read, written=False)
+    return summary, profile_read
+
+
+def completion(profile: ProfileRead | None) -> ProfileCompletion:
+    steps = [
+        CompletionStep(id=field, completed=bool(profile is not None and getattr(profile, field)))
+        for field in COMPLETION_FIELDS
+    ]
+    done = sum(step.completed for step in steps)
+    return ProfileCompletion(percentage=round(100 * done / len(steps)), steps=steps)
+
+
+async def get_dashboard(db: AsyncSession, user) -> Dashboard:
+    """The dashboard of ``user``, an already resolved principal."""
+    summary = _get_account(user.id)
+    profile: ProfileRead | None = None
+    if summary is not None and summary.profile_id is not None:
+        profile = await profile_cache.get_profile(summary.profile_id)
+        if profile is None or profile.user_id != user.id:
+            summary = None
+    if summary is None:
+        summary, profile = await _load(db, user.id)
+
+    return Dashboard(
+        user=UserRead(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            role=user.role,
+            is_active=user.is_active,
+            created_at=summary.created_at,
+        ),
+        profile=profile,
+        completion=completion(profile),
+        stats=DashboardStats(jobs_posted=summary.jobs_posted),
+    )
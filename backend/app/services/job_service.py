@@ -1,11 +1,16 @@
 """
 Service layer for job-related operations.
 """
+from datetime import datetime
+
+from sqlalchemy import tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.core.database import save
 from app.models.job import Job
 from app.schemas.job import JobCreate
+from app.services import dashboard_service
 
 
 async def create_job(db: AsyncSession, job_in: JobCreate, employer_id: int) -> Job:
@@ -13,15 +18,25 @@ async def create_job(db: AsyncSession, job_in: JobCreate, employer_id: int) -> J
     Create a new job posting.
     """
     new_job = Job(**job_in.model_dump(), employer_id=employer_id)
-    db.add(new_job)
-    await db.commit()
-    await db.refresh(new_job)
+    await save(db, new_job)
+    dashboard_service.invalidate_account(employer_id)
     return new_job
 
 
-async def get_jobs(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[Job]:
+async def get_jobs(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: tuple[datetime, int] | None = None
+) -> list[Job]:
     """
-    Retrieve job postings with pagination.
+    Retrieve job postings, newest first.
+
+    ``after`` is the ``(created_at, id)`` of the last job already seen; the
+    page then continues from there on ``ix_jobs_created_at_id`` instead of
+    skipping rows.
     """
-    result = await db.execute(select(Job).offset(skip).limit(limit).order_by(Job.created_at.desc()))
+    query = select(Job)
+    if after is not None:
+        query = query.where(tuple_(Job.created_at, Job.id) < tuple_(*after))
+    elif skip:
+        query = query.offset(skip)
+    result = await db.execute(query.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit))
     return list(result.scalars().all())
\ No newline at end of file
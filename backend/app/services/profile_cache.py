@@ -8,38 +8,84 @@ from __future__ import annotations
 
 import asyncio
 import time
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterable, Tuple
 
+from app.core.metrics import CACHE_REQUESTS, REGISTRY
+from app.core.timing import timed
 from app.schemas.profile import ProfileRead
 
 _PROFILE_TTL_SECONDS = 5.0
 _profile_cache: Dict[int, Tuple[ProfileRead, float]] = {}
+# (id the page starts after, limit) -> page; offset pages past the first aren't cached
 _profile_list_cache: Dict[Tuple[int, int], Tuple[list[dict[str, Any]], float]] = {}
 _profile_history: Dict[int, int] = {}
 _profile_owner_lookup: Dict[int, int] = {}
 _lock = asyncio.Lock()
 
+REGISTRY.register_collector(
+    "profile_cache_entries", "Entries in the in-process profile caches.",
+    lambda: [(("profile",), len(_profile_cache)), (("profile_list",), len(_profile_list_cache))],
+    labelnames=("cache",),
+)
 
+
+@timed("cache")
 async def get_profile(profile_id: int) -> ProfileRead | None:
     async with _lock:
         cached = _profile_cache.get(profile_id)
         if not cached:
+            CACHE_REQUESTS.inc("profile", "miss")
             return None
         profile, expires_at = cached
         if expires_at < time.monotonic():
             _profile_cache.pop(profile_id, None)
+            CACHE_REQUESTS.inc("profile", "miss")
             return None
+        CACHE_REQUESTS.inc("profile", "hit")
         return profile
 
 
-async def set_profile(profile: ProfileRead) -> None:
+@timed("cache")
+async def set_profile(profile: ProfileRead, written: bool = True) -> None:
+    """Cache ``profile``; pass ``written=False`` when it was only read, so cached lists stay."""
     async with _lock:
         _profile_cache[profile.id] = (profile, time.monotonic() + _PROFILE_TTL_SECONDS)
-        _profile_list_cache.clear()
+        if written:
+            _profile_list_cache.clear()
         _profile_history[profile.user_id] = profile.id
         _profile_owner_lookup[profile.id] = profile.user_id
 
 
+@timed("cache")
+async def get_profiles(profile_ids: Iterable[int]) -> Dict[int, ProfileRead]:
+    """The cached profiles among ``profile_ids``, looked up in one pass."""
+    found: Dict[int, ProfileRead] = {}
+    now = time.monotonic()
+    async with _lock:
+        for profile_id in profile_ids:
+            cached = _profile_cache.get(profile_id)
+            if cached and cached[1] >= now:
+                found[profile_id] = cached[0]
+                CACHE_REQUESTS.inc("profile", "hit")
+            else:
+                if cached:
+                    _profile_cache.pop(profile_id, None)
+                CACHE_REQUESTS.inc("profile", "miss")
+    return found
+
+
+@timed("cache")
+async def set_profiles(profiles: Iterable[ProfileRead]) -> None:
+    """Cache profiles that were read, not written, in one pass."""
+    expires_at = time.monotonic() + _PROFILE_TTL_SECONDS
+    async with _lock:
+        for profile in profiles:
+            _profile_cache[profile.id] = (profile, expires_at)
+            _profile_history[profile.user_id] = profile.id
+            _profile_owner_lookup[profile.id] = profile.user_id
+
+
+@timed("cache")
 async def invalidate_profile(profile_id: int) -> None:
     async with _lock:
         _profile_cache.pop(profile_id, None)
@@ -47,21 +93,26 @@ async def invalidate_profile(profile_id: int) -> None:
         _profile_owner_lookup.pop(profile_id, None)
 
 
-async def get_profile_list(skip: int, limit: int) -> list[dict[str, Any]] | None:
+@timed("cache")
+async def get_profile_list(after_id: int, limit: int) -> list[dict[str, Any]] | None:
     async with _lock:
-        cached = _profile_list_cache.get((skip, limit))
+        cached = _profile_list_cache.get((after_id, limit))
         if not cached:
+            CACHE_REQUESTS.inc("profile_list", "miss")
             return None
         profiles, expires_at = cached
         if expires_at < time.monotonic():
-            _profile_list_cache.pop((skip, limit), None)
+            _profile_list_cache.pop((after_id, limit), None)
+            CACHE_REQUESTS.inc("profile_list", "miss")
             return None
+        CACHE_REQUESTS.inc("profile_list", "hit")
         return profiles
 
 
-async def set_profile_list(skip: int, limit: int, profiles: list[dict[str, Any]]) -> None:
+@timed("cache")
+async def set_profile_list(after_id: int, limit: int, profiles: list[dict[str, Any]]) -> None:
     async with _lock:
-        _profile_list_cache[(skip, limit)] = (
+        _profile_list_cache[(after_id, limit)] = (
             profiles,
             time.monotonic() + _PROFILE_TTL_SECONDS,
         )
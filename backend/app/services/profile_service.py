@@ -1,9 +1,12 @@
+from sqlalchemy import Integer, any_, bindparam, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
+from app.core.database import save
 from app.models.profile import Profile
-from app.services import profile_cache
+from app.services import dashboard_service, profile_cache
 from app.schemas.profile import ProfileCreate, ProfileUpdate
 
 
@@ -25,6 +28,17 @@ async def get_profile(db: AsyncSession, id: int) -> Profile | None:
     return result.scalar_one_or_none()
 
 
+async def get_profiles_by_ids(db: AsyncSession, ids: list[int]) -> list[Profile]:
+    """Retrieve the profiles among ``ids`` with one ``WHERE id = ANY(:ids)``.
+
+    The ids are bound as a single array, so the statement is the same for
+    any number of them and stays in the driver's prepared-statement cache.
+    """
+    ids_param = bindparam("ids", ids, type_=ARRAY(Integer))
+    result = await db.execute(select(Profile).where(Profile.id == any_(ids_param)))
+    return list(result.scalars().all())
+
+
 async def get_profile_by_user_id(db: AsyncSession, user_id: int) -> Profile | None:
     """Retrieve a profile by the user's ID."""
     result = await db.execute(select(Profile).where(Profile.user_id == user_id))
@@ -34,39 +48,52 @@ async def get_profile_by_user_id(db: AsyncSession, user_id: int) -> Profile | No
 async def create_profile(db: AsyncSession, profile_in: ProfileCreate, user_id: int) -> Profile:
     """Create a new profile for a user."""
     new_profile = Profile(**profile_in.model_dump(), user_id=user_id)
-    db.add(new_profile)
-    await db.commit()
-    await db.refresh(new_profile)
+    await save(db, new_profile)
     await profile_cache.invalidate_profile(new_profile.id)
+    dashboard_service.invalidate_account(user_id)
     return new_profile
 
 
-async def update_profile(db: AsyncSession, profile: Profile, profile_in: ProfileUpdate) -> Profile:
-    """
-    Update a profile's information safely with row-level locking.
+async def update_profile_by_id(
+    db: AsyncSession,
+    profile_id: int,
+    profile_in: ProfileUpdate,
+    owner_id: int | None = None,
+    version: int | None = None,
+) -> Profile | None:
     """
-    # Re-fetch the profile with a lock to prevent race conditions
-    stmt = select(Profile).where(Profile.id == profile.id).with_for_update()
-    result = await db.execute(stmt)
-    locked_profile = result.scalar_one_or_none()
-
-    if not locked_profile:
-        # This case is unlikely if the initial check passed, but it's good practice
-        return None 
+    Update a profile in a single ``UPDATE ... RETURNING`` statement.
 
+    The row is only changed while it still belongs to ``owner_id`` and is at
+    ``version``, when those are given; otherwise nothing is written and None
+    is returned. Every update bumps the version, so concurrent editors can't
+    silently overwrite each other, and no row lock outlives the statement.
+    """
+    update_data = profile_in.model_dump(exclude_unset=True, exclude={"version"})
+    stmt = update(Profile).where(Profile.id == profile_id)
+    if owner_id is not None:
+        stmt = stmt.where(Profile.user_id == owner_id)
+    if version is not None:
+        stmt = stmt.where(Profile.version == version)
+    stmt = (
+        stmt.values(**update_data, version=Profile.version + 1)
+        .returning(Profile)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
     try:
-        update_data = profile_in.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(locked_profile, field, value)
-        
-        db.add(locked_profile)
+        updated = (await db.execute(stmt)).scalar_one_or_none()
         await db.commit()
-        await db.refresh(locked_profile)
-        await profile_cache.invalidate_profile(locked_profile.id)
-        return locked_profile
     except Exception as e:
         await db.rollback()
         raise RuntimeError(f"Failed to update profile: {e}") from e
+    if updated is not None:
+        await profile_cache.invalidate_profile(profile_id)
+    return updated
+
+
+async def update_profile(db: AsyncSession, profile: Profile, profile_in: ProfileUpdate) -> Profile | None:
+    """Update a profile's information, whatever its current version."""
+    return await update_profile_by_id(db, profile.id, profile_in)
 
 
 async def delete_profile(db: AsyncSession, profile: Profile) -> None:
@@ -75,6 +102,7 @@ async def delete_profile(db: AsyncSession, profile: Profile) -> None:
         await db.delete(profile)
         await db.commit()
         await profile_cache.invalidate_profile(profile.id)
+        dashboard_service.invalidate_account(profile.user_id)
     except Exception as e:
         await db.rollback()
         raise RuntimeError(f"Failed to delete profile: {e}") from e
\ No newline at end of file
@@ -9,7 +9,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash
+from app.core import token_epochs
+from app.core.database import save
+from app.core.security import ahash_password
 
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
     """
@@ -31,10 +33,9 @@ async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
 
     - Hashes the password before storing.
     - Creates a new User model instance.
-    - Adds it to the session and commits.
-    - Refreshes the instance to get the ID and other defaults from the DB.
+    - Saves it; the ID and defaults come back with the INSERT.
     """
-    hashed_password = get_password_hash(user_in.password)
+    hashed_password = await ahash_password(user_in.password)
     db_user = User(
         email=user_in.email,
         hashed_password=hashed_password,
@@ -42,15 +43,11 @@ async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
         role=user_in.role,
     )
     try:
-        db.add(db_user)
-        await db.commit()
-        await db.refresh(db_user)
+        await save(db, db_user)
         return db_user
     except IntegrityError:
-        await db.rollback()
         raise
     except Exception as e:
-        await db.rollback()
         raise RuntimeError(f"Failed to create user: {e}") from e
  
 async def update_user(db: AsyncSession, user: User, user_in: UserUpdate) -> User:
@@ -60,20 +57,22 @@ async def update_user(db: AsyncSession, user: User, user_in: UserUpdate) -> User
     update_data = user_in.model_dump(exclude_unset=True)
 
     if "password" in update_data and update_data["password"]:
-        hashed_password = get_password_hash(update_data["password"])
+        hashed_password = await ahash_password(update_data["password"])
         del update_data["password"]
         user.hashed_password = hashed_password
 
     for field, value in update_data.items():
         setattr(user, field, value)
 
+    epoch, name = user.token_epoch, user.full_name
     try:
-        await db.commit()
-        await db.refresh(user)
+        await save(db, user)
+        if user.token_epoch != epoch:
+            await token_epochs.publish(user.id, user.token_epoch)
+        if user.full_name != name:
+            await token_epochs.publish_name(user.id, user.full_name)
         return user
     except IntegrityError:
-        await db.rollback()
         raise
     except Exception as e:
-        await db.rollback()
         raise RuntimeError(f"Failed to update user: {e}") from e
\ No newline at end of file
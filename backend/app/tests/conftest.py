@@ -8,6 +8,7 @@ import asyncio
 from typing import AsyncGenerator
 from urllib.parse import urlparse
 import os
+from pathlib import Path
 
 # Ensure tests run with the test environment BEFORE importing app settings
 # Pydantic `BaseSettings` reads environment variables at import time, so set
@@ -16,7 +17,7 @@ os.environ["ENVIRONMENT"] = "test"
 
 import pytest
 import pytest_asyncio
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
@@ -24,10 +25,12 @@ from sqlalchemy.pool import NullPool
 from sqlalchemy.sql import text
 
 from app.main import app
-from app.core import config
+from app.core import config, database, principal_cache, redis_client, refresh_tokens, security, token_epochs
+from app.api.v1 import deps
 from app.api.v1.deps import get_db, get_current_user
 from app.models.base import Base
-from app.models.user import User, UserRole
+from app.models.user import TOKEN_EPOCHS, User, UserRole
+from app.services import dashboard_service, profile_cache
 from app.core.config import settings
 
 # Forcing the test DB name for postgres when running full integration tests
@@ -159,7 +162,7 @@ async def client(db_session, engine) -> AsyncGenerator[AsyncClient, None]:
     engine and yield a new session for each dependency call.
     """
     # override dependency to return a fresh session per request
-    async def _get_db_override():
+    async def _get_db_override(request: Request):
         TestingSessionLocal = sessionmaker(
             bind=engine,
             class_=AsyncSession,
@@ -167,6 +170,7 @@ async def client(db_session, engine) -> AsyncGenerator[AsyncClient, None]:
             autoflush=False,
         )
         async with TestingSessionLocal() as session:
+            database.bind_caller(session, request)
             yield session
 
     app.dependency_overrides[get_db] = _get_db_override
@@ -298,3 +302,48 @@ async def use_test_user(test_user: User):
     finally:
         # Clean up override after the test so other tests are unaffected
         app.dependency_overrides.pop(get_current_user, None)
+
+
+@pytest.fixture(autouse=True)
+def avatar_upload_dir(tmp_path, monkeypatch) -> Path:
+    """Write uploaded avatars under the test's tmp dir, not into the source tree."""
+    from app.api.v1 import profiles
+
+    upload_dir = tmp_path / "avatars"
+    monkeypatch.setattr(profiles, "AVATAR_UPLOAD_DIR", upload_dir)
+    return upload_dir
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def reset_auth_state() -> AsyncGenerator[None, None]:
+    """
+    User ids and tokens repeat once the test database is reset, so forget
+    token epochs, cached principals, profiles and dashboards and recent writers
+    from earlier tests, and drop the Redis client bound to this test's event loop.
+    """
+    yield
+    await principal_cache.drain()
+    TOKEN_EPOCHS.clear()
+    token_epochs.USER_NAMES.clear()
+    deps._token_cache.clear()
+    security.revoked_tokens.clear()
+    await database.drain()
+    database._recent_writers.clear()
+    dashboard_service.clear()
+    await profile_cache.clear_all()
+    if redis_client._redis is not None:
+        try:
+            stale = [
+                key
+                for prefix in (principal_cache.KEY_PREFIX, refresh_tokens.KEY_PREFIX, database.RECENT_WRITE_PREFIX)
+                async for key in redis_client._redis.scan_iter(f"{prefix}*")
+            ]
+            await redis_client._redis.delete(
+                token_epochs.REDIS_KEY,
+                security.RevokedTokens.SET_KEY,
+                security.RevokedTokens.STREAM_KEY,
+                *stale,
+            )
+        except Exception:
+            pass
+        await redis_client.close()
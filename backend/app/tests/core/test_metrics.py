@@ -0,0 +1,73 @@
+"""
+Tests for the in-process metrics registry and the /metrics endpoint.
+"""
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import Registry
+from app.models.user import User
+from app.schemas.profile import ProfileCreate
+from app.services import profile_cache, profile_service
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("op_seconds", "Op latency.", ("op",), buckets=(0.1, 1.0))
+    latency.observe(0.05, "read")
+    latency.observe(0.5, "read")
+    latency.observe(3.0, "read")
+
+    text = registry.render()
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="read",le="1"} 2' in text
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in text
+    assert 'op_seconds_sum{op="read"} 3.55' in text
+    assert 'op_seconds_count{op="read"} 3' in text
+
+
+async def test_collectors_run_at_scrape_time():
+    registry = Registry()
+    size = [0]
+    registry.register_collector("queue_depth", "Depth.", lambda: [((), size[0])])
+    size[0] = 7
+    assert "queue_depth 7" in registry.render()
+
+
+async def test_metrics_endpoint(
+    client: AsyncClient, db_session: AsyncSession, test_user: User, auth_headers: dict
+):
+    profile = await profile_service.create_profile(
+        db_session, ProfileCreate(headline="Metered", summary="Metered"), test_user.id
+    )
+    await profile_cache.clear_all()
+    for _ in range(2):
+        response = await client.get(f"/api/v1/profiles/{profile.id}", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+    await client.get("/api/v1/profiles/999999999", headers=auth_headers)
+
+    response = await client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/api/v1/profiles/{profile_id}",status="2xx"}'
+        in text
+    )
+    assert 'route="/api/v1/profiles/{profile_id}",status="4xx"}' in text
+    assert 'cache_requests_total{cache="profile",result="hit"}' in text
+    assert 'cache_requests_total{cache="token",result="hit"}' in text
+    for gauge in (
+        "db_pool_checked_out",
+        "db_pool_overflow",
+        "# TYPE db_pool_wait_seconds histogram",
+        "profile_cache_entries{cache=\"profile\"}",
+        "token_cache_entries",
+        "password_hash_queue_depth",
+    ):
+        assert gauge in text
@@ -0,0 +1,146 @@
+"""
+Tests for admission control in front of the password hashing pool.
+"""
+import asyncio
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from app.core import password_pool
+from app.core.password_pool import HashAdmissionQueue, PasswordHashQueueFull
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_overflow_is_rejected_immediately():
+    queue = HashAdmissionQueue(concurrency=1, max_queue=1, per_client=4, max_wait=5.0)
+    await queue.acquire("a")
+    waiter = asyncio.create_task(queue.acquire("b"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(PasswordHashQueueFull) as exc:
+        await asyncio.wait_for(queue.acquire("c"), timeout=0.1)
+    assert exc.value.retry_after >= 1
+    assert queue.stats()["queue_depth"] == 1
+    assert queue.stats()["rejected_total"] == 1
+
+    queue.release()
+    await waiter
+    queue.release()
+    assert queue.stats()["in_flight"] == 0
+
+
+async def test_per_client_limit():
+    queue = HashAdmissionQueue(concurrency=1, max_queue=4, per_client=2, max_wait=5.0)
+    await queue.acquire("noisy")
+    waiters = [asyncio.create_task(queue.acquire("noisy")) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(PasswordHashQueueFull):
+        await queue.acquire("noisy")
+    # Other clients still get a place in the queue
+    other = asyncio.create_task(queue.acquire("quiet"))
+    await asyncio.sleep(0)
+    assert queue.stats()["queue_depth"] == 3
+
+    for _ in range(3):
+        queue.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*waiters, other)
+
+
+async def test_one_client_may_use_the_idle_half_of_the_queue():
+    # Many users behind one NAT or proxy address look like a single client
+    queue = HashAdmissionQueue(concurrency=1, max_queue=16, per_client=2, max_wait=5.0)
+    await queue.acquire("office")
+    waiters = [asyncio.create_task(queue.acquire("office")) for _ in range(8)]
+    await asyncio.sleep(0)
+    assert queue.stats()["queue_depth"] == 8
+    assert queue.stats()["rejected_total"] == 0
+
+    # Past half full the guaranteed share applies again
+    with pytest.raises(PasswordHashQueueFull):
+        await queue.acquire("office")
+    for _ in range(8):
+        queue.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*waiters)
+    queue.release()
+    assert queue.stats()["in_flight"] == 0
+
+
+async def test_waiting_clients_are_served_round_robin():
+    queue = HashAdmissionQueue(concurrency=1, max_queue=10, per_client=5, max_wait=5.0)
+    await queue.acquire("holder")
+    order: list[str] = []
+
+    async def job(client: str):
+        await queue.acquire(client)
+        order.append(client)
+
+    tasks = [asyncio.create_task(job(c)) for c in ("a", "a", "a", "b", "c")]
+    await asyncio.sleep(0)
+    for _ in range(5):
+        queue.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    queue.release()
+
+    assert order == ["a", "b", "c", "a", "a"]
+
+
+async def test_queue_wait_is_bounded():
+    queue = HashAdmissionQueue(concurrency=1, max_queue=10, per_client=5, max_wait=0.05)
+    await queue.acquire("holder")
+
+    with pytest.raises(PasswordHashQueueFull):
+        await queue.acquire("late")
+    stats = queue.stats()
+    assert stats["timed_out_total"] == 1
+    assert stats["queue_depth"] == 0
+
+    queue.release()
+    assert queue.stats()["in_flight"] == 0
+
+
+async def test_login_is_shed_with_retry_after(
+    client: AsyncClient, test_user, monkeypatch
+):
+    saturated = HashAdmissionQueue(concurrency=1, max_queue=0, per_client=1, max_wait=1.0)
+    await saturated.acquire("someone-else")
+    monkeypatch.setattr(password_pool, "_admission", saturated)
+
+    response = await client.post(
+        "/api/v1/auth/token",
+        data={"username": test_user.email, "password": "TestPass123!"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+    health = await client.get("/health")
+    assert health.json()["password_hash_queue"]["rejected_total"] == 1
+
+
+async def test_rotating_forwarded_for_is_still_one_client(client: AsyncClient, test_user, monkeypatch):
+    # The test client's peer is not a trusted proxy, so its header is ignored
+    queue = HashAdmissionQueue(concurrency=1, max_queue=4, per_client=1, max_wait=10.0)
+    await queue.acquire("holder")
+    monkeypatch.setattr(password_pool, "_admission", queue)
+
+    async def login(n: int):
+        return await client.post(
+            "/api/v1/auth/token",
+            data={"username": test_user.email, "password": "WrongPass123!"},
+            headers={"Content-Type": "application/x-www-form-urlencoded", "X-Forwarded-For": f"198.51.100.{n}"},
+        )
+
+    attempts = [asyncio.create_task(login(n)) for n in range(4)]
+    while queue.stats()["queue_depth"] + queue.stats()["rejected_total"] < 4:
+        await asyncio.sleep(0.01)
+    queue.release()
+    statuses = sorted(response.status_code for response in await asyncio.gather(*attempts))
+
+    # Capped at its share once the queue is half full, not one slot per header value
+    assert statuses == [status.HTTP_401_UNAUTHORIZED] * 2 + [status.HTTP_503_SERVICE_UNAVAILABLE] * 2
@@ -0,0 +1,75 @@
+"""
+Tests for returning pooled connections as soon as a request's reads are done.
+"""
+import asyncio
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from app.api.v1 import deps
+from app.core.metrics import DB_POOL_HOLD_SECONDS
+from app.services import profile_cache
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def checked_out(engine):
+    """Connections currently checked out of the test engine's pool."""
+    count = [0]
+
+    def on_checkout(*args):
+        count[0] += 1
+
+    def on_checkin(*args):
+        count[0] -= 1
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    event.listen(engine.sync_engine, "checkin", on_checkin)
+    yield lambda: count[0]
+    event.remove(engine.sync_engine, "checkout", on_checkout)
+    event.remove(engine.sync_engine, "checkin", on_checkin)
+
+
+async def test_auth_lookup_releases_connection_before_handler(
+    client: AsyncClient, auth_headers, checked_out, monkeypatch
+):
+    held: list[int] = []
+
+    async def slow_cache_hit(after_id, limit):
+        held.append(checked_out())
+        await asyncio.sleep(0.05)
+        return []
+
+    monkeypatch.setattr(profile_cache, "get_profile_list", slow_cache_hit)
+    deps._token_cache.clear()  # force the user lookup
+    count, total = DB_POOL_HOLD_SECONDS.count(), DB_POOL_HOLD_SECONDS.sum()
+
+    response = await client.get("/api/v1/profiles/", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    assert held == [0]
+    holds = DB_POOL_HOLD_SECONDS.count() - count
+    assert holds > 0
+    # No connection was held across the 50ms cache await
+    assert (DB_POOL_HOLD_SECONDS.sum() - total) / holds < 0.05
+
+
+async def test_reads_release_connection_before_response(
+    client: AsyncClient, auth_headers, checked_out, monkeypatch
+):
+    held: list[int] = []
+    set_profile_list = profile_cache.set_profile_list
+
+    async def record_then_set(after_id, limit, payload):
+        held.append(checked_out())
+        await set_profile_list(after_id, limit, payload)
+
+    monkeypatch.setattr(profile_cache, "set_profile_list", record_then_set)
+    profile_cache._profile_list_cache.clear()
+
+    response = await client.get("/api/v1/profiles/?skip=0&limit=5", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert held == [0]
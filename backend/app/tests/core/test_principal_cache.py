@@ -0,0 +1,121 @@
+"""
+Tests for the two-tier principal cache and its cross-worker invalidation.
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1 import deps
+from app.core import principal_cache
+from app.core.principal_cache import PrincipalCache
+from app.core.redis_client import get_redis
+from app.core.security import create_access_token
+from app.core.token_cache import VerifiedTokenCache
+from app.schemas.user import UserUpdate
+from app.services import user_service
+
+pytestmark = pytest.mark.asyncio
+
+
+def _worker() -> PrincipalCache:
+    """A principal cache with its own L1, as another worker process would have."""
+    return PrincipalCache(
+        VerifiedTokenCache(maxsize=100, ttl=60),
+        dumps=deps._dump_principal,
+        loads=deps._load_principal,
+        user_id=lambda user: user.id,
+        l2_ttl=60,
+    )
+
+
+async def _unreachable_loader():
+    raise AssertionError("principal should have come from the shared tier")
+
+
+async def _wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def test_principal_verified_once_is_shared_across_workers(client: AsyncClient, user_factory):
+    user = await user_factory(email="shared@example.com", password="TestPass123!")
+    token = create_access_token({"sub": user.email, "jti": str(user.id)})
+
+    response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_200_OK
+
+    other = _worker()
+    principal = await other.get_or_load(token, _unreachable_loader)
+    assert principal == deps._token_cache.get(token)
+    assert principal.role == user.role
+
+
+async def test_user_change_invalidates_every_worker(
+    client: AsyncClient, db_session: AsyncSession, user_factory
+):
+    user = await user_factory(email="invalidate@example.com", password="TestPass123!")
+    token = create_access_token({"sub": user.email, "jti": str(user.id)})
+    other = _worker()
+    listener = asyncio.create_task(other.listen())
+    try:
+        redis = get_redis()
+
+        async def subscribed() -> bool:
+            counts = await redis.pubsub_numsub(principal_cache.CHANNEL)
+            return counts[0][1] > 0
+
+        while not await subscribed():
+            await asyncio.sleep(0.01)
+
+        response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == status.HTTP_200_OK
+        await other.get_or_load(token, _unreachable_loader)
+        assert len(other.local) == 1
+
+        await user_service.update_user(db_session, user, UserUpdate(is_active=False))
+        # The committing worker drops its own entries synchronously
+        assert deps._token_cache.get(token) is None
+        await principal_cache.drain()
+
+        await _wait_for(lambda: len(other.local) == 0)
+        key = principal_cache.KEY_PREFIX + deps._token_cache.digest(token).hex()
+        assert await redis.get(key) is None
+
+        response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST  # inactive
+    finally:
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+
+
+async def test_load_racing_an_invalidation_is_not_written_to_l2():
+    from app.models.user import UserRole
+
+    worker = _worker()
+    stale = deps.CachedUser(id=4242, email="race@example.com", full_name=None, role=UserRole.STUDENT, is_active=True)
+    token = "race-token"
+
+    async def load_across_a_commit():
+        # The row was read before the commit; its invalidation runs before the write back
+        await worker.invalidate_user({"id": stale.id})
+        return stale, time.time() + 60
+
+    assert await worker.get_or_load(token, load_across_a_commit) == stale
+    key = principal_cache.KEY_PREFIX + worker.local.digest(token).hex()
+    assert await get_redis().get(key) is None
+
+    # Once nothing raced it, the next load is shared again
+    worker.drop_local(stale.id)
+
+    async def load():
+        return stale, time.time() + 60
+
+    await worker.get_or_load(token, load)
+    assert await get_redis().get(key) is not None
@@ -0,0 +1,275 @@
+"""
+Accuracy and memory tests for the Redis rate-limit algorithms.
+
+The approximate algorithms are replayed against the same request trace as the
+exact sliding log, using explicit timestamps so results are deterministic.
+"""
+import random
+import time
+import uuid
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+
+from app.core import config
+from app.core.rate_limit import GCRA, SlidingLog, SlidingWindowCounter
+
+pytestmark = pytest.mark.asyncio
+
+LIMIT = 100
+WINDOW = 10  # seconds
+
+
+@pytest_asyncio.fixture
+async def redis_client():
+    client = redis.from_url(config.settings.REDIS_URL, decode_responses=True)
+    try:
+        await client.ping()
+    except Exception as e:
+        await client.aclose()
+        pytest.skip(f"Redis not reachable for rate-limit tests: {e}")
+    try:
+        yield client
+    finally:
+        await client.aclose()
+
+
+def _trace(rate_per_second: float, seconds: int, seed: int = 7) -> list[int]:
+    """Poisson arrivals as millisecond offsets."""
+    rng = random.Random(seed)
+    offsets, t = [], 0.0
+    while t < seconds:
+        t += rng.expovariate(rate_per_second)
+        offsets.append(int(t * 1000))
+    return offsets
+
+
+async def _replay(algorithm, key: str, offsets: list[int], start_ms: int) -> list[int]:
+    admitted = []
+    for offset in offsets:
+        result = await algorithm.hit(key, LIMIT, WINDOW, now_ms=start_ms + offset)
+        if not result.limited:
+            admitted.append(offset)
+    return admitted
+
+
+def _max_in_any_window(admitted: list[int]) -> int:
+    worst, lo = 0, 0
+    for hi, t in enumerate(admitted):
+        while admitted[lo] <= t - WINDOW * 1000:
+            lo += 1
+        worst = max(worst, hi - lo + 1)
+    return worst
+
+
+# Worst-case admissions in any sliding window: the counter assumes the previous
+# window's requests were spread evenly, and GCRA allows a full burst on top of
+# the refill rate.
+@pytest.mark.parametrize(
+    "algorithm_cls, peak_bound",
+    [(SlidingWindowCounter, 1.5 * LIMIT), (GCRA, 2 * LIMIT)],
+)
+async def test_accuracy_against_exact_log(redis_client, algorithm_cls, peak_bound):
+    # Sustained overload at 1.5x the allowed rate across many windows
+    offsets = _trace(rate_per_second=1.5 * LIMIT / WINDOW, seconds=50 * WINDOW)
+    start_ms = int(time.time() * 1000)
+    key = f"rate_limit:test:{uuid.uuid4().hex}"
+
+    exact = await _replay(SlidingLog(redis_client), key, offsets, start_ms)
+    approx = await _replay(algorithm_cls(redis_client), key, offsets, start_ms)
+
+    assert _max_in_any_window(exact) == LIMIT
+    assert abs(len(approx) - len(exact)) <= 0.05 * len(exact)
+    assert _max_in_any_window(approx) <= peak_bound
+
+
+@pytest.mark.parametrize("algorithm_cls", [SlidingLog, SlidingWindowCounter, GCRA])
+async def test_under_limit_is_never_limited(redis_client, algorithm_cls):
+    algorithm = algorithm_cls(redis_client)
+    key = f"rate_limit:test:{uuid.uuid4().hex}"
+    start_ms = int(time.time() * 1000)
+
+    results = [
+        await algorithm.hit(key, LIMIT, WINDOW, now_ms=start_ms + i * 150)
+        for i in range(LIMIT)
+    ]
+    assert not any(r.limited for r in results)
+    assert results[0].remaining == LIMIT - 1
+
+
+@pytest.mark.parametrize("algorithm_cls", [SlidingLog, SlidingWindowCounter, GCRA])
+async def test_burst_over_limit_reports_retry_after(redis_client, algorithm_cls):
+    algorithm = algorithm_cls(redis_client)
+    key = f"rate_limit:test:{uuid.uuid4().hex}"
+    now_ms = int(time.time() * 1000)
+
+    results = [await algorithm.hit(key, 5, WINDOW, now_ms=now_ms) for _ in range(6)]
+    assert [r.limited for r in results] == [False] * 5 + [True]
+    assert 1 <= results[-1].retry_after <= WINDOW
+
+
+async def test_sliding_log_counts_requests_in_same_millisecond(redis_client):
+    algorithm = SlidingLog(redis_client)
+    key = f"rate_limit:test:{uuid.uuid4().hex}"
+    now_ms = int(time.time() * 1000)
+
+    results = [await algorithm.hit(key, 3, WINDOW, now_ms=now_ms) for _ in range(4)]
+    assert results[-1].limited
+
+
+async def test_memory_is_constant_per_key(redis_client):
+    offsets = _trace(rate_per_second=LIMIT / WINDOW, seconds=3 * WINDOW)
+    start_ms = int(time.time() * 1000)
+    key = f"rate_limit:test:{uuid.uuid4().hex}"
+
+    log, counter, gcra = SlidingLog(redis_client), SlidingWindowCounter(redis_client), GCRA(redis_client)
+    for algorithm in (log, counter, gcra):
+        await _replay(algorithm, key, offsets, start_ms)
+
+    assert await redis_client.zcard(log.storage_key(key)) > 10
+    assert await redis_client.hlen(counter.storage_key(key)) == 3
+    assert await redis_client.type(gcra.storage_key(key)) == "string"
+
+
+async def test_route_table_resolves_templates_and_policies():
+    from fastapi import FastAPI
+    from app.core.rate_limit import RouteLimitTable, UNMATCHED_ROUTE, rate_limit_policy
+
+    test_app = FastAPI()
+
+    @test_app.get("/items/{item_id}")
+    @rate_limit_policy(5, 30)
+    async def read_item(item_id: int):
+        return {}
+
+    @test_app.delete("/items/{item_id}")
+    async def delete_item(item_id: int):
+        return {}
+
+    @test_app.post("/login")
+    @rate_limit_policy(5, 30)
+    async def login():
+        return {}
+
+    table = RouteLimitTable(test_app.routes, {"/login": (2, 60)}, (100, 60))
+
+    assert table.resolve("GET", "/items/1") == ("/items/{item_id}", (5, 30))
+    assert table.resolve("GET", "/items/999999") == ("/items/{item_id}", (5, 30))
+    assert table.resolve("DELETE", "/items/7") == ("/items/{item_id}", (100, 60))
+    # Configured limits take precedence over the endpoint's own policy
+    assert table.resolve("POST", "/login") == ("/login", (2, 60))
+    assert table.resolve("GET", "/nope/123") == (UNMATCHED_ROUTE, (100, 60))
+
+
+async def test_rate_limit_key_uses_user_id_for_valid_tokens():
+    from starlette.requests import Request
+    from app.core.rate_limit import RateLimitMiddleware
+    from app.core.security import create_access_token
+
+    limiter = RateLimitMiddleware(app=None, redis_url=config.settings.REDIS_URL)
+
+    def _request(headers: dict) -> Request:
+        raw = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+        return Request({"type": "http", "headers": raw, "client": ("10.0.0.1", 1234)})
+
+    def _bearer(claims: dict) -> Request:
+        return _request({"Authorization": f"Bearer {create_access_token(claims)}"})
+
+    authed = _bearer({"sub": "someone@example.com", "uid": 42, "jti": "first-login"})
+    relogged = _bearer({"sub": "someone@example.com", "uid": 42, "jti": "second-login"})
+    subject_only = _bearer({"sub": "someone@example.com", "jti": "first-login"})
+    anonymous = _request({})
+    forged = _request({"Authorization": "Bearer not-a-token"})
+    try:
+        assert limiter.get_rate_limit_key(authed, "/a/{id}") == "rate_limit:user:42:/a/{id}"
+        # A fresh token must not buy a fresh budget
+        assert limiter.get_rate_limit_key(relogged, "/a/{id}") == "rate_limit:user:42:/a/{id}"
+        assert (
+            limiter.get_rate_limit_key(subject_only, "/a/{id}")
+            == "rate_limit:user:someone@example.com:/a/{id}"
+        )
+        assert limiter.get_rate_limit_key(anonymous, "/a/{id}") == "rate_limit:ip:10.0.0.1:/a/{id}"
+        assert limiter.get_rate_limit_key(forged, "/a/{id}") == "rate_limit:ip:10.0.0.1:/a/{id}"
+    finally:
+        await limiter.redis.aclose()
+
+
+@pytest.mark.parametrize(
+    "trusted, forwarded, expected",
+    [
+        # Without trusted proxies the header is the client's to write
+        ([], "198.51.100.2", "10.0.0.1"),
+        (["10.0.0.0/8"], None, "10.0.0.1"),
+        (["10.0.0.1"], "198.51.100.2", "198.51.100.2"),
+        # Hops left of the right-most untrusted one were written by the client
+        (["10.0.0.0/8"], "203.0.113.9, 198.51.100.2, 10.0.0.7", "198.51.100.2"),
+        (["10.0.0.1"], "198.51.100.2, not-an-ip", "unknown"),
+        (["10.0.0.0/8"], "10.0.0.8, 10.0.0.7", "10.0.0.8"),
+    ],
+)
+async def test_client_ip_only_believes_trusted_proxies(monkeypatch, trusted, forwarded, expected):
+    from starlette.requests import Request
+    from app.core.rate_limit import client_ip
+
+    monkeypatch.setattr(config.settings, "TRUSTED_PROXIES", trusted)
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    request = Request({"type": "http", "headers": headers, "client": ("10.0.0.1", 1234)})
+    assert client_ip(request) == expected
+
+
+async def test_hybrid_decides_locally_and_syncs_in_batches(redis_client):
+    from app.core.rate_limit import HybridRateLimiter
+
+    limiter = HybridRateLimiter(redis_client, sync_interval=0.25, workers=1)
+    key = f"rate_limit:test:{uuid.uuid4().hex}"
+    now = (time.time() // 60) * 60 + 1
+
+    admitted = 0
+    for i in range(500):
+        if not limiter.hit(key, 1000, 60, now=now + i * 0.001).limited:
+            admitted += 1
+        if i % 50 == 49:
+            await limiter.sync(now=now + i * 0.001)
+
+    assert admitted == 500
+    assert limiter.decisions == 500
+    assert limiter.syncs == 10
+    window_id = int(now // 60)
+    assert int(await redis_client.get(f"{key}:hybrid:{window_id}")) == 500
+
+
+async def test_hybrid_limits_are_global_across_workers(redis_client):
+    from app.core.rate_limit import HybridRateLimiter
+
+    worker_a = HybridRateLimiter(redis_client, sync_interval=0.25, workers=2)
+    worker_b = HybridRateLimiter(redis_client, sync_interval=0.25, workers=2)
+    key = f"rate_limit:test:{uuid.uuid4().hex}"
+    now = (time.time() // 60) * 60 + 1
+
+    admitted_a = sum(not worker_a.hit(key, 100, 60, now=now).limited for _ in range(80))
+    await worker_a.sync(now=now)
+    admitted_b = sum(not worker_b.hit(key, 100, 60, now=now).limited for _ in range(1))
+    await worker_b.sync(now=now)
+    admitted_b += sum(not worker_b.hit(key, 100, 60, now=now).limited for _ in range(50))
+
+    assert admitted_a == 80
+    assert admitted_a + admitted_b == 100
+
+
+async def test_hybrid_enforces_local_share_when_redis_is_down():
+    from app.core.rate_limit import HybridRateLimiter
+
+    unreachable = redis.from_url("redis://127.0.0.1:1/0", socket_connect_timeout=0.05)
+    limiter = HybridRateLimiter(unreachable, sync_interval=0.25, workers=4)
+    key = f"rate_limit:test:{uuid.uuid4().hex}"
+    now = (time.time() // 60) * 60 + 1
+    try:
+        assert not limiter.hit(key, 100, 60, now=now).limited
+        await limiter.sync(now=now)
+        assert not limiter.healthy
+
+        admitted = sum(not limiter.hit(key, 100, 60, now=now).limited for _ in range(100))
+        assert admitted == 100 // 4
+    finally:
+        await unreachable.aclose()
@@ -0,0 +1,157 @@
+"""
+Tests for routing read-only endpoints to read replicas.
+"""
+import pytest
+import pytest_asyncio
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core import database
+from app.core.database import ReplicaSet
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Pool:
+    def __init__(self, checkedout: int):
+        self._checkedout = checkedout
+
+    def checkedout(self) -> int:
+        return self._checkedout
+
+
+class _Engine:
+    def __init__(self, checkedout: int):
+        self.pool = _Pool(checkedout)
+
+
+@pytest_asyncio.fixture
+async def replica(engine, monkeypatch):
+    """A second engine on the test database, registered as the only replica; yields its statements."""
+    replica_engine = create_async_engine(engine.url, poolclass=NullPool)
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(replica_engine.sync_engine, "before_cursor_execute", record)
+    monkeypatch.setattr(database, "replicas", ReplicaSet([replica_engine], max_lag=5.0))
+    yield statements
+    await replica_engine.dispose()
+
+
+async def test_choose_prefers_the_least_busy_healthy_replica():
+    busy, idle, spare = _Engine(3), _Engine(1), _Engine(1)
+    replicas = ReplicaSet([busy, idle, spare], max_lag=5.0)
+
+    # Ties between equally idle replicas alternate
+    assert [replicas.choose() for _ in range(3)] == [idle, idle, spare]
+
+    replicas.replicas[1].healthy = replicas.replicas[2].healthy = False
+    assert replicas.choose() is busy
+    replicas.replicas[0].healthy = False
+    assert replicas.choose() is None
+    assert ReplicaSet([], max_lag=5.0).choose() is None
+
+
+async def test_check_takes_unreachable_replicas_out_of_rotation(engine):
+    unreachable = create_async_engine(engine.url.set(port=1), poolclass=NullPool)
+    replicas = ReplicaSet([engine, unreachable], max_lag=5.0)
+
+    await replicas.check()
+
+    assert replicas.replicas[0].healthy and replicas.replicas[0].lag == 0
+    assert not replicas.replicas[1].healthy and replicas.replicas[1].lag is None
+    assert [replicas.choose() for _ in range(2)] == [engine, engine]
+    await unreachable.dispose()
+
+
+async def test_reads_go_to_the_replica(client: AsyncClient, auth_headers, replica):
+    response = await client.get("/api/v1/profiles/me", headers=auth_headers)
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert any("FROM profiles" in statement for statement in replica)
+
+
+async def test_writers_read_their_writes_from_the_primary(
+    client: AsyncClient, auth_headers, user_factory, replica
+):
+    payload = {"headline": "Apprentice electrician", "summary": "Wiring and fault finding."}
+    response = await client.post("/api/v1/profiles/", json=payload, headers=auth_headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    replica.clear()
+
+    response = await client.get("/api/v1/profiles/me", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["headline"] == payload["headline"]
+    assert replica == []
+
+    # Other callers keep reading from the replica
+    other = await user_factory(email="replica-reader@example.com", password="TestPass123!")
+    response = await client.post(
+        "/api/v1/auth/token",
+        data={"username": other.email, "password": "TestPass123!"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert (await client.get("/api/v1/profiles/me", headers=headers)).status_code == status.HTTP_404_NOT_FOUND
+    assert any("FROM profiles" in statement for statement in replica)
+
+
+async def test_refreshed_tokens_still_read_their_writes(client: AsyncClient, user_factory, replica):
+    user = await user_factory(email="replica-refresh@example.com", password="TestPass123!")
+    response = await client.post(
+        "/api/v1/auth/token",
+        data={"username": user.email, "password": "TestPass123!"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    payload = {"headline": "Apprentice plumber", "summary": "Pipes."}
+    assert (await client.post("/api/v1/profiles/", json=payload, headers=headers)).status_code == status.HTTP_201_CREATED
+
+    # A new access token for the same user, within the stickiness window
+    response = await client.post("/api/v1/auth/refresh")
+    assert response.status_code == status.HTTP_200_OK
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    replica.clear()
+
+    response = await client.get("/api/v1/profiles/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["headline"] == payload["headline"]
+    assert replica == []
+
+
+@pytest.fixture
+def caller_lookups(monkeypatch):
+    calls = []
+    caller_key = database.caller_key
+    monkeypatch.setattr(database, "caller_key", lambda request: calls.append(request) or caller_key(request))
+    return calls
+
+
+async def test_caller_is_not_resolved_without_replicas(client: AsyncClient, auth_headers, caller_lookups):
+    response = await client.get("/api/v1/profiles/me", headers=auth_headers)
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    # Nothing to stick to, so the token is not decoded for it
+    assert caller_lookups == []
+
+
+async def test_caller_is_resolved_once_per_request(client: AsyncClient, auth_headers, replica, caller_lookups):
+    response = await client.get("/api/v1/profiles/me", headers=auth_headers)
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert len(caller_lookups) == 1
+
+
+async def test_recent_writes_are_shared_between_workers():
+    database.mark_recent_write("caller-a")
+    await database.drain()
+    # Another worker has no local record, but finds the write in Redis
+    database._recent_writers.clear()
+
+    assert await database.is_recent_writer("caller-a")
+    assert not await database.is_recent_writer("caller-b")
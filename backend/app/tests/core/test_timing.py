@@ -0,0 +1,69 @@
+"""
+Tests for the per-request Server-Timing breakdown.
+"""
+import re
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import timing
+from app.models.user import User
+from app.schemas.profile import ProfileCreate
+from app.services import profile_cache, profile_service
+
+pytestmark = pytest.mark.asyncio
+
+
+def _phases(response) -> dict[str, str]:
+    entries = [entry.strip() for entry in response.headers["server-timing"].split(",")]
+    return {entry.split(";", 1)[0]: entry for entry in entries}
+
+
+async def test_server_timing_reports_each_phase(
+    client: AsyncClient, db_session: AsyncSession, test_user: User, auth_headers: dict
+):
+    profile = await profile_service.create_profile(
+        db_session, ProfileCreate(headline="Timed", summary="Timed"), test_user.id
+    )
+    await profile_cache.clear_all()
+
+    response = await client.get(f"/api/v1/profiles/{profile.id}", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    phases = _phases(response)
+    assert {"app", "auth", "db", "cache", "ser"} <= phases.keys()
+    assert re.fullmatch(r'db;dur=[\d.]+;desc="\d+ quer(y|ies)"', phases["db"])
+    for name in ("app", "auth", "cache", "ser"):
+        assert re.fullmatch(rf"{name};dur=[\d.]+", phases[name])
+
+
+async def test_server_timing_counts_queries():
+    collected = timing.RequestTimings()
+    collected.add("db", 0.002)
+    collected.add("db", 0.001)
+    collected.add("auth", 0.0005)
+
+    assert collected.header_entries() == [b"auth;dur=0.5", b'db;dur=3.0;desc="2 queries"']
+
+
+async def test_phase_is_noop_without_collector():
+    assert timing.current() is None
+    with timing.phase("db"):
+        pass
+
+    token = timing.begin()
+    try:
+        with timing.phase("cache"):
+            pass
+        assert timing.current().counts == {"cache": 1}
+    finally:
+        timing.end(token)
+    assert timing.current() is None
+
+
+async def test_health_reports_app_only(client: AsyncClient):
+    response = await client.get("/health")
+    assert response.headers["server-timing"].startswith("app;dur=")
+    assert "db;" not in response.headers["server-timing"]
@@ -0,0 +1,87 @@
+"""
+Tests for the bounded verified-token cache used by get_current_user.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.token_cache import VerifiedTokenCache
+
+pytestmark = pytest.mark.asyncio
+
+
+def _loader(value, exp=None, calls=None, delay=0.0, error=None):
+    async def load():
+        if calls is not None:
+            calls.append(value)
+        if delay:
+            await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return value, exp
+    return load
+
+
+async def test_size_is_bounded_lru():
+    cache = VerifiedTokenCache(maxsize=2, ttl=60)
+    for token in ("a", "b"):
+        await cache.get_or_load(token, _loader(token))
+    assert cache.get("a") == "a"  # touch a, so b is least recently used
+    await cache.get_or_load("c", _loader("c"))
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "a" and cache.get("c") == "c"
+
+
+async def test_entries_expire_at_token_exp():
+    cache = VerifiedTokenCache(maxsize=10, ttl=60)
+    await cache.get_or_load("short", _loader("short", exp=time.time() + 0.05))
+    await cache.get_or_load("expired", _loader("expired", exp=time.time() - 1))
+
+    assert cache.get("short") == "short"
+    assert cache.get("expired") is None
+    await asyncio.sleep(0.06)
+    assert cache.get("short") is None
+
+
+async def test_tokens_are_not_retained():
+    cache = VerifiedTokenCache(maxsize=10, ttl=60)
+    await cache.get_or_load("secret-token", _loader("user"))
+    assert all(isinstance(key, bytes) and len(key) == 32 for key in cache._entries)
+
+
+async def test_concurrent_misses_load_once():
+    cache = VerifiedTokenCache(maxsize=10, ttl=60)
+    calls: list = []
+    results = await asyncio.gather(
+        *(cache.get_or_load("tok", _loader("user", calls=calls, delay=0.01)) for _ in range(20))
+    )
+    assert results == ["user"] * 20
+    assert calls == ["user"]
+
+
+async def test_failures_reach_all_waiters_and_are_not_cached():
+    cache = VerifiedTokenCache(maxsize=10, ttl=60)
+    calls: list = []
+    failing = _loader("user", calls=calls, delay=0.01, error=ValueError("bad token"))
+    results = await asyncio.gather(
+        *(cache.get_or_load("tok", failing) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+    assert calls == ["user"]
+    assert len(cache) == 0
+
+
+async def test_waiter_takes_over_when_loader_is_cancelled():
+    cache = VerifiedTokenCache(maxsize=10, ttl=60)
+    leader = asyncio.create_task(cache.get_or_load("tok", _loader("first", delay=1)))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_load("tok", _loader("second")))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    assert await follower == "second"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
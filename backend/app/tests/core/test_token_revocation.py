@@ -0,0 +1,94 @@
+"""
+Tests for access-token revocation behind the per-worker Bloom filter.
+"""
+import secrets
+import time
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from app.core import security
+from app.core.bloom import BloomFilter
+from app.core.security import REVOCATION_CHECKS, RevokedTokens
+
+pytestmark = pytest.mark.asyncio
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def _worker() -> RevokedTokens:
+    """Revocation state as another worker process would hold it."""
+    return RevokedTokens(capacity=1000, error_rate=0.001, rebuild_interval=60)
+
+
+async def _login(client: AsyncClient, email: str) -> dict:
+    response = await client.post(
+        "/api/v1/auth/token", data={"username": email, "password": "TestPass123!"}, headers=FORM
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    members = [secrets.token_urlsafe(16) for _ in range(5000)]
+    for member in members:
+        bloom.add(member)
+
+    assert all(member in bloom for member in members)
+    false_positives = sum(secrets.token_urlsafe(16) in bloom for _ in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+async def test_access_tokens_get_unique_ids():
+    first = security.decode_access_token(security.create_access_token({"sub": "a@example.com"}))
+    second = security.decode_access_token(security.create_access_token({"sub": "a@example.com"}))
+    assert first["jti"] != second["jti"]
+
+
+async def test_logout_revokes_the_access_token(client: AsyncClient, user_factory):
+    user = await user_factory(email="revoke@example.com", password="TestPass123!")
+    headers = await _login(client, user.email)
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == status.HTTP_200_OK
+
+    assert (await client.post("/api/v1/auth/logout", headers=headers)).status_code == status.HTTP_200_OK
+
+    # Rejected even though the principal is still cached for this token
+    response = await client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    fresh = await _login(client, user.email)
+    assert (await client.get("/api/v1/auth/me", headers=fresh)).status_code == status.HTTP_200_OK
+
+
+async def test_unrevoked_tokens_skip_the_remote_check(client: AsyncClient, user_factory):
+    user = await user_factory(email="unrevoked@example.com", password="TestPass123!")
+    await security.revoked_tokens.revoke("someone-elses-token", time.time() + 60)
+    headers = await _login(client, user.email)
+    checks = REVOCATION_CHECKS.value("revoked") + REVOCATION_CHECKS.value("false_positive")
+
+    for _ in range(20):
+        assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == status.HTTP_200_OK
+    assert REVOCATION_CHECKS.value("revoked") + REVOCATION_CHECKS.value("false_positive") == checks
+
+
+async def test_other_workers_follow_the_revocation_stream():
+    other = _worker()
+    await other.rebuild()
+    assert "stolen" not in other
+
+    await security.revoked_tokens.revoke("stolen", time.time() + 60)
+    assert await other.poll() == 1
+    assert "stolen" in other
+    assert await other.confirm("stolen")
+
+
+async def test_rebuild_drops_expired_revocations():
+    await security.revoked_tokens.revoke("expired", time.time() - 1)
+    await security.revoked_tokens.revoke("live", time.time() + 60)
+
+    other = _worker()
+    await other.rebuild()
+    assert "live" in other
+    assert "expired" not in other
+    assert not await security.revoked_tokens.confirm("expired")
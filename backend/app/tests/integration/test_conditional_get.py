@@ -0,0 +1,123 @@
+"""
+Integration tests for ETags and If-None-Match on profile and job reads.
+"""
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import etags
+from app.models.user import UserRole
+from app.schemas.profile import ProfileCreate
+from app.services import profile_service
+
+pytestmark = pytest.mark.asyncio
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+async def _login(client: AsyncClient, email: str, password: str = "SecurePass123!") -> dict:
+    response = await client.post("/api/v1/auth/token", data={"username": email, "password": password}, headers=FORM)
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def profile_queries(engine):
+    queries: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM profiles" in statement:
+            queries.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield queries
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def test_if_none_match_comparison():
+    tag = etags.etag(12, 3)
+    assert tag == '"12-3"'
+    assert etags.none_match(None, tag)
+    assert etags.none_match('"12-2", "13-3"', tag)
+    assert not etags.none_match('"12-2", W/"12-3"', tag)
+    assert not etags.none_match("*", tag)
+    assert etags.strong_tags('W/"12-3", "12-4"') == ['"12-4"']
+
+
+async def test_my_profile_revalidates_without_a_query(
+    client: AsyncClient, db_session: AsyncSession, user_factory, profile_queries
+):
+    user = await user_factory(email="etag-me@example.com")
+    profile = await profile_service.create_profile(db_session, ProfileCreate(headline="H", summary="S"), user.id)
+    headers = await _login(client, user.email)
+
+    first = await client.get("/api/v1/profiles/me", headers=headers)
+    assert first.status_code == status.HTTP_200_OK
+    tag = first.headers["etag"]
+    assert tag == f'"{profile.id}-1"'
+    assert first.headers["cache-control"] == etags.CACHE_CONTROL
+
+    profile_queries.clear()
+    again = await client.get("/api/v1/profiles/me", headers={**headers, "If-None-Match": tag})
+    assert again.status_code == status.HTTP_304_NOT_MODIFIED
+    assert again.content == b""
+    assert again.headers["etag"] == tag
+    assert profile_queries == []
+
+    # An edit changes the tag, so the old copy is no longer current
+    patched = await client.patch(f"/api/v1/profiles/{profile.id}", json={"headline": "H2"}, headers=headers)
+    assert patched.headers["etag"] == f'"{profile.id}-2"'
+    after = await client.get("/api/v1/profiles/me", headers={**headers, "If-None-Match": tag})
+    assert after.status_code == status.HTTP_200_OK
+    assert after.json()["headline"] == "H2"
+    assert after.headers["etag"] == patched.headers["etag"]
+
+
+async def test_profile_by_id_revalidates(client: AsyncClient, db_session: AsyncSession, user_factory):
+    owner = await user_factory(email="etag-owner@example.com")
+    employer = await user_factory(email="etag-employer@example.com", role=UserRole.EMPLOYER)
+    profile = await profile_service.create_profile(db_session, ProfileCreate(headline="H", summary="S"), owner.id)
+    path = f"/api/v1/profiles/{profile.id}"
+
+    for user in (owner, employer):
+        headers = await _login(client, user.email)
+        first = await client.get(path, headers=headers)
+        assert first.status_code == status.HTTP_200_OK
+        again = await client.get(path, headers={**headers, "If-None-Match": first.headers["etag"]})
+        assert again.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+async def test_tags_do_not_cross_users(client: AsyncClient, db_session: AsyncSession, user_factory):
+    first_user = await user_factory(email="etag-first@example.com")
+    second_user = await user_factory(email="etag-second@example.com")
+    for user in (first_user, second_user):
+        await profile_service.create_profile(db_session, ProfileCreate(headline=user.email, summary="S"), user.id)
+
+    first = await client.get("/api/v1/profiles/me", headers=await _login(client, first_user.email))
+    # Same URL and version, different profile
+    second_headers = {**await _login(client, second_user.email), "If-None-Match": first.headers["etag"]}
+    second = await client.get("/api/v1/profiles/me", headers=second_headers)
+
+    assert second.status_code == status.HTTP_200_OK
+    assert second.json()["headline"] == second_user.email
+
+
+async def test_job_listing_revalidates(client: AsyncClient, user_factory):
+    employer = await user_factory(email="etag-jobs@example.com", role=UserRole.EMPLOYER)
+    headers = await _login(client, employer.email)
+    payload = {"title": "Electrician", "description": "Wiring", "company_name": "Acme"}
+    assert (await client.post("/api/v1/jobs/", json=payload, headers=headers)).status_code == status.HTTP_201_CREATED
+
+    first = await client.get("/api/v1/jobs/")
+    tag = first.headers["etag"]
+    again = await client.get("/api/v1/jobs/", headers={"If-None-Match": tag})
+    assert again.status_code == status.HTTP_304_NOT_MODIFIED
+    assert again.content == b""
+
+    assert (await client.post("/api/v1/jobs/", json=payload, headers=headers)).status_code == status.HTTP_201_CREATED
+    after = await client.get("/api/v1/jobs/", headers={"If-None-Match": tag})
+    assert after.status_code == status.HTTP_200_OK
+    assert len(after.json()) == 2
+    assert after.headers["etag"] != tag
@@ -0,0 +1,116 @@
+"""
+Integration tests for the aggregated dashboard endpoint.
+"""
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import UserRole
+from app.schemas.profile import ProfileCreate
+from app.services import profile_service
+
+pytestmark = pytest.mark.asyncio
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+async def _login(client: AsyncClient, email: str, password: str = "SecurePass123!") -> dict:
+    response = await client.post("/api/v1/auth/token", data={"username": email, "password": password}, headers=FORM)
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def queries(engine):
+    """Reads of profiles or jobs; resolving the principal is counted elsewhere."""
+    recorded: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if " profiles" in statement or " jobs" in statement:
+            recorded.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def test_dashboard_in_one_query_then_from_cache(
+    client: AsyncClient, db_session: AsyncSession, user_factory, queries
+):
+    user = await user_factory(email="dash-seeker@example.com", full_name="Dash Seeker")
+    profile = await profile_service.create_profile(db_session, ProfileCreate(headline="H", summary="S"), user.id)
+    headers = await _login(client, user.email)
+    queries.clear()
+
+    response = await client.get("/api/v1/dashboard", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["user"]["email"] == user.email
+    assert body["user"]["full_name"] == "Dash Seeker"
+    assert body["user"]["created_at"]
+    assert body["profile"]["id"] == profile.id
+    assert body["completion"] == {
+        "percentage": 67,
+        "steps": [
+            {"id": "headline", "completed": True},
+            {"id": "summary", "completed": True},
+            {"id": "avatar_url", "completed": False},
+        ],
+    }
+    assert body["stats"] == {"jobs_posted": 0}
+    assert len(queries) == 1
+    assert "JOIN profiles" in queries[0]
+
+    queries.clear()
+    again = await client.get("/api/v1/dashboard/", headers=headers)
+    assert again.json() == body
+    assert queries == []
+
+
+async def test_dashboard_follows_writes(client: AsyncClient, user_factory):
+    employer = await user_factory(email="dash-employer@example.com", role=UserRole.EMPLOYER)
+    headers = await _login(client, employer.email)
+
+    empty = (await client.get("/api/v1/dashboard", headers=headers)).json()
+    assert empty["profile"] is None
+    assert empty["completion"]["percentage"] == 0
+    assert empty["stats"]["jobs_posted"] == 0
+
+    payload = {"title": "Electrician", "description": "Wiring", "company_name": "Acme"}
+    assert (await client.post("/api/v1/jobs/", json=payload, headers=headers)).status_code == status.HTTP_201_CREATED
+    created = await client.post("/api/v1/profiles/", json={"headline": "Hiring", "summary": "S"}, headers=headers)
+    assert created.status_code == status.HTTP_201_CREATED
+    patched = await client.patch(
+        f"/api/v1/profiles/{created.json()['id']}", json={"summary": "We build"}, headers=headers
+    )
+    assert patched.status_code == status.HTTP_200_OK
+
+    after = (await client.get("/api/v1/dashboard", headers=headers)).json()
+    assert after["stats"]["jobs_posted"] == 1
+    assert after["profile"]["summary"] == "We build"
+    assert after["completion"]["percentage"] == 67
+
+
+async def test_dashboard_requires_authentication(client: AsyncClient):
+    response = await client.get("/api/v1/dashboard")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_account_cache_is_bounded(db_session: AsyncSession, user_factory, monkeypatch):
+    from app.core.token_cache import VerifiedTokenCache
+    from app.services import dashboard_service
+
+    cache = VerifiedTokenCache(maxsize=2, ttl=30, name="dashboard")
+    monkeypatch.setattr(dashboard_service, "_account_cache", cache)
+    users = [await user_factory(email=f"dash-{i}@example.com") for i in range(3)]
+
+    for user in users:
+        await dashboard_service.get_dashboard(db_session, user)
+
+    assert len(cache) == 2
+    # The least recently used summary went first
+    assert dashboard_service._get_account(users[0].id) is None
+    assert dashboard_service._get_account(users[2].id) is not None
@@ -293,4 +293,66 @@ async def test_login_lockout_nonexistent_user(client: AsyncClient):
         if i < config.settings.RATE_LIMIT_LOGIN_REQUESTS - 1:
             assert response.status_code == status.HTTP_401_UNAUTHORIZED
         else:
-            assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
\ No newline at end of file
+            assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+async def test_locked_out_login_skips_authentication(client: AsyncClient, user_factory, monkeypatch):
+    """Locked-out emails and IPs are rejected before any DB lookup or bcrypt verify."""
+    import redis.asyncio as redis
+    from app.api.v1 import auth as auth_endpoints
+
+    test_redis = redis.from_url(config.settings.REDIS_URL, decode_responses=True)
+    try:
+        await test_redis.ping()
+    except Exception as e:
+        await test_redis.aclose()
+        pytest.skip(f"Redis not reachable for lockout test: {e}")
+
+    async def _fail_authenticate(*args, **kwargs):
+        raise AssertionError("authenticate_user must not run for locked-out callers")
+
+    monkeypatch.setattr(fastapi_app.state, "redis", test_redis, raising=False)
+    monkeypatch.setattr(auth_endpoints, "authenticate_user", _fail_authenticate)
+
+    known = f"locked.known.{secrets.token_hex(4)}@example.com"
+    await user_factory(email=known, password="TestPass123!")
+    unknown = f"locked.unknown.{secrets.token_hex(4)}@example.com"
+    limit = config.settings.RATE_LIMIT_LOGIN_REQUESTS
+    try:
+        for email in (known, unknown):
+            await test_redis.set(f"login_fail:{email}", limit, ex=60)
+            response = await client.post(LOGIN_ENDPOINT_URL, data={"username": email, "password": "TestPass123!"}, headers={"Content-Type": "application/x-www-form-urlencoded"})
+            assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+            assert "Retry-After" in response.headers
+
+        # A locked-out client IP is rejected regardless of the email used
+        fresh = f"locked.fresh.{secrets.token_hex(4)}@example.com"
+        await test_redis.set("login_fail_ip:127.0.0.1", config.settings.RATE_LIMIT_LOGIN_IP_REQUESTS, ex=60)
+        response = await client.post(LOGIN_ENDPOINT_URL, data={"username": fresh, "password": "TestPass123!"}, headers={"Content-Type": "application/x-www-form-urlencoded"})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+        # A forwarded address from a peer that is not a trusted proxy is ignored
+        spoofed = {"Content-Type": "application/x-www-form-urlencoded", "X-Forwarded-For": "198.51.100.2"}
+        response = await client.post(LOGIN_ENDPOINT_URL, data={"username": fresh, "password": "TestPass123!"}, headers=spoofed)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+        # Behind a trusted proxy the client is the right-most hop it appended
+        monkeypatch.setattr(config.settings, "TRUSTED_PROXIES", ["127.0.0.1"])
+        await test_redis.set("login_fail_ip:203.0.113.7", config.settings.RATE_LIMIT_LOGIN_IP_REQUESTS, ex=60)
+        forwarded = {"Content-Type": "application/x-www-form-urlencoded", "X-Forwarded-For": "198.51.100.9, 203.0.113.7"}
+        response = await client.post(LOGIN_ENDPOINT_URL, data={"username": fresh, "password": "TestPass123!"}, headers=forwarded)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+        async def _no_user(*args, **kwargs):
+            return None
+
+        # Another client behind the same (locked) proxy address still gets to try
+        monkeypatch.setattr(auth_endpoints, "authenticate_user", _no_user)
+        forwarded["X-Forwarded-For"] = "203.0.113.7, 198.51.100.2"
+        response = await client.post(LOGIN_ENDPOINT_URL, data={"username": fresh, "password": "TestPass123!"}, headers=forwarded)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    finally:
+        await test_redis.delete(
+            f"login_fail:{known}", f"login_fail:{unknown}", f"login_fail:{fresh}",
+            "login_fail_ip:127.0.0.1", "login_fail_ip:203.0.113.7", "login_fail_ip:198.51.100.2",
+        )
+        await test_redis.aclose()
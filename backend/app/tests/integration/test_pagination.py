@@ -0,0 +1,96 @@
+"""
+Integration tests for cursor pagination of the profile and job listings.
+"""
+from datetime import datetime
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.models.user import UserRole
+from app.schemas.profile import ProfileCreate
+from app.services import profile_service
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _insert_jobs(engine, employer_id: int, count: int) -> None:
+    # Pairs of jobs share a timestamp, so the id has to break ties
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO jobs (title, description, company_name, employer_id, created_at, updated_at) "
+                "SELECT 'Job ' || n, 'Description', 'Acme', :employer_id, "
+                "timestamp '2026-01-01' + (n / 2) * interval '1 minute', now() "
+                "FROM generate_series(1, :count) AS n"
+            ),
+            {"employer_id": employer_id, "count": count},
+        )
+
+
+async def _follow(client: AsyncClient, path: str, headers: dict | None = None) -> list[list[dict]]:
+    pages = []
+    response = await client.get(path, headers=headers)
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+        separator = "&" if "?" in path else "?"
+        response = await client.get(f"{path}{separator}cursor={cursor}", headers=headers)
+
+
+async def test_cursor_roundtrip():
+    created_at = datetime(2026, 1, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42), datetime, int) == (created_at, 42)
+    assert decode_cursor(encode_cursor(7), int) == (7,)
+
+
+async def test_profile_cursor_pages_cover_every_profile(
+    client: AsyncClient, db_session: AsyncSession, user_factory, auth_headers
+):
+    for i in range(7):
+        user = await user_factory(email=f"cursor{i}@example.com")
+        await profile_service.create_profile(db_session, ProfileCreate(headline=f"Profile {i}", summary="S"), user.id)
+
+    pages = await _follow(client, "/api/v1/profiles/?limit=3", auth_headers)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [profile["id"] for page in pages for profile in page]
+    assert ids == sorted(ids) and len(set(ids)) == 7
+    # The first page is the same in both modes
+    offset = await client.get("/api/v1/profiles/?skip=0&limit=3", headers=auth_headers)
+    assert offset.json() == pages[0]
+
+
+async def test_job_cursor_pages_are_newest_first_without_gaps(client: AsyncClient, user_factory, engine):
+    employer = await user_factory(email="cursor-employer@example.com", role=UserRole.EMPLOYER)
+    await _insert_jobs(engine, employer.id, 25)
+
+    pages = await _follow(client, "/api/v1/jobs/?limit=10")
+
+    jobs = [job for page in pages for job in page]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    # Ids were assigned in creation order
+    ids = [job["id"] for job in jobs]
+    assert ids == sorted(ids, reverse=True) and len(set(ids)) == 25
+    offset = await client.get("/api/v1/jobs/?skip=10&limit=10")
+    assert offset.json() == pages[1]
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor("x"), encode_cursor(1, 2)])
+async def test_invalid_cursor_is_rejected(client: AsyncClient, auth_headers, cursor):
+    response = await client.get(f"/api/v1/profiles/?cursor={cursor}", headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = await client.get(f"/api/v1/jobs/?cursor={cursor}")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_skip_and_cursor_together_are_rejected(client: AsyncClient, auth_headers):
+    response = await client.get(f"/api/v1/profiles/?skip=5&cursor={encode_cursor(1)}", headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
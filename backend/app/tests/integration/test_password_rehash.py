@@ -0,0 +1,114 @@
+"""
+Tests for upgrading outdated password hashes in the background after login.
+"""
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from passlib.context import CryptContext
+from sqlalchemy import event, select, update
+
+from app.core import security
+from app.core.rehash import PASSWORD_REHASHES, rehasher
+from app.models.user import User
+
+pytestmark = pytest.mark.asyncio
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+PASSWORD = "TestPass123!"
+
+# Cheaper than the configured cost, as hashes from an older deployment would be
+outdated_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+
+
+async def _set_hash(engine, user_id: int, hashed_password: str) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(update(User).where(User.id == user_id).values(hashed_password=hashed_password))
+
+
+async def _row(engine, user_id: int):
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(User.hashed_password, User.token_epoch, User.updated_at).where(User.id == user_id)
+        )
+        return result.one()
+
+
+async def _login(client: AsyncClient, email: str):
+    return await client.post("/api/v1/auth/token", data={"username": email, "password": PASSWORD}, headers=FORM)
+
+
+async def test_outdated_hash_is_upgraded_after_login(client: AsyncClient, user_factory, engine):
+    user = await user_factory(email="rehash@example.com", password=PASSWORD)
+    old_hash = outdated_context.hash(PASSWORD)
+    await _set_hash(engine, user.id, old_hash)
+    before = await _row(engine, user.id)
+    assert security.password_needs_update(old_hash)
+
+    response = await _login(client, user.email)
+    assert response.status_code == status.HTTP_200_OK
+    # The login returned before the rehash ran
+    assert (await _row(engine, user.id)).hashed_password == old_hash
+    assert len(rehasher) == 1
+
+    await rehasher.drain()
+    after = await _row(engine, user.id)
+    assert after.hashed_password != old_hash
+    assert not security.password_needs_update(after.hashed_password)
+    assert security.verify_password(PASSWORD, after.hashed_password)
+    # Not a password change: sessions and timestamps are left alone
+    assert after.token_epoch == before.token_epoch
+    assert after.updated_at == before.updated_at
+
+    assert (await _login(client, user.email)).status_code == status.HTTP_200_OK
+    assert len(rehasher) == 0
+
+
+async def test_current_hashes_are_not_rehashed(client: AsyncClient, user_factory):
+    user = await user_factory(email="current-hash@example.com", password=PASSWORD)
+
+    assert (await _login(client, user.email)).status_code == status.HTTP_200_OK
+    assert len(rehasher) == 0
+
+
+async def test_password_changed_meanwhile_is_not_overwritten(user_factory, engine):
+    user = await user_factory(email="changed-meanwhile@example.com", password=PASSWORD)
+    old_hash = outdated_context.hash(PASSWORD)
+    changed_hash = security.get_password_hash("Changed123!")
+    await _set_hash(engine, user.id, changed_hash)
+    stale = PASSWORD_REHASHES.value("stale")
+
+    rehasher.schedule(user.id, PASSWORD, old_hash, engine)
+    await rehasher.drain()
+
+    assert (await _row(engine, user.id)).hashed_password == changed_hash
+    assert PASSWORD_REHASHES.value("stale") == stale + 1
+
+
+async def test_logins_are_batched_into_one_update(user_factory, engine):
+    users = [await user_factory(email=f"batch{i}@example.com", password=PASSWORD) for i in range(3)]
+    old_hash = outdated_context.hash(PASSWORD)
+    for user in users:
+        await _set_hash(engine, user.id, old_hash)
+    updated = PASSWORD_REHASHES.value("updated")
+
+    for user in users:
+        assert rehasher.schedule(user.id, PASSWORD, old_hash, engine)
+    assert not rehasher.schedule(users[0].id, PASSWORD, old_hash, engine)  # already queued
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE users"):
+            statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        await rehasher.drain()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    assert len(statements) == 1
+
+    assert PASSWORD_REHASHES.value("updated") == updated + 3
+    for user in users:
+        assert not security.password_needs_update((await _row(engine, user.id)).hashed_password)
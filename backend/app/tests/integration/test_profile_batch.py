@@ -0,0 +1,114 @@
+"""
+Integration tests for fetching many profiles in one request.
+"""
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import UserRole
+from app.schemas.profile import ProfileCreate
+from app.services import profile_cache, profile_service
+
+pytestmark = pytest.mark.asyncio
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+async def _login(client: AsyncClient, email: str, password: str = "SecurePass123!") -> dict:
+    response = await client.post("/api/v1/auth/token", data={"username": email, "password": password}, headers=FORM)
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _profiles(db_session: AsyncSession, user_factory, count: int) -> list[int]:
+    ids = []
+    for i in range(count):
+        user = await user_factory(email=f"batch-card{i}@example.com")
+        profile = await profile_service.create_profile(
+            db_session, ProfileCreate(headline=f"Card {i}", summary="S"), user.id
+        )
+        ids.append(profile.id)
+    return ids
+
+
+@pytest.fixture
+def profile_queries(engine):
+    queries: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM profiles" in statement:
+            queries.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield queries
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def test_employer_gets_profiles_in_order_with_one_query(
+    client: AsyncClient, db_session: AsyncSession, user_factory, profile_queries
+):
+    ids = await _profiles(db_session, user_factory, 5)
+    employer = await user_factory(email="batch-employer@example.com", role=UserRole.EMPLOYER)
+    headers = await _login(client, employer.email)
+    await profile_cache.clear_all()
+    # One entry is already cached and is not fetched again
+    cached = await client.get(f"/api/v1/profiles/{ids[2]}", headers=headers)
+    assert cached.status_code == status.HTTP_200_OK
+    profile_queries.clear()
+
+    requested = [ids[4], ids[2], 999999, ids[0], ids[4]]
+    response = await client.get(f"/api/v1/profiles/batch?ids={','.join(map(str, requested))}", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/json"
+    assert [profile["id"] for profile in response.json()] == [ids[4], ids[2], ids[0]]
+    assert response.json()[0]["headline"] == "Card 4"
+    assert len(profile_queries) == 1
+    assert "= ANY" in profile_queries[0]
+
+    # The misses were cached, so a repeat needs no query
+    profile_queries.clear()
+    again = await client.get(f"/api/v1/profiles/batch?ids={ids[4]},{ids[0]}", headers=headers)
+    assert [profile["id"] for profile in again.json()] == [ids[4], ids[0]]
+    assert profile_queries == []
+
+
+async def test_users_may_only_batch_their_own_profile(client: AsyncClient, db_session: AsyncSession, user_factory):
+    other_id, = await _profiles(db_session, user_factory, 1)
+    user = await user_factory(email="batch-self@example.com")
+    own = await profile_service.create_profile(db_session, ProfileCreate(headline="Mine", summary="S"), user.id)
+    headers = await _login(client, user.email)
+
+    response = await client.get(f"/api/v1/profiles/batch?ids={own.id}", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert [profile["id"] for profile in response.json()] == [own.id]
+
+    for ids in (f"{own.id},{other_id}", f"{own.id},999999"):
+        response = await client.get(f"/api/v1/profiles/batch?ids={ids}", headers=headers)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+async def test_non_viewers_are_refused_before_any_fetch(
+    client: AsyncClient, db_session: AsyncSession, user_factory, profile_queries
+):
+    other_ids = await _profiles(db_session, user_factory, 3)
+    user = await user_factory(email="batch-probe@example.com")
+    own = await profile_service.create_profile(db_session, ProfileCreate(headline="Mine", summary="S"), user.id)
+    headers = await _login(client, user.email)
+    await profile_cache.clear_all()
+    profile_queries.clear()
+
+    ids = ",".join(map(str, [own.id, *other_ids]))
+    response = await client.get(f"/api/v1/profiles/batch?ids={ids}", headers=headers)
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert profile_queries == []
+    assert await profile_cache.get_profiles(other_ids) == {}
+
+
+@pytest.mark.parametrize("ids", ["", "1,two", ",".join(str(i) for i in range(1, 102))])
+async def test_invalid_id_lists_are_rejected(client: AsyncClient, auth_headers, ids):
+    response = await client.get(f"/api/v1/profiles/batch?ids={ids}", headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,120 @@
+"""
+Integration tests for single-statement, version-checked profile updates.
+"""
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.profile import Profile
+from app.schemas.profile import ProfileCreate
+from app.services import profile_service
+
+pytestmark = pytest.mark.asyncio
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+async def _login(client: AsyncClient, email: str, password: str = "SecurePass123!") -> dict:
+    response = await client.post("/api/v1/auth/token", data={"username": email, "password": password}, headers=FORM)
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _row(engine, profile_id: int):
+    async with engine.connect() as conn:
+        result = await conn.execute(select(Profile.headline, Profile.version).where(Profile.id == profile_id))
+        return tuple(result.one())
+
+
+@pytest.fixture
+def profile_statements(engine):
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "profiles" in statement:
+            statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def test_update_is_one_statement_and_bumps_the_version(
+    client: AsyncClient, db_session: AsyncSession, user_factory, profile_statements
+):
+    owner = await user_factory(email="versioned@example.com")
+    profile = await profile_service.create_profile(db_session, ProfileCreate(headline="First", summary="S"), owner.id)
+    assert profile.version == 1
+    headers = await _login(client, owner.email)
+    profile_statements.clear()
+
+    response = await client.patch(
+        f"/api/v1/profiles/{profile.id}", json={"headline": "Second"}, headers={**headers, "If-Match": f'"{profile.id}-1"'}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["headline"] == "Second"
+    assert response.json()["version"] == 2
+    assert response.headers["etag"] == f'"{profile.id}-2"'
+    assert len(profile_statements) == 1
+    assert profile_statements[0].startswith("UPDATE profiles")
+
+
+async def test_stale_if_match_is_rejected(client: AsyncClient, db_session: AsyncSession, user_factory, engine):
+    owner = await user_factory(email="stale-etag@example.com")
+    profile = await profile_service.create_profile(db_session, ProfileCreate(headline="First", summary="S"), owner.id)
+    headers = await _login(client, owner.email)
+    path = f"/api/v1/profiles/{profile.id}"
+
+    first = await client.patch(path, json={"headline": "Mine"}, headers={**headers, "If-Match": f'"{profile.id}-1"'})
+    assert first.status_code == status.HTTP_200_OK
+
+    # A second editor still holding version 1 does not overwrite the first
+    second = await client.patch(path, json={"headline": "Theirs"}, headers={**headers, "If-Match": f'"{profile.id}-1"'})
+    assert second.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert second.headers["etag"] == f'"{profile.id}-2"'
+    weak = await client.patch(path, json={"headline": "Theirs"}, headers={**headers, "If-Match": f'W/"{profile.id}-2"'})
+    assert weak.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    # Without a precondition, or with "*", the update applies unconditionally
+    assert (await client.patch(path, json={"summary": "Any"}, headers={**headers, "If-Match": "*"})).json()["version"] == 3
+    assert (await client.patch(path, json={"summary": "Any"}, headers=headers)).json()["version"] == 4
+    assert await _row(engine, profile.id) == ("Mine", 4)
+
+
+async def test_stale_body_version_is_a_conflict(client: AsyncClient, db_session: AsyncSession, user_factory):
+    owner = await user_factory(email="stale-version@example.com")
+    profile = await profile_service.create_profile(db_session, ProfileCreate(headline="First", summary="S"), owner.id)
+    headers = await _login(client, owner.email)
+    path = f"/api/v1/profiles/{profile.id}"
+
+    ok = await client.patch(path, json={"headline": "Mine", "version": 1}, headers=headers)
+    assert ok.status_code == status.HTTP_200_OK
+    conflict = await client.patch(path, json={"headline": "Theirs", "version": 1}, headers=headers)
+    assert conflict.status_code == status.HTTP_409_CONFLICT
+
+
+async def test_ownership_is_checked_in_the_update(
+    client: AsyncClient, db_session: AsyncSession, user_factory, engine
+):
+    owner = await user_factory(email="owner-versioned@example.com")
+    intruder = await user_factory(email="intruder-versioned@example.com")
+    profile = await profile_service.create_profile(db_session, ProfileCreate(headline="First", summary="S"), owner.id)
+    headers = await _login(client, intruder.email)
+
+    response = await client.patch(f"/api/v1/profiles/{profile.id}", json={"headline": "Hijacked"}, headers=headers)
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert await _row(engine, profile.id) == ("First", 1)
+
+
+async def test_orm_writes_bump_the_version(db_session: AsyncSession, user_factory):
+    owner = await user_factory(email="orm-versioned@example.com")
+    profile = await profile_service.create_profile(db_session, ProfileCreate(headline="First", summary="S"), owner.id)
+
+    profile.avatar_url = "/avatars/new.png"
+    await db_session.commit()
+
+    assert profile.version == 2
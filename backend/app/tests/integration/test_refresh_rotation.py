@@ -0,0 +1,108 @@
+"""
+Tests for rotating refresh tokens and token-family reuse detection.
+"""
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import config, refresh_tokens, security
+
+pytestmark = pytest.mark.asyncio
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+async def _login(client: AsyncClient, email: str) -> str:
+    response = await client.post(
+        "/api/v1/auth/token", data={"username": email, "password": "TestPass123!"}, headers=FORM
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.cookies[config.settings.REFRESH_COOKIE_NAME]
+
+
+async def _refresh(client: AsyncClient, refresh_token: str):
+    client.cookies.clear()
+    client.cookies.set(config.settings.REFRESH_COOKIE_NAME, refresh_token)
+    return await client.post("/api/v1/auth/refresh")
+
+
+async def test_refresh_rotates_the_token(client: AsyncClient, user_factory):
+    user = await user_factory(email="rotation@example.com", password="TestPass123!")
+    first = await _login(client, user.email)
+
+    response = await _refresh(client, first)
+    assert response.status_code == status.HTTP_200_OK
+    second = response.cookies[config.settings.REFRESH_COOKIE_NAME]
+
+    old, new = security.decode_refresh_token(first), security.decode_refresh_token(second)
+    assert new["fid"] == old["fid"]
+    assert new["nonce"] != old["nonce"]
+    assert (await _refresh(client, second)).status_code == status.HTTP_200_OK
+
+
+async def test_reuse_revokes_the_whole_family(client: AsyncClient, user_factory):
+    user = await user_factory(email="reuse@example.com", password="TestPass123!")
+    stolen = await _login(client, user.email)
+    current = (await _refresh(client, stolen)).cookies[config.settings.REFRESH_COOKIE_NAME]
+
+    response = await _refresh(client, stolen)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()["detail"] == "Refresh token reuse detected"
+
+    # The legitimate holder's newer token died with the family
+    response = await _refresh(client, current)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_logout_revokes_the_family(client: AsyncClient, user_factory):
+    user = await user_factory(email="logout-family@example.com", password="TestPass123!")
+    token = await _login(client, user.email)
+
+    client.cookies.clear()
+    client.cookies.set(config.settings.REFRESH_COOKIE_NAME, token)
+    assert (await client.post("/api/v1/auth/logout")).status_code == status.HTTP_200_OK
+
+    response = await _refresh(client, token)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()["detail"] == "Session has been revoked"
+
+
+async def test_tokens_without_a_family_are_rejected(client: AsyncClient, user_factory):
+    user = await user_factory(email="nofamily@example.com", password="TestPass123!")
+    legacy = security.create_refresh_token({"sub": user.email, "uid": user.id})
+
+    response = await _refresh(client, legacy)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_refresh_does_not_touch_the_database(client: AsyncClient, user_factory):
+    user = await user_factory(email="nodb-refresh@example.com", password="TestPass123!")
+    token = await _login(client, user.email)
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        response = await _refresh(client, token)
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+    assert response.status_code == status.HTTP_200_OK
+    assert statements == []
+
+
+async def test_family_is_a_single_hash_expiring_with_the_token():
+    family_id, nonce = await refresh_tokens.start_family(42)
+    redis = refresh_tokens.get_redis()
+    key = refresh_tokens.KEY_PREFIX + family_id
+
+    assert await redis.hgetall(key) == {"n": nonce, "u": "42"}
+    ttl = await redis.pttl(key)
+    assert 0 < ttl <= config.settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60 * 1000
+
+    outcome, rotated = await refresh_tokens.rotate(family_id, nonce)
+    assert outcome is refresh_tokens.Rotation.ROTATED
+    assert await redis.hget(key, "n") == rotated
@@ -0,0 +1,151 @@
+"""
+Tests for resolving the principal from token claims with revocation epochs.
+"""
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1 import deps
+from app.core import config, principal_cache, security
+from app.schemas.user import UserUpdate
+from app.services import user_service
+
+pytestmark = pytest.mark.asyncio
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+@pytest.fixture
+def stateless(monkeypatch):
+    monkeypatch.setattr(config.settings, "AUTH_STATELESS_PRINCIPAL", True)
+    deps._token_cache.clear()
+    yield
+    deps._token_cache.clear()
+
+
+@pytest.fixture
+def users_queries():
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "users" in statement:
+            statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(Engine, "before_cursor_execute", record)
+
+
+async def _login(client: AsyncClient, email: str, password: str = "TestPass123!") -> str:
+    response = await client.post(
+        "/api/v1/auth/token", data={"username": email, "password": password}, headers=FORM
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()["access_token"]
+
+
+async def test_token_carries_principal_claims(client: AsyncClient, user_factory):
+    user = await user_factory(email="claims@example.com", password="TestPass123!")
+    payload = security.decode_access_token(await _login(client, user.email))
+
+    assert payload["uid"] == user.id
+    assert payload["role"] == user.role.value
+    assert payload["act"] is True
+    assert payload["tep"] == 0
+
+
+async def test_authenticated_requests_skip_users_table(
+    client: AsyncClient, user_factory, stateless, users_queries
+):
+    user = await user_factory(email="stateless@example.com", password="TestPass123!")
+    token = await _login(client, user.email)
+    users_queries.clear()
+
+    response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["id"] == user.id
+    assert users_queries == []
+
+
+async def test_password_change_revokes_issued_tokens(client: AsyncClient, user_factory, stateless):
+    user = await user_factory(email="rotate@example.com", password="TestPass123!")
+    token = await _login(client, user.email)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.patch(
+        "/api/v1/auth/me",
+        json={"current_password": "TestPass123!", "new_password": "NewPass123!"},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    await principal_cache.drain()
+
+    response = await client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    fresh = await _login(client, user.email, "NewPass123!")
+    response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {fresh}"})
+    assert response.status_code == status.HTTP_200_OK
+
+
+async def test_deactivation_revokes_issued_tokens(
+    client: AsyncClient, db_session: AsyncSession, user_factory, stateless
+):
+    user = await user_factory(email="deactivate@example.com", password="TestPass123!")
+    token = await _login(client, user.email)
+
+    await user_service.update_user(db_session, user, UserUpdate(is_active=False))
+    assert user.token_epoch == 1
+    await principal_cache.drain()
+
+    response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_unrelated_changes_keep_tokens_valid(
+    client: AsyncClient, db_session: AsyncSession, user_factory, stateless
+):
+    user = await user_factory(email="rename@example.com", password="TestPass123!")
+    token = await _login(client, user.email)
+
+    await user_service.update_user(db_session, user, UserUpdate(full_name="Renamed"))
+    assert user.token_epoch == 0
+    await principal_cache.drain()
+
+    response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_200_OK
+
+
+async def test_rename_reaches_issued_and_refreshed_tokens(
+    client: AsyncClient, user_factory, stateless
+):
+    user = await user_factory(email="rename-refresh@example.com", password="TestPass123!")
+    token = await _login(client, user.email)
+    refresh_token = client.cookies[config.settings.REFRESH_COOKIE_NAME]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.patch(
+        "/api/v1/auth/me", json={"full_name": "New Name", "current_password": "TestPass123!"}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    await principal_cache.drain()
+
+    # The token issued before the rename stays valid and shows the new name
+    response = await client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["full_name"] == "New Name"
+
+    client.cookies.clear()
+    client.cookies.set(config.settings.REFRESH_COOKIE_NAME, refresh_token)
+    response = await client.post("/api/v1/auth/refresh")
+    assert response.status_code == status.HTTP_200_OK
+    refreshed = response.json()["access_token"]
+    assert security.decode_access_token(refreshed)["name"] == "New Name"
+    rotated = security.decode_refresh_token(response.cookies[config.settings.REFRESH_COOKIE_NAME])
+    assert rotated["name"] == "New Name"
+
+    response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {refreshed}"})
+    assert response.json()["full_name"] == "New Name"
@@ -0,0 +1,130 @@
+"""
+Every write endpoint issues its INSERT/UPDATE and nothing reads the row back.
+"""
+import base64
+import re
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import UserRole
+from app.schemas.profile import ProfileCreate
+from app.services import profile_service
+
+pytestmark = pytest.mark.asyncio
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+
+@pytest.fixture
+def statements(engine):
+    recorded: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+def assert_single_write(statements: list[str], verb: str, table: str) -> None:
+    """One ``verb`` on ``table``, and no SELECT from it afterwards."""
+    writes = [i for i, statement in enumerate(statements) if statement.startswith(f"{verb} {table}")]
+    assert len(writes) == 1, statements
+    read_back = re.compile(rf"^SELECT .*\sFROM {table}\b", re.S)
+    assert not [s for s in statements[writes[0] + 1:] if read_back.match(s)], statements
+    # Server defaults come back with the write itself
+    assert "RETURNING" in statements[writes[0]] or verb == "UPDATE"
+
+
+async def _login(client: AsyncClient, email: str, password: str = "SecurePass123!") -> dict:
+    response = await client.post("/api/v1/auth/token", data={"username": email, "password": password}, headers=FORM)
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def test_register(client: AsyncClient, statements):
+    payload = {"email": "writes@example.com", "password": "SecurePass123!", "full_name": "Writes"}
+    response = await client.post("/api/v1/users", json=payload)
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["id"] and response.json()["created_at"]
+    assert_single_write(statements, "INSERT INTO", "users")
+
+
+async def test_admin_updates_user(client: AsyncClient, user_factory, statements):
+    admin = await user_factory(email="writes-admin@example.com", role=UserRole.ADMIN)
+    user = await user_factory(email="writes-target@example.com")
+    headers = await _login(client, admin.email)
+    statements.clear()
+
+    response = await client.patch(f"/api/v1/users/{user.id}", json={"full_name": "Renamed"}, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["full_name"] == "Renamed"
+    assert_single_write(statements, "UPDATE", "users")
+
+
+async def test_update_own_settings(client: AsyncClient, user_factory, statements):
+    user = await user_factory(email="writes-settings@example.com")
+    headers = await _login(client, user.email)
+    statements.clear()
+
+    response = await client.patch(
+        "/api/v1/auth/me", json={"full_name": "Settled", "current_password": "SecurePass123!"}, headers=headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["full_name"] == "Settled"
+    assert_single_write(statements, "UPDATE", "users")
+
+
+async def test_create_and_update_profile(client: AsyncClient, user_factory, statements):
+    user = await user_factory(email="writes-profile@example.com")
+    headers = await _login(client, user.email)
+    statements.clear()
+
+    response = await client.post("/api/v1/profiles/", json={"headline": "H", "summary": "S"}, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["version"] == 1
+    assert_single_write(statements, "INSERT INTO", "profiles")
+
+    statements.clear()
+    response = await client.patch(f"/api/v1/profiles/{response.json()['id']}", json={"headline": "H2"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert_single_write(statements, "UPDATE", "profiles")
+
+
+async def test_upload_avatar(
+    client: AsyncClient, db_session: AsyncSession, user_factory, statements
+):
+    user = await user_factory(email="writes-avatar@example.com")
+    await profile_service.create_profile(db_session, ProfileCreate(headline="H", summary="S"), user.id)
+    headers = await _login(client, user.email)
+    statements.clear()
+
+    files = {"file": ("avatar.png", PNG, "image/png")}
+    response = await client.post("/api/v1/profiles/avatar", files=files, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert_single_write(statements, "UPDATE", "profiles")
+
+
+async def test_create_job(client: AsyncClient, user_factory, statements):
+    employer = await user_factory(email="writes-employer@example.com", role=UserRole.EMPLOYER)
+    headers = await _login(client, employer.email)
+    statements.clear()
+
+    payload = {"title": "Electrician", "description": "Wiring", "company_name": "Acme"}
+    response = await client.post("/api/v1/jobs/", json=payload, headers=headers)
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["id"]
+    assert_single_write(statements, "INSERT INTO", "jobs")
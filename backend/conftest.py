@@ -0,0 +1,31 @@
+"""
+Root pytest configuration.
+
+Test modules outside app/tests (e.g. app/api/v1/test_file_upload.py) are
+collected before app/tests/conftest.py runs, and importing the app from them
+would load settings for the development environment (rate limiting on, CSRF
+rules, etc.). Set the test environment before any application import.
+"""
+import os
+
+os.environ["ENVIRONMENT"] = "test"
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-benchmarks",
+        action="store_true",
+        default=False,
+        help="Run tests marked benchmark, which assert on wall-clock timings",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="benchmark; run with --run-benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)